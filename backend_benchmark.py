@@ -0,0 +1,204 @@
+"""
+Hand Tracking Backend Benchmark
+
+Runs every hand tracking backend on the same frames and reports
+throughput (time per frame) and accuracy: the share of frames where the
+hand was found, hands found where there are none, the fingertip error in
+pixels against the reference landmarks and, on synthetic frames, the
+taps that type the right key (+ false presses) when the tracked
+landmarks drive the typing logic.
+
+By default the frames are rendered from a synthetic tap session, so the
+reference is the exact ground truth. The rendered hands are flat
+silhouettes, which MediaPipe does not take for hands; use --video to
+compare the MediaPipe backends. With --video, frames are read from a
+recording and the reference is what the --reference backend (the full
+MediaPipe model by default) tracks on the same frames.
+
+Usage: python backend_benchmark.py [--backends mediapipe,mediapipe_lite,contour]
+                                   [--video clip.mp4] [--reference mediapipe] [--frames 300]
+"""
+
+import argparse
+import sys
+import time
+import cv2
+import numpy as np
+from hand_backends import BACKENDS, create_backend
+from hand_model import NUM_LANDMARKS
+from press_benchmark import make_app, score_taps
+from profiling import StageProfiler
+from session_replay import replay_session
+from synthetic_input import synthetic_source
+from config import *
+
+
+def video_source(path, frames=300):
+    """Frames read from a video file (the reference is tracked separately)"""
+    capture = cv2.VideoCapture(path)
+    frame_size = (int(capture.get(cv2.CAP_PROP_FRAME_WIDTH)), int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+    capture.release()
+
+    def frames_iter():
+        capture = cv2.VideoCapture(path)
+        try:
+            for _ in range(frames):
+                success, frame = capture.read()
+                if not success:
+                    break
+                yield frame
+        finally:
+            capture.release()
+
+    return frames_iter, frame_size
+
+
+def track_frames(backend, frames_iter):
+    """Run a loaded backend on every frame and collect landmarks and timings"""
+    profiler = StageProfiler(enabled=False)
+    out = np.zeros((backend.max_hands, NUM_LANDMARKS, 3), dtype=np.float32)
+    landmarks, counts, times = [], [], []
+    for frame in frames_iter():
+        start = time.perf_counter()
+        count = backend.process(frame, out, profiler)
+        times.append(time.perf_counter() - start)
+        hands = np.zeros((MAX_NUM_HANDS, NUM_LANDMARKS, 3), dtype=np.float32)
+        hands[:count] = out[:count]
+        landmarks.append(hands)
+        counts.append(count)
+    return {'landmarks': np.array(landmarks), 'counts': np.array(counts), 'times': np.array(times)}
+
+
+def score_tracking(result, reference, reference_counts, frame_size):
+    """Compare tracked landmarks with the reference.
+
+    On frames where both have a hand, the tracked hand closest to the
+    first reference hand is compared fingertip by fingertip, in pixels.
+    """
+    scale = np.array(frame_size, dtype=np.float32)
+    frames = min(len(result['counts']), len(reference_counts))
+    found = missed = extra = 0
+    index_errors, tip_errors = [], []
+    for index in range(frames):
+        count, reference_count = result['counts'][index], reference_counts[index]
+        if reference_count == 0:
+            extra += count > 0
+            continue
+        if count == 0:
+            missed += 1
+            continue
+        found += 1
+        target = reference[index, 0, FINGER_TIP_IDS, :2] * scale
+        tips = result['landmarks'][index, :count][:, FINGER_TIP_IDS, :2] * scale
+        errors = np.hypot(*np.moveaxis(tips - target, -1, 0))
+        best = errors.mean(axis=1).argmin()
+        tip_errors.append(errors[best].mean())
+        index_errors.append(errors[best, FINGER_TIP_IDS.index(INDEX_FINGER_TIP_ID)])
+
+    return {
+        'frames': frames,
+        'detected': found / max(found + missed, 1),
+        'false_frames': extra,
+        'index_error_px': np.array(index_errors),
+        'tip_error_px': np.array(tip_errors)
+    }
+
+
+def score_typing(result, session):
+    """Replay tracked synthetic frames through the typing logic and score the taps"""
+    tracked = dict(session, landmarks=result['landmarks'], counts=result['counts'])
+    replay = replay_session(tracked, make_app('state_machine', session['frame_size']))
+    return score_taps(session, replay['events'])
+
+
+def run_backend_benchmark(backends, video=None, reference_backend='mediapipe', frames=300):
+    """Track the same frames with every backend and score each one.
+
+    On synthetic frames the tracked landmarks are also replayed through
+    the typing logic to count the taps that still type the right key.
+    """
+    session = None
+    if video:
+        frames_iter, frame_size = video_source(video, frames)
+        reference = None
+    else:
+        frames_iter, session = synthetic_source()
+        reference, reference_counts = session['landmarks'], session['counts']
+        frame_size = session['frame_size']
+
+    results = []
+    tracked = {}
+    names = list(backends)
+    if reference is None and reference_backend not in names:
+        names.insert(0, reference_backend)
+    for name in names:
+        backend = create_backend(name)
+        try:
+            backend.load()
+        except Exception as e:
+            results.append({'backend': name, 'error': str(e)})
+            continue
+        try:
+            tracked[name] = track_frames(backend, frames_iter)
+        finally:
+            backend.close()
+
+    if reference is None:
+        if reference_backend not in tracked:
+            print(f"Reference backend '{reference_backend}' is not available")
+            return results
+        reference = tracked[reference_backend]['landmarks']
+        reference_counts = tracked[reference_backend]['counts']
+
+    for name in backends:
+        if name not in tracked:
+            continue
+        score = score_tracking(tracked[name], reference, reference_counts, frame_size)
+        score.update(backend=name, times=tracked[name]['times'])
+        if session is not None:
+            score['typing'] = score_typing(tracked[name], session)
+        results.append(score)
+    return results
+
+
+def print_backend_benchmark(results):
+    """Print one line per backend"""
+    print(f"{'backend':16s} {'ms p50':>8s} {'ms p95':>8s} {'fps':>7s} {'detected':>9s} "
+          f"{'false':>6s} {'index px':>9s} {'tips px':>8s} {'taps typed':>11s}")
+    for r in results:
+        if 'error' in r:
+            print(f"{r['backend']:16s} unavailable: {r['error']}")
+            continue
+        times = r['times'] * 1000
+        index_error = f"{r['index_error_px'].mean():9.1f}" if len(r['index_error_px']) else f"{'-':>9s}"
+        tip_error = f"{r['tip_error_px'].mean():8.1f}" if len(r['tip_error_px']) else f"{'-':>8s}"
+        typing = r.get('typing')
+        typed = (f"{typing['detected']:4d}/{typing['taps']:<3d}+{typing['false_presses']}"
+                 if typing else f"{'-':>11s}")
+        print(f"{r['backend']:16s} {np.percentile(times, 50):8.2f} {np.percentile(times, 95):8.2f} "
+              f"{1000 / times.mean():7.0f} {r['detected']:8.0%} {r['false_frames']:6d} "
+              f"{index_error} {tip_error} {typed:>11s}")
+
+
+def main():
+    """Run the benchmark with command-line options"""
+    parser = argparse.ArgumentParser(description="Hand tracking backend benchmark")
+    parser.add_argument('--backends', default=','.join(BACKENDS), help="comma-separated backends to compare")
+    parser.add_argument('--video', help="recorded video to track instead of synthetic frames")
+    parser.add_argument('--reference', default='mediapipe', help="backend whose landmarks are the reference for --video")
+    parser.add_argument('--frames', type=int, default=300, help="maximum number of video frames")
+    args = parser.parse_args()
+
+    backends = [name.strip() for name in args.backends.split(',') if name.strip()]
+    unknown = [name for name in backends + [args.reference] if name not in BACKENDS]
+    if unknown:
+        print(f"Unknown backends: {', '.join(unknown)} (choose from {', '.join(BACKENDS)})")
+        return False
+
+    print_backend_benchmark(run_backend_benchmark(backends, args.video, args.reference, args.frames))
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,198 @@
+"""
+Press Calibration Before/After Benchmark
+
+Compares the pixel distance detector (PRESS_THRESHOLD_DISTANCE, before)
+with the calibrated threshold detector (after), both for a new user
+starting from the default profile and for a returning user whose profile
+was learned on an earlier session, on synthetic users who sit at
+different distances from the camera, rest their fingers slightly curled
+or tap lightly.
+
+Recorded sessions given on the command line are replayed with the same
+detectors. With --expected (the text that was typed) the typed keys are
+aligned to it and extra keys count as false presses; without it, keys
+undone straight away with backspace are counted instead, the false
+presses the user noticed. --save-profile stores the profile learned from
+the recorded sessions.
+
+Usage: python calibration_benchmark.py [session.vkl ...] [--expected TEXT] [--save-profile press_profile.json]
+"""
+
+import argparse
+import copy
+import sys
+import numpy as np
+from press_benchmark import make_app, score_taps
+from press_calibration import PressCalibration
+from press_detector import ThresholdPressDetector
+from session_recording import load_session
+from session_replay import replay_session
+from synthetic_input import add_noise, generate_tap_session
+from config import *
+
+CALIBRATION_TEXT = 'pack my box with five dozen liquor jugs'
+TEST_TEXT = 'the quick brown fox jumps over the lazy dog'
+
+# (name, hand scale in pixels, press depth, resting curl, landmark noise in pixels)
+USERS = [
+    ('typical', 80, 1.0, 0.0, 0.0),
+    ('far away', 35, 1.0, 0.0, 0.5),
+    ('far, fingers resting curled', 25, 1.0, 0.3, 0.5),
+    ('close to the camera', 150, 1.0, 0.0, 0.0),
+    ('light tapper', 80, 0.55, 0.0, 0.0),
+    ('light tapper, noisy', 60, 0.6, 0.1, 2.0),
+]
+
+
+def make_detector_app(detector, calibration=None):
+    """Headless app with the distance detector or a calibrated one"""
+    if detector == 'distance':
+        return make_app('distance')
+    app = make_app('calibrated')
+    app.press_detector = ThresholdPressDetector(calibration or PressCalibration())
+    return app
+
+
+def user_session(app, text, hand_scale, press_depth, rest_curl, noise_px, seed):
+    """Synthetic session of one user typing text"""
+    keys = [('space' if char == ' ' else char) for char in text]
+    session = generate_tap_session(app.keyboard, keys, hand_scale=hand_scale, start_time=10.0,
+                                   press_depth=press_depth, rest_curl=rest_curl,
+                                   frame_size=app.hand_tracker.frame_size)
+    return add_noise(session, noise_px, seed)
+
+
+def run_synthetic(users=USERS):
+    """Score every detector on the test session of every user"""
+    results = []
+    for name, hand_scale, press_depth, rest_curl, noise_px in users:
+        # A returning user's profile, learned on an earlier session
+        app = make_detector_app('calibrated')
+        replay_session(user_session(app, CALIBRATION_TEXT, hand_scale, press_depth, rest_curl, noise_px, 1), app)
+        profile = app.press_detector.calibration
+
+        for detector, calibration in (('distance', None), ('new user', None),
+                                      ('with profile', copy.deepcopy(profile))):
+            app = make_detector_app(detector, calibration)
+            session = user_session(app, TEST_TEXT, hand_scale, press_depth, rest_curl, noise_px, 2)
+            score = score_taps(session, replay_session(session, app)['events'])
+            score.update(user=name, detector=detector)
+            if detector != 'distance':
+                index = TYPING_FINGER_TIP_IDS.index(INDEX_FINGER_TIP_ID)
+                score['threshold'] = app.press_detector.calibration.threshold[index]
+            results.append(score)
+    return results
+
+
+def print_synthetic(results):
+    """Print one line per user and detector"""
+    print(f"{'user':30s} {'detector':13s} {'detected':>9s} {'false':>6s} {'false rate':>11s} {'index thr':>10s}")
+    for r in results:
+        presses = r['detected'] + r['false_presses']
+        rate = r['false_presses'] / presses if presses else 0.0
+        threshold = f"{r['threshold']:10.2f}" if 'threshold' in r else f"{'-':>10s}"
+        print(f"{r['user']:30s} {r['detector']:13s} {r['detected']:4d}/{r['taps']:<4d} "
+              f"{r['false_presses']:6d} {rate:10.1%} {threshold}")
+
+
+def align_keys(typed, expected):
+    """Align typed keys to the expected ones; returns (matched, extra, missed)"""
+    rows, columns = len(typed) + 1, len(expected) + 1
+    cost = np.zeros((rows, columns), dtype=np.int32)
+    cost[:, 0] = np.arange(rows)
+    cost[0, :] = np.arange(columns)
+    for i in range(1, rows):
+        for j in range(1, columns):
+            cost[i, j] = min(cost[i - 1, j] + 1, cost[i, j - 1] + 1,
+                             cost[i - 1, j - 1] + (typed[i - 1] != expected[j - 1]) * 2)
+
+    # Walk back: a diagonal step with equal keys is a match
+    i, j = rows - 1, columns - 1
+    matched = extra = missed = 0
+    while i > 0 or j > 0:
+        if i > 0 and j > 0 and typed[i - 1] == expected[j - 1] and cost[i, j] == cost[i - 1, j - 1]:
+            matched += 1
+            i, j = i - 1, j - 1
+        elif i > 0 and cost[i, j] == cost[i - 1, j] + 1:
+            extra += 1
+            i -= 1
+        else:
+            missed += 1
+            j -= 1
+    return matched, extra, missed
+
+
+def count_corrections(keys):
+    """Keys immediately undone with backspace"""
+    corrected = 0
+    pending = 0
+    for key in keys:
+        if key == 'backspace':
+            if pending:
+                corrected += 1
+                pending -= 1
+        else:
+            pending += 1
+    return corrected
+
+
+def run_recorded(paths, expected=None, profile_path=None):
+    """Replay recorded sessions with every detector.
+
+    Returns the results and the calibration learned (new user) over all
+    sessions, in order.
+    """
+    learned = PressCalibration()
+    profile = PressCalibration.load(profile_path) if profile_path else None
+    expected_keys = [('space' if char == ' ' else char) for char in expected] if expected else None
+
+    results = []
+    for path in paths:
+        detectors = [('distance', None), ('new user', PressCalibration()), ('learned so far', learned)]
+        if profile is not None:
+            detectors.append(('with profile', copy.deepcopy(profile)))
+        for detector, calibration in detectors:
+            session = load_session(path)
+            app = make_detector_app(detector, calibration)
+            app.hand_tracker.frame_size = session['frame_size']
+            keys = replay_session(session, app)['keys']
+            result = {'session': path, 'detector': detector, 'keys': len(keys),
+                      'corrected': count_corrections(keys)}
+            if expected_keys:
+                result['matched'], result['extra'], result['missed'] = align_keys(
+                    [key for key in keys if key != 'backspace'], expected_keys)
+            results.append(result)
+    return results, learned
+
+
+def print_recorded(results):
+    """Print one line per session and detector"""
+    print(f"\n{'session':30s} {'detector':15s} {'keys':>5s} {'corrected':>10s} {'matched':>8s} {'extra':>6s} {'missed':>7s}")
+    for r in results:
+        aligned = (f"{r['matched']:8d} {r['extra']:6d} {r['missed']:7d}" if 'matched' in r
+                   else f"{'-':>8s} {'-':>6s} {'-':>7s}")
+        print(f"{r['session'][-30:]:30s} {r['detector']:15s} {r['keys']:5d} {r['corrected']:10d} {aligned}")
+
+
+def main():
+    """Run the benchmark with command-line options"""
+    parser = argparse.ArgumentParser(description="Press calibration before/after benchmark")
+    parser.add_argument('sessions', nargs='*', help="recorded sessions to replay")
+    parser.add_argument('--expected', help="text typed in the recorded sessions")
+    parser.add_argument('--profile', help="profile to compare on the recorded sessions")
+    parser.add_argument('--save-profile', help="save the profile learned from the recorded sessions")
+    args = parser.parse_args()
+
+    print_synthetic(run_synthetic())
+    if args.sessions:
+        results, learned = run_recorded(args.sessions, args.expected, args.profile)
+        print_recorded(results)
+        if args.save_profile:
+            learned.save(args.save_profile)
+            print(f"Saved the learned profile to {args.save_profile}")
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
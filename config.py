@@ -29,37 +29,117 @@ COLORS = {
     'text_hover': (255, 255, 255),
     'hand_landmarks': (0, 255, 0),
     'finger_tip': (0, 255, 255),
-    'palm_center': (255, 0, 0)
+    'palm_center': (255, 0, 0),
+    'landmark_joints': (0, 0, 255)
 }
 
 # Hand Tracking Settings
 HAND_CONFIDENCE = 0.7
+HAND_TRACKING_BACKEND = 'mediapipe'  # 'mediapipe', 'mediapipe_lite' (lite model, one hand) or 'contour' (OpenCV, weak CPUs)
+MODEL_COMPLEXITY = 1  # MediaPipe hand landmark model: 0 (lite) or 1 (full)
+BACKGROUND_MODEL_LOAD = True  # Load and warm up the model while the UI is already showing
 MAX_NUM_HANDS = 2
 INDEX_FINGER_TIP_ID = 8
 PALM_CENTER_ID = 0
+WRIST_ID = 0
+MIDDLE_FINGER_MCP_ID = 9  # Wrist to middle-finger MCP is the hand scale
+FINGER_TIP_IDS = [4, 8, 12, 16, 20]  # thumb, index, middle, ring, pinky
+TYPING_FINGER_TIP_IDS = FINGER_TIP_IDS  # Fingertips that can hover and press keys
+LANDMARK_BUFFER_POOL = 8  # Reused landmark buffers; must exceed the frames in flight in the pipeline
 
 # Typing Logic Settings
 PRESS_THRESHOLD_DISTANCE = 40  # pixels from palm center
-DEBOUNCE_TIME = 0.3  # seconds between valid presses
+DEBOUNCE_TIME = 0.3  # seconds between valid presses of the same finger
 MOVEMENT_THRESHOLD = 10  # minimum movement to confirm press
 
+# Press Detection Settings (distances in hand scales, see PressDetector)
+PRESS_DETECTOR = 'state_machine'  # 'state_machine', 'calibrated' (learned thresholds) or 'distance' (PRESS_THRESHOLD_DISTANCE)
+PRESS_HISTORY_SIZE = 8  # Frames of landmark history per finger
+PRESS_VELOCITY_FRAMES = 2  # Frames the curling speed is measured over
+PRESS_SMOOTHING = 0.5  # Moving-average factor for extension and depth (1 = no smoothing)
+PRESS_START_VELOCITY = 3.0  # Curling speed (hand scales/s) that starts an approach
+PRESS_TRAVEL = 0.5  # Curl from the pre-approach extension that fires the press
+PRESS_EXTENSION = 0.6  # Fingertip-to-wrist extension that always counts as pressed
+PRESS_RELEASE_TRAVEL = 0.3  # Re-extension from the most curled point that releases
+PRESS_DEPTH_WEIGHT = 1.0  # Weight of fingertip movement toward the camera
+PRESS_BASELINE_RATE = 0.1  # Per-frame rate the resting extension and its jitter follow a still, idle finger
+PRESS_NOISE_MARGIN = 0.5  # Extra press and release travel per unit of the finger's jitter
+
+# Press Calibration Settings (PRESS_DETECTOR = 'calibrated', see press_calibration.py)
+CALIBRATION_PROFILE_PATH = 'press_profile.json'  # Learned thresholds, loaded at startup and saved on exit (None disables; relative to the program directory)
+CALIBRATION_ADAPT = True  # Keep learning the thresholds while typing
+CALIBRATION_PRIOR_SAMPLES = 5  # Weight of the default distributions, in samples
+CALIBRATION_RATE = 0.05  # Forgetting rate of the open and pressed extensions (per tap)
+CALIBRATION_MIN_STD = 0.05  # Floor of the distribution spreads, in hand scales
+CALIBRATION_MIN_GAP = 0.2  # Open and pressed means closer than this leave the threshold unchanged
+CALIBRATION_HYSTERESIS = 0.3  # Hysteresis band as a fraction of the open-to-pressed gap
+CALIBRATION_DIP = 0.4  # Extension dips this far (fraction of the gap) below open are taps
+
+# Input Injection Settings
+ASYNC_INJECTION = True  # Inject keystrokes from a worker thread instead of the render loop
+INJECTION_STATS_SIZE = 256  # Recent events kept for queueing delay statistics
+INJECTION_SHUTDOWN_TIMEOUT = 2.0  # seconds to wait for queued keystrokes on exit
+LATENCY_REPORT = True  # Print per-keystroke capture-to-injection latency on exit
+
 # Camera Settings
 CAMERA_INDEX = 0
 CAMERA_WIDTH = 640
 CAMERA_HEIGHT = 480
+CAMERA_PREVIEW_SIZE = (320, 240)  # Size of the camera feed shown on the display
 
 # Performance Settings
 SKIP_FRAMES = 1  # Process every Nth frame for performance
+LANDMARK_PREDICTION = True  # Extrapolate landmarks on skipped frames (else hold the last ones)
+PREDICTION_MAX_AGE = 0.2  # seconds; hold the last tracked landmarks once they are older than this
 BLUR_KERNEL = (5, 5)  # Gaussian blur for noise reduction
 
-# QWERTY Keyboard Layout
-KEYBOARD_LAYOUT = [
-    ['`', '1', '2', '3', '4', '5', '6', '7', '8', '9', '0', '-', '=', 'backspace'],
-    ['tab', 'q', 'w', 'e', 'r', 't', 'y', 'u', 'i', 'o', 'p', '[', ']', '\\'],
-    ['caps', 'a', 's', 'd', 'f', 'g', 'h', 'j', 'k', 'l', ';', "'", 'enter'],
-    ['shift', 'z', 'x', 'c', 'v', 'b', 'n', 'm', ',', '.', '/', 'shift'],
-    ['ctrl', 'win', 'alt', 'space', 'alt', 'win', 'menu', 'ctrl']
-]
+# Contour Backend Settings (HAND_TRACKING_BACKEND = 'contour')
+SKIN_YCRCB_LOWER = (0, 133, 77)  # Skin color range in YCrCb
+SKIN_YCRCB_UPPER = (255, 173, 127)
+CONTOUR_PROCESS_WIDTH = 320  # Frames are scaled down to this width for segmentation
+CONTOUR_MIN_AREA = 0.01  # Smallest hand blob as a fraction of the frame area
+CONTOUR_FINGER_LENGTH = 1.6  # Hull points further than this many palm radii from the palm center are fingertips
+CONTOUR_PALM_RADIUS = 0.4  # Palm radius in hand scales (wrist to middle-finger MCP)
+
+# Region-of-Interest Tracking
+ROI_TRACKING = True  # Run inference on a crop around the last known hands
+ROI_PADDING = 0.3  # Padding on each side of the hand bounding box (fraction of its size)
+ROI_MIN_SIZE = 96  # Minimum crop size in pixels
+ROI_INFERENCE_SIZE = 256  # Longer side of the crop fed to MediaPipe (pixels)
+ROI_EDGE_MARGIN = 0.05  # Re-detect on the full frame when landmarks get this close to a crop edge
+ROI_REDETECT_INTERVAL = 30  # Full-frame detection interval while fewer than MAX_NUM_HANDS are tracked
+
+# Pipeline Settings
+PIPELINE_ENABLED = False  # Run capture, inference, typing and rendering on separate threads
+PIPELINE_QUEUE_SIZE = 1  # Frames buffered between pipeline stages
+PIPELINE_DROP_POLICY = 'drop_oldest'  # 'drop_oldest', 'drop_newest' or 'block'
+
+# Parallel Inference
+INFERENCE_WORKERS = 0  # Hand tracking worker processes (0 = track in this process)
+INFERENCE_RING_SLOTS = 0  # Shared-memory frame slots (0 = one per worker; more queue frames and add latency)
+INFERENCE_REORDER_TIMEOUT = 0.25  # seconds to wait for a late frame's result before skipping it
+
+# Multi-Session Host (session_host.py)
+SESSION_HOST_WORKERS = 2  # Inference worker processes shared by all sessions
+SESSION_MAX_IN_FLIGHT = 2  # Frames of one session tracked at once (its most of the pool)
+SESSION_LATENCY_BUDGET = 0.1  # seconds; frames that wait longer before tracking are dropped
+SESSION_QUEUE_SIZE = 2  # Frames buffered per session
+SESSION_STATS_SIZE = 256  # Recent frames kept for latency statistics
+SESSION_STATS_WINDOW = 2.0  # seconds the per-session FPS is measured over
+
+# Network Server (keyboard_server.py, keyboard_client.py)
+NET_HOST = '127.0.0.1'
+NET_PORT = 8765
+NET_MAX_MESSAGE_BYTES = 8 * 1024 * 1024  # Larger messages close the connection
+NET_BATCH_FRAMES = 1  # Frames a client sends per message (more = fewer messages, more latency)
+NET_JPEG_QUALITY = 80  # JPEG quality of frames sent to the server
+NET_POLL_INTERVAL = 0.001  # seconds between checks for tracking results
+
+# Keyboard Layouts (definitions in LAYOUT_DIR/<name>.json; relative paths are inside the program directory)
+LAYOUT_DIR = 'layouts'
+DEFAULT_LAYOUT = 'qwerty'
+PRELOAD_LAYOUTS = ['qwerty', 'numpad', 'symbols', 'dvorak']  # Compiled at startup for instant switching ('l' cycles)
+LAYOUT_CACHE_DIR = '.layout_cache'  # Compiled layout bundles are saved here (None disables)
 
 # Special key mappings
 SPECIAL_KEYS = {
@@ -75,9 +155,61 @@ SPECIAL_KEYS = {
     'menu': 'menu'
 }
 
+# Word Completion Settings
+WORD_COMPLETION = True  # Suggest completions of the word being typed
+WORD_FREQUENCY_PATH = 'word_frequencies.txt'  # "word count" per line (relative to the program directory)
+SUGGESTION_COUNT = 3  # Suggestion keys shown above the keyboard (0 hides the row)
+SUGGESTION_ROW_HEIGHT = 45
+COMPLETION_MIN_PREFIX = 1  # Letters typed before suggestions appear
+
+# Swipe Typing Settings
+SWIPE_MODE = False  # Swipe whole words with the index finger (toggle with 's')
+SWIPE_SAMPLES = 32  # Points every gesture and word template is resampled to
+SWIPE_KEY_RADIUS = 1.0  # Key widths around the gesture ends searched for first/last letters
+SWIPE_FREQUENCY_WEIGHT = 0.05  # Score bonus per log word count
+SWIPE_MIN_LENGTH = 1.0  # Key widths a path must travel to count as a swipe, not a tap
+
+# Profiling Settings
+PROFILING_ENABLED = True  # Time each stage of the main loop into latency histograms
+PROFILE_HISTOGRAM_BINS = 200  # Log-spaced bins from 1us to 10s
+PROFILE_OVERLAY = True  # Show per-stage p50/p95/p99 on the debug overlay
+PROFILE_EXPORT_PATH = None  # e.g. 'profile' to write profile.json/profile.csv on exit or SIGUSR1
+
+# Soak Benchmark (soak_benchmark.py; growth and drift measured from the first sample after warm-up)
+SOAK_MAX_TRACED_GROWTH_MB = 8  # Python heap growth (tracemalloc) allowed over the run
+SOAK_MAX_RSS_GROWTH_MB = 32  # Resident memory growth allowed over the run
+SOAK_MAX_FRAME_TIME_DRIFT = 0.25  # Allowed relative rise of the median frame time
+SOAK_TRACEMALLOC_FRAMES = 4  # Stack depth recorded per allocation
+SOAK_TOP_ALLOCATIONS = 10  # Allocation sites with the most growth to report
+
+# Session Recording
+RECORD_SESSION_PATH = None  # e.g. 'session.vkl' to record landmarks for session_replay.py
+
 # Debug Settings
 DEBUG_MODE = True
 SHOW_FPS = True
 SHOW_LANDMARKS = True
 SHOW_BOUNDING_BOXES = True
-SHOW_DISTANCE_LINES = True 
\ No newline at end of file
+SHOW_DISTANCE_LINES = True
+
+# Adaptive Quality Settings
+ADAPTIVE_QUALITY = True  # Step through QUALITY_LADDER to hold FPS_TARGET
+QUALITY_SMOOTHING = 0.1  # Moving-average factor for the measured frame cost
+QUALITY_DOWNGRADE_RATIO = 1.0  # Step down while frame cost exceeds budget * ratio...
+QUALITY_DOWNGRADE_FRAMES = 15  # ...for this many consecutive frames
+QUALITY_UPGRADE_RATIO = 0.6  # Step up while frame cost stays below budget * ratio...
+QUALITY_UPGRADE_FRAMES = 90  # ...for this many consecutive frames
+
+# Quality levels from best to cheapest (inference_size None = native camera size)
+QUALITY_LADDER = [
+    {'name': 'high', 'inference_size': None, 'model_complexity': MODEL_COMPLEXITY,
+     'skip_frames': SKIP_FRAMES, 'debug_overlay': DEBUG_MODE, 'preview_size': CAMERA_PREVIEW_SIZE},
+    {'name': 'medium', 'inference_size': 480, 'model_complexity': MODEL_COMPLEXITY,
+     'skip_frames': SKIP_FRAMES, 'debug_overlay': DEBUG_MODE, 'preview_size': CAMERA_PREVIEW_SIZE},
+    {'name': 'low', 'inference_size': 320, 'model_complexity': 0,
+     'skip_frames': SKIP_FRAMES, 'debug_overlay': False, 'preview_size': (240, 180)},
+    {'name': 'lower', 'inference_size': 320, 'model_complexity': 0,
+     'skip_frames': max(SKIP_FRAMES, 2), 'debug_overlay': False, 'preview_size': (160, 120)},
+    {'name': 'minimal', 'inference_size': 256, 'model_complexity': 0,
+     'skip_frames': max(SKIP_FRAMES, 3), 'debug_overlay': False, 'preview_size': (160, 120)},
+]
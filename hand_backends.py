@@ -0,0 +1,331 @@
+"""
+Hand Tracking Backends
+
+A backend turns an image into hand landmarks: it takes a BGR image and
+writes MediaPipe-style normalized (x, y, z) landmarks for every hand it
+finds into a preallocated (hands, 21, 3) array. HandTracker adds frame
+skipping, ROI cropping and buffering on top of whichever backend is
+selected with HAND_TRACKING_BACKEND.
+"""
+
+import itertools
+import time
+import cv2
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from hand_model import OPEN_HAND, FINGER_JOINTS, hand_pose
+from config import *
+
+# Palm center of OPEN_HAND (hand scales from the wrist)
+PALM_CENTER = np.array([0.05, -0.55], dtype=np.float32)
+
+# Distance from the outline of a fingertip to its landmark, in hand scales
+FINGERTIP_INSET = 0.12
+
+
+def finger_angles(points, center):
+    """Angle of points around center, clockwise from straight up (radians).
+
+    Fingers of an upright hand stay well away from the +-pi wrap-around,
+    which points straight down.
+    """
+    offsets = np.asarray(points, dtype=np.float32) - center
+    return np.arctan2(offsets[:, 0], -offsets[:, 1])
+
+
+class HandBackend:
+    """Base class of the hand tracking backends.
+
+    load() does the slow setup (imports, model creation, warm-up) and is
+    called on HandTracker's loader thread. process() is called once per
+    inference on the tracking thread.
+    """
+
+    name = None
+
+    # Whether HandTracker may feed crops around the tracked hands (ROI_TRACKING)
+    supports_roi = True
+
+    def __init__(self, max_hands=MAX_NUM_HANDS):
+        self.max_hands = max_hands
+
+    def load(self):
+        """Prepare the backend. Returns the time of each setup phase in seconds"""
+        return {}
+
+    def process(self, image, out, profiler):
+        """Detect hands in a BGR image.
+
+        Writes the normalized landmarks of up to len(out) hands into out,
+        a (hands, 21, 3) float32 array, and returns the number of hands.
+        """
+        raise NotImplementedError
+
+    def set_model_complexity(self, model_complexity):
+        """Request a model complexity (ignored by backends without one)"""
+
+    def close(self):
+        """Release the backend's resources"""
+
+
+class MediaPipeBackend(HandBackend):
+    """MediaPipe Hands (mp.solutions.hands)"""
+
+    name = 'mediapipe'
+
+    def __init__(self, max_hands=MAX_NUM_HANDS, model_complexity=MODEL_COMPLEXITY):
+        super().__init__(max_hands)
+        self.model_complexity = model_complexity
+        self._pending_model_complexity = None
+        self.mp_hands = None
+        self.hands = None
+
+    def load(self):
+        """Import MediaPipe, build the model and warm it up on a blank frame"""
+        times = {}
+        start = time.perf_counter()
+        import mediapipe as mp
+        self.mp_hands = mp.solutions.hands
+        now = time.perf_counter()
+        times['import'] = now - start
+
+        hands = self._create_hands()
+        times['create'] = time.perf_counter() - now
+        now = time.perf_counter()
+
+        # The first inference initializes the graph; pay for it now
+        hands.process(np.zeros((CAMERA_HEIGHT, CAMERA_WIDTH, 3), dtype=np.uint8))
+        times['warmup'] = time.perf_counter() - now
+
+        self.hands = hands
+        return times
+
+    def _create_hands(self):
+        """Create the MediaPipe Hands solution"""
+        return self.mp_hands.Hands(
+            static_image_mode=False,
+            max_num_hands=self.max_hands,
+            model_complexity=self.model_complexity,
+            min_detection_confidence=HAND_CONFIDENCE,
+            min_tracking_confidence=HAND_CONFIDENCE
+        )
+
+    def set_model_complexity(self, model_complexity):
+        """Request a MediaPipe model complexity.
+
+        The model is recreated at the start of the next process call, on
+        the thread that runs inference.
+        """
+        if model_complexity != self.model_complexity:
+            self._pending_model_complexity = model_complexity
+
+    def process(self, image, out, profiler):
+        """Run MediaPipe on an image and store the landmarks"""
+        if self._pending_model_complexity is not None:
+            self.hands.close()
+            self.model_complexity = self._pending_model_complexity
+            self._pending_model_complexity = None
+            self.hands = self._create_hands()
+
+        # Convert BGR to RGB
+        start = profiler.start()
+        rgb_frame = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        start = profiler.stop('convert', start)
+
+        # Process the frame
+        results = self.hands.process(rgb_frame)
+        start = profiler.stop('inference', start)
+
+        count = 0
+        if results.multi_hand_landmarks:
+            for hand_landmarks in results.multi_hand_landmarks[:len(out)]:
+                out[count] = [(landmark.x, landmark.y, landmark.z) for landmark in hand_landmarks.landmark]
+                count += 1
+        profiler.stop('extraction', start)
+        return count
+
+    def close(self):
+        """Close the MediaPipe graph"""
+        if self.hands is not None:
+            self.hands.close()
+            self.hands = None
+
+
+class MediaPipeLiteBackend(MediaPipeBackend):
+    """MediaPipe Hands with the lite landmark model tracking a single hand"""
+
+    name = 'mediapipe_lite'
+
+    def __init__(self, max_hands=1, model_complexity=0):
+        super().__init__(max_hands, model_complexity)
+
+    def set_model_complexity(self, model_complexity):
+        """The lite backend always uses the lite model"""
+
+
+class ContourBackend(HandBackend):
+    """Fingertip detection with plain OpenCV, for CPUs too weak for MediaPipe.
+
+    Skin-colored pixels are segmented in YCrCb space on a downscaled frame
+    and the largest blobs are taken as hands. The deepest point of each
+    blob's distance transform is the palm center and its depth the palm
+    radius, which gives the hand scale. Peaks of the outline's distance
+    from the palm are fingertips, matched to fingers by their angle around
+    the palm. The full 21-landmark skeleton is then filled in from the open-hand
+    model, with the fingers that have no visible tip curled into the palm,
+    so the press detector sees a curling finger the same way it does with
+    MediaPipe.
+
+    It assumes upright hands (fingers pointing up) in front of a background
+    that is not skin-colored, and estimates no real depth.
+    """
+
+    name = 'contour'
+
+    # The outline has to be whole, and full frames are cheap at this size
+    supports_roi = False
+
+    def __init__(self, max_hands=MAX_NUM_HANDS, process_width=CONTOUR_PROCESS_WIDTH):
+        super().__init__(max_hands)
+        self.process_width = process_width
+        self._kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
+        self._lower = np.array(SKIN_YCRCB_LOWER, dtype=np.uint8)
+        self._upper = np.array(SKIN_YCRCB_UPPER, dtype=np.uint8)
+
+        # Direction of each fingertip from the palm center in the open hand
+        self.tip_ids = list(FINGER_JOINTS)
+        self._tip_angles = finger_angles(OPEN_HAND[self.tip_ids], PALM_CENTER)
+
+    def process(self, image, out, profiler):
+        """Segment skin, find hand blobs and fit a skeleton to each"""
+        start = profiler.start()
+        height, width = image.shape[:2]
+        scale = min(1.0, self.process_width / width)
+        if scale < 1.0:
+            image = cv2.resize(image, (max(1, int(width * scale)), max(1, int(height * scale))),
+                               interpolation=cv2.INTER_AREA)
+
+        ycrcb = cv2.cvtColor(image, cv2.COLOR_BGR2YCrCb)
+        mask = cv2.inRange(ycrcb, self._lower, self._upper)
+        mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, self._kernel)
+        start = profiler.stop('convert', start)
+
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
+        min_area = CONTOUR_MIN_AREA * mask.size
+        areas = [cv2.contourArea(contour) for contour in contours]
+        order = sorted((i for i in range(len(contours)) if areas[i] >= min_area),
+                       key=lambda i: areas[i], reverse=True)
+
+        count = 0
+        size = np.array([mask.shape[1], mask.shape[0]], dtype=np.float32)
+        for index in order[:len(out)]:
+            if self._fit_hand(contours[index], out[count], mask.shape):
+                out[count, :, :2] /= size
+                count += 1
+        profiler.stop('inference', start)
+        return count
+
+    def _fit_hand(self, contour, out, image_shape):
+        """Fit a skeleton to one hand blob, writing pixel landmarks into out.
+
+        Returns False if the blob is not usable as a hand.
+        """
+        x, y, width, height = cv2.boundingRect(contour)
+        blob = np.zeros((height + 2, width + 2), dtype=np.uint8)
+        cv2.drawContours(blob, [contour], -1, 255, -1, offset=(1 - x, 1 - y))
+        distances = cv2.distanceTransform(blob, cv2.DIST_L2, 3)
+        _, radius, _, (center_x, center_y) = cv2.minMaxLoc(distances)
+        if radius < 2:
+            return False
+        center = np.array([center_x + x - 1, center_y + y - 1], dtype=np.float32)
+
+        # A palm cut off by the frame edge gives a wrong center and scale
+        height, width = image_shape
+        if (center[0] - radius < 1 or center[1] - radius < 1 or
+                center[0] + radius > width - 2 or center[1] + radius > height - 2):
+            return False
+        hand_scale = radius / CONTOUR_PALM_RADIUS
+
+        tips = self._find_fingertips(contour, center, radius)
+        fingers = self._assign_fingers(tips, center)
+
+        # Open-hand skeleton with the fingers that were not found curled
+        curls = {tip_id: (0.0 if tip_id in fingers else 1.0) for tip_id in self.tip_ids}
+        pose = hand_pose(curls)
+        out[:, :2] = (pose[:, :2] - PALM_CENTER) * hand_scale + center
+        out[:, 2] = pose[:, 2]
+
+        # Bend each found finger toward its detected tip
+        for tip_id, tip in fingers.items():
+            joints = FINGER_JOINTS[tip_id]
+            base = out[joints[0], :2]
+            direction = tip - base
+            length = np.hypot(*direction)
+            if length > 0:
+                tip = tip - direction / length * FINGERTIP_INSET * hand_scale
+            open_length = np.hypot(*(OPEN_HAND[joints[-1]] - OPEN_HAND[joints[0]]))
+            for joint in joints[1:]:
+                fraction = np.hypot(*(OPEN_HAND[joint] - OPEN_HAND[joints[0]])) / open_length
+                out[joint, :2] = base + (tip - base) * fraction
+        return True
+
+    def _find_fingertips(self, contour, center, radius):
+        """Outline points that stick out from the palm, at most one per finger.
+
+        A fingertip is the point of the outline farthest from the palm
+        center within a palm radius either way along the outline.
+        """
+        points = contour.reshape(-1, 2).astype(np.float32)
+        offsets = points - center
+        distances = np.hypot(offsets[:, 0], offsets[:, 1])
+
+        window = max(1, int(radius))
+        padded = np.concatenate((distances[-window:], distances, distances[:window]))
+        peaks = distances >= sliding_window_view(padded, 2 * window + 1).max(axis=1)
+
+        # Fingers point up: ignore the wrist and forearm below the palm
+        candidates = np.nonzero(peaks & (distances > CONTOUR_FINGER_LENGTH * radius) &
+                                (offsets[:, 1] < radius))[0]
+
+        tips = []
+        for index in candidates[np.argsort(-distances[candidates])]:
+            point = points[index]
+            # Flat fingertips can have several equally distant points
+            if all(np.hypot(*(point - tip)) > 0.6 * radius for tip in tips):
+                tips.append(point)
+            if len(tips) == len(self.tip_ids):
+                break
+        return tips
+
+    def _assign_fingers(self, tips, center):
+        """Match fingertips to fingers by their angle around the palm.
+
+        Fingers keep their left-to-right order, so the assignment is the
+        ordered subset of fingers closest in angle. A single raised finger
+        is taken to be the pointing index finger.
+        """
+        if not tips:
+            return {}
+        if len(tips) == 1:
+            return {INDEX_FINGER_TIP_ID: tips[0]}
+
+        angles = finger_angles(np.array(tips), center)
+        order = np.argsort(angles)
+        tips, angles = [tips[i] for i in order], angles[order]
+        best = min(itertools.combinations(range(len(self.tip_ids)), len(tips)),
+                   key=lambda fingers: np.abs(self._tip_angles[list(fingers)] - angles).sum())
+        return {self.tip_ids[finger]: tip for finger, tip in zip(best, tips)}
+
+
+BACKENDS = {
+    MediaPipeBackend.name: MediaPipeBackend,
+    MediaPipeLiteBackend.name: MediaPipeLiteBackend,
+    ContourBackend.name: ContourBackend,
+}
+
+
+def create_backend(name=HAND_TRACKING_BACKEND):
+    """Create a hand tracking backend by name"""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown hand tracking backend '{name}' (choose from {', '.join(BACKENDS)})")
+    return BACKENDS[name]()
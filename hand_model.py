@@ -0,0 +1,67 @@
+"""
+Hand Landmark Model shared by the trackers and the synthetic hands
+"""
+
+import numpy as np
+from config import *
+
+NUM_LANDMARKS = 21
+
+# Bones of the hand landmark model (same as mp.solutions.hands.HAND_CONNECTIONS),
+# kept here so drawing does not need MediaPipe
+HAND_CONNECTIONS = (
+    (0, 1), (1, 2), (2, 3), (3, 4),
+    (0, 5), (5, 6), (6, 7), (7, 8),
+    (5, 9), (9, 10), (10, 11), (11, 12),
+    (9, 13), (13, 14), (14, 15), (15, 16),
+    (13, 17), (0, 17), (17, 18), (18, 19), (19, 20)
+)
+
+# Open right hand seen from the camera, wrist at the origin, fingers pointing
+# up. Units are hand scales (wrist to middle-finger MCP distance).
+OPEN_HAND = np.array([
+    (0.0, 0.0),                                                 # wrist
+    (-0.35, -0.25), (-0.6, -0.5), (-0.8, -0.75), (-0.95, -0.95),  # thumb
+    (-0.3, -1.0), (-0.35, -1.4), (-0.38, -1.65), (-0.4, -1.9),    # index
+    (0.0, -1.0), (0.0, -1.45), (0.0, -1.75), (0.0, -2.0),         # middle
+    (0.25, -0.95), (0.28, -1.35), (0.3, -1.6), (0.32, -1.8),      # ring
+    (0.45, -0.85), (0.52, -1.15), (0.56, -1.35), (0.6, -1.5),     # pinky
+], dtype=np.float32)
+
+# Landmark ids of each finger's MCP, PIP, DIP and tip
+FINGER_JOINTS = {
+    4: (1, 2, 3, 4),
+    8: (5, 6, 7, 8),
+    12: (9, 10, 11, 12),
+    16: (13, 14, 15, 16),
+    20: (17, 18, 19, 20),
+}
+
+# How far a fully curled fingertip ends up, as a fraction of the MCP position
+CURLED_TIP_RATIO = 0.4
+
+# Depth (MediaPipe relative z) a fingertip moves toward the camera when curled
+CURLED_TIP_DEPTH = -0.06
+
+
+def hand_pose(curls=None):
+    """Get a hand pose in hand-scale units with the given finger curls.
+
+    curls maps fingertip landmark ids to a curl in [0, 1]; 0 is the open
+    hand and 1 folds the fingertip down toward the palm. Returns (21, 3)
+    offsets from the wrist; z is MediaPipe-style relative depth.
+    """
+    pose = np.zeros((NUM_LANDMARKS, 3), dtype=np.float32)
+    pose[:, :2] = OPEN_HAND
+    for tip_id, curl in (curls or {}).items():
+        if curl <= 0:
+            continue
+        mcp = OPEN_HAND[FINGER_JOINTS[tip_id][0]]
+        curled_tip = mcp * CURLED_TIP_RATIO
+        for step, joint in enumerate(FINGER_JOINTS[tip_id][1:], start=1):
+            # Joints further along the finger fold further
+            fraction = step / 3.0
+            curled = mcp + (curled_tip - mcp) * fraction
+            pose[joint, :2] = OPEN_HAND[joint] + (curled - OPEN_HAND[joint]) * curl
+            pose[joint, 2] = CURLED_TIP_DEPTH * curl * fraction
+    return pose
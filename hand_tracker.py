@@ -1,89 +1,371 @@
 """
-Hand Tracking using MediaPipe
+Hand Tracking (MediaPipe or the OpenCV fallback, see hand_backends)
 """
 
+import math
 import cv2
-import mediapipe as mp
 import numpy as np
+import threading
+import time
+from profiling import StageProfiler
+from hand_backends import create_backend
+from hand_model import NUM_LANDMARKS, HAND_CONNECTIONS
 from config import *
 
+
+class LandmarkBuffer:
+    """Landmarks of every tracked hand in one frame.
+    
+    normalized holds MediaPipe's normalized (x, y, z) coordinates and pixel
+    the same landmarks scaled to the camera frame, both preallocated with
+    shape (hands, 21, 3). Only the first `count` hands are valid. The pixel
+    z coordinate is left in MediaPipe's relative depth units.
+    
+    Indexing returns the pixel landmarks of one hand, so
+    landmarks[0][INDEX_FINGER_TIP_ID] is the (x, y, z) of the primary index
+    fingertip.
+    """
+    
+    def __init__(self, max_hands=MAX_NUM_HANDS):
+        self.normalized = np.zeros((max_hands, NUM_LANDMARKS, 3), dtype=np.float32)
+        self.pixel = np.zeros((max_hands, NUM_LANDMARKS, 3), dtype=np.float32)
+        self.count = 0
+        self.timestamp = 0.0
+        self.frame_size = (CAMERA_WIDTH, CAMERA_HEIGHT)
+        self._scale = np.ones(3, dtype=np.float32)
+    
+    def __len__(self):
+        return self.count
+    
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("hand index out of range")
+        return self.pixel[index]
+    
+    @property
+    def hands(self):
+        """Pixel landmarks of the valid hands, shape (count, 21, 3)"""
+        return self.pixel[:self.count]
+    
+    def update_pixels(self, frame_size):
+        """Recompute the pixel view from the normalized landmarks"""
+        self.frame_size = frame_size
+        self._scale[0], self._scale[1] = frame_size
+        np.multiply(self.normalized[:self.count], self._scale, out=self.pixel[:self.count])
+    
+    def copy_from(self, other):
+        """Copy another buffer's landmarks into this one"""
+        self.count = other.count
+        self.timestamp = other.timestamp
+        self.frame_size = other.frame_size
+        self.normalized[:other.count] = other.normalized[:other.count]
+        self.pixel[:other.count] = other.pixel[:other.count]
+
+
+class LandmarkPredictor:
+    """Predict hand landmarks between inference frames.
+    
+    Keeps the last two tracked results and extrapolates every landmark with
+    a constant-velocity model. Predictions older than PREDICTION_MAX_AGE
+    hold the last tracked position instead of extrapolating further.
+    """
+    
+    def __init__(self, max_age=PREDICTION_MAX_AGE):
+        self.max_age = max_age
+        self.history = [LandmarkBuffer(), LandmarkBuffer()]
+        self.frame_size = (CAMERA_WIDTH, CAMERA_HEIGHT)
+        self.length = 0
+    
+    def update(self, landmarks, frame_size):
+        """Record the landmarks produced by an inference frame"""
+        self.history.reverse()
+        self.history[-1].copy_from(landmarks)
+        self.frame_size = frame_size
+        self.length = min(self.length + 1, 2)
+    
+    def reset(self):
+        """Forget the landmark history"""
+        self.length = 0
+    
+    def predict(self, timestamp, out):
+        """Write the predicted landmarks of every tracked hand into out"""
+        out.count = 0
+        out.timestamp = timestamp
+        if self.length == 0:
+            return out
+        
+        previous, current = self.history
+        out.copy_from(current)
+        out.timestamp = timestamp
+        if self.length < 2:
+            return out
+        
+        elapsed = timestamp - current.timestamp
+        
+        # Hands can only be matched up if the hand count did not change;
+        # past max_age the last tracked position is held
+        if (current.count != previous.count or 
+                current.timestamp <= previous.timestamp or not 0 < elapsed <= self.max_age):
+            return out
+        
+        scale = elapsed / (current.timestamp - previous.timestamp)
+        count = current.count
+        out.normalized[:count] += (current.normalized[:count] - previous.normalized[:count]) * scale
+        out.update_pixels(self.frame_size)
+        return out
+
+
 class HandTracker:
-    def __init__(self):
-        self.mp_hands = mp.solutions.hands
-        self.mp_drawing = mp.solutions.drawing_utils
-        self.mp_drawing_styles = mp.solutions.drawing_styles
-        
-        self.hands = self.mp_hands.Hands(
-            static_image_mode=False,
-            max_num_hands=MAX_NUM_HANDS,
-            min_detection_confidence=HAND_CONFIDENCE,
-            min_tracking_confidence=HAND_CONFIDENCE
-        )
+    def __init__(self, background_load=BACKGROUND_MODEL_LOAD, backend=None):
+        # The backend (HAND_TRACKING_BACKEND unless given) is loaded by
+        # _load_model, on a background thread unless background_load is
+        # False. Until it is ready, process_frame reports no hands.
+        self.backend = backend or create_backend()
         
         self.previous_landmarks = None
         self.finger_positions = []
+        
+        # Landmark buffers are reused round-robin so consumers downstream in
+        # the pipeline can still read a frame while the next one is tracked
+        self._buffers = [LandmarkBuffer() for _ in range(max(2, LANDMARK_BUFFER_POOL))]
+        self._buffer_index = 0
+        
+        # Frame skipping: run inference every Nth frame and predict the rest
+        self.skip_frames = max(1, SKIP_FRAMES)
+        self.frame_index = 0
+        self.predictor = LandmarkPredictor()
+        
+        # Region-of-interest tracking: crop (x1, y1, x2, y2) around the last hands
+        self.roi_tracking = ROI_TRACKING and self.backend.supports_roi
+        self.roi = None
+        self._tracked_hands = 0
+        self._frames_since_detection = 0
+        
+        # Longer side of full-frame inference input (None for native size)
+        self.inference_size = None
+        self.show_debug = DEBUG_MODE
+        
+        # Replaced by the app's shared profiler
+        self.profiler = StageProfiler(enabled=False)
+        
+        self._loader = None
+        self._start_loading(background_load)
+    
+    def _start_loading(self, background_load):
+        """Load the backend, on a background thread unless background_load is False"""
+        self.ready = threading.Event()
+        self.load_error = None
+        self.load_times = {}
+        if background_load:
+            self._loader = threading.Thread(target=self._load_model, name='model-load', daemon=True)
+            self._loader.start()
+        else:
+            self._load_model()
+    
+    def _load_model(self):
+        """Load the backend (for MediaPipe: import it, build the model and warm it up).
+        
+        The time of each phase is kept in load_times (seconds).
+        """
+        start = time.perf_counter()
+        try:
+            self.load_times.update(self.backend.load())
+        except Exception as e:
+            self.load_error = e
+            print(f"Error loading hand tracking model: {e}")
+            return
+        
+        self.ready.set()
+        print(f"Hand tracking model ({self.backend.name}) ready in {time.perf_counter() - start:.2f}s")
+    
+    def is_ready(self):
+        """Check if the model is loaded and frames are being tracked"""
+        return self.ready.is_set()
+    
+    def set_model_complexity(self, model_complexity):
+        """Request a MediaPipe model complexity.
+        
+        The model is recreated at the start of the next inference, on the
+        thread that runs it. Backends without one ignore it.
+        """
+        self.backend.set_model_complexity(model_complexity)
     
-    def process_frame(self, frame):
-        """Process a frame and return hand landmarks"""
-        # Convert BGR to RGB
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        
-        # Process the frame
-        results = self.hands.process(rgb_frame)
-        
-        landmarks_list = []
-        
-        if results.multi_hand_landmarks:
-            for hand_landmarks in results.multi_hand_landmarks:
-                landmarks = self._extract_landmarks(hand_landmarks, frame.shape)
-                landmarks_list.append(landmarks)
-                
-                # Draw landmarks if debug mode is enabled
-                if DEBUG_MODE and SHOW_LANDMARKS:
-                    self._draw_landmarks(frame, hand_landmarks)
-        
-        return landmarks_list
-    
-    def _extract_landmarks(self, hand_landmarks, frame_shape):
-        """Extract landmark coordinates from MediaPipe results"""
-        height, width, _ = frame_shape
-        landmarks = {}
-        
-        for idx, landmark in enumerate(hand_landmarks.landmark):
-            x = int(landmark.x * width)
-            y = int(landmark.y * height)
-            z = landmark.z
-            
-            landmarks[idx] = {
-                'x': x,
-                'y': y,
-                'z': z,
-                'relative_x': landmark.x,
-                'relative_y': landmark.y,
-                'relative_z': landmark.z
-            }
+    def set_inference_size(self, inference_size):
+        """Limit the longer side of the image fed to MediaPipe (None for native size)"""
+        self.inference_size = inference_size
+    
+    def _next_buffer(self):
+        """Get the next landmark buffer from the pool"""
+        self._buffer_index = (self._buffer_index + 1) % len(self._buffers)
+        return self._buffers[self._buffer_index]
+    
+    def process_frame(self, frame, timestamp=None):
+        """Process a frame and return a LandmarkBuffer of hand landmarks.
+        
+        With skip_frames > 1, the backend only runs on every Nth frame and the
+        landmarks for the frames in between are predicted from the recent
+        landmark history (or held, if LANDMARK_PREDICTION is off).
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        
+        if not self.ready.is_set():
+            # Model still loading
+            landmarks = self._next_buffer()
+            landmarks.count = 0
+            landmarks.timestamp = timestamp
+            return landmarks
+        
+        landmarks = self._next_buffer()
+        run_inference = self.frame_index % self.skip_frames == 0
+        self.frame_index += 1
+        
+        if run_inference:
+            self._run_inference(frame, landmarks)
+            landmarks.timestamp = timestamp
+            self.predictor.update(landmarks, (frame.shape[1], frame.shape[0]))
+        elif LANDMARK_PREDICTION:
+            self.predictor.predict(timestamp, landmarks)
+        else:
+            self.predictor.predict(self.predictor.history[-1].timestamp, landmarks)
+            landmarks.timestamp = timestamp
+        
+        # Draw landmarks if debug mode is enabled
+        if self.show_debug and SHOW_LANDMARKS:
+            for hand in landmarks:
+                self._draw_landmarks(frame, hand)
+        
+        # Draw the tracking crop in debug mode
+        if self.show_debug and SHOW_BOUNDING_BOXES and self.roi is not None:
+            cv2.rectangle(frame, self.roi[:2], self.roi[2:], COLORS['finger_tip'], 1)
+        
+        return landmarks
+    
+    def _run_inference(self, frame, landmarks):
+        """Run the backend on a frame and store the hand landmarks.
+        
+        Once hands are tracked, inference runs on a padded crop around them
+        scaled down to ROI_INFERENCE_SIZE, and the landmarks are mapped back
+        to full-frame coordinates. Because the crop follows the hands, they
+        stay near the same spot in MediaPipe's input and its own tracking
+        keeps working. Full-frame detection is used when the hands are lost,
+        when they come close to a crop edge, and every ROI_REDETECT_INTERVAL
+        frames while fewer hands are tracked than the backend can track.
+        """
+        height, width = frame.shape[:2]
+        landmarks.count = 0
+        
+        use_roi = self.roi_tracking and self.roi is not None
+        if (use_roi and self._tracked_hands < self.backend.max_hands and 
+                self._frames_since_detection >= ROI_REDETECT_INTERVAL):
+            use_roi = False
+        
+        near_edge = False
+        if use_roi:
+            x1, y1, x2, y2 = self.roi
+            roi_size = ROI_INFERENCE_SIZE
+            if self.inference_size:
+                roi_size = min(roi_size, self.inference_size)
+            self._process_image(frame[y1:y2, x1:x2], landmarks, roi_size)
+            if landmarks.count:
+                near_edge = self._near_roi_edge(landmarks, width, height)
+                self._map_from_roi(landmarks, self.roi, width, height)
+                self._frames_since_detection += 1
+        
+        if landmarks.count == 0:
+            # Hands lost (or not tracked yet): full-frame detection
+            self._process_image(frame, landmarks, self.inference_size)
+            self._frames_since_detection = 0
+        
+        landmarks.update_pixels((width, height))
+        self._tracked_hands = landmarks.count
+        
+        # Near a crop edge, keep this result but re-detect on the full frame next time
+        if self.roi_tracking and not near_edge:
+            self.roi = self._compute_roi(landmarks, width, height)
+        else:
+            self.roi = None
+        return landmarks
+    
+    def _process_image(self, image, landmarks, max_size=None):
+        """Run the backend on an image, optionally scaled down, and store the landmarks"""
+        if max_size and max(image.shape[:2]) > max_size:
+            start = self.profiler.start()
+            scale = max_size / max(image.shape[:2])
+            image = cv2.resize(image, (max(1, int(image.shape[1] * scale)), 
+                                       max(1, int(image.shape[0] * scale))), 
+                               interpolation=cv2.INTER_AREA)
+            self.profiler.stop('resize', start)
         
+        landmarks.count = self.backend.process(image, landmarks.normalized, self.profiler)
         return landmarks
     
-    def _draw_landmarks(self, frame, hand_landmarks):
+    def _near_roi_edge(self, landmarks, width, height):
+        """Check if any landmark (in crop coordinates) is close to an inner crop edge"""
+        x1, y1, x2, y2 = self.roi
+        hands = landmarks.normalized[:landmarks.count]
+        xs, ys = hands[..., 0], hands[..., 1]
+        margin = ROI_EDGE_MARGIN
+        
+        # Crop edges that coincide with the frame border are not a problem
+        return bool((x1 > 0 and xs.min() < margin) or 
+                    (x2 < width and xs.max() > 1 - margin) or 
+                    (y1 > 0 and ys.min() < margin) or 
+                    (y2 < height and ys.max() > 1 - margin))
+    
+    def _map_from_roi(self, landmarks, roi, width, height):
+        """Map normalized crop coordinates back to normalized frame coordinates"""
+        x1, y1, x2, y2 = roi
+        hands = landmarks.normalized[:landmarks.count]
+        hands[..., 0] *= (x2 - x1) / width
+        hands[..., 0] += x1 / width
+        hands[..., 1] *= (y2 - y1) / height
+        hands[..., 1] += y1 / height
+        # MediaPipe's z uses roughly the same scale as x
+        hands[..., 2] *= (x2 - x1) / width
+    
+    def _compute_roi(self, landmarks, width, height):
+        """Compute a padded square crop around all tracked hands (None if no hands)"""
+        if landmarks.count == 0:
+            return None
+        
+        hands = landmarks.hands
+        min_x, max_x = float(hands[..., 0].min()), float(hands[..., 0].max())
+        min_y, max_y = float(hands[..., 1].min()), float(hands[..., 1].max())
+        
+        size = max(max_x - min_x, max_y - min_y)
+        size = max(size * (1 + 2 * ROI_PADDING), ROI_MIN_SIZE)
+        center_x = (min_x + max_x) / 2
+        center_y = (min_y + max_y) / 2
+        
+        x1 = int(max(center_x - size / 2, 0))
+        y1 = int(max(center_y - size / 2, 0))
+        x2 = int(min(center_x + size / 2, width))
+        y2 = int(min(center_y + size / 2, height))
+        if x2 - x1 < 2 or y2 - y1 < 2:
+            return None
+        return (x1, y1, x2, y2)
+    
+    def _draw_landmarks(self, frame, hand):
         """Draw hand landmarks on the frame"""
-        self.mp_drawing.draw_landmarks(
-            frame,
-            hand_landmarks,
-            self.mp_hands.HAND_CONNECTIONS,
-            self.mp_drawing_styles.get_default_hand_landmarks_style(),
-            self.mp_drawing_styles.get_default_hand_connections_style()
-        )
+        points = hand[:, :2].astype(np.int32)
+        for start, end in HAND_CONNECTIONS:
+            cv2.line(frame, tuple(points[start]), tuple(points[end]), 
+                     COLORS['hand_landmarks'], 2)
+        for point in points:
+            cv2.circle(frame, tuple(point), 3, COLORS['landmark_joints'], -1)
     
     def get_index_finger_tip(self, landmarks):
         """Get the index finger tip position"""
-        if landmarks and INDEX_FINGER_TIP_ID in landmarks:
+        if landmarks is not None and len(landmarks) > INDEX_FINGER_TIP_ID:
             return landmarks[INDEX_FINGER_TIP_ID]
         return None
     
     def get_palm_center(self, landmarks):
         """Get the palm center position"""
-        if landmarks and PALM_CENTER_ID in landmarks:
+        if landmarks is not None and len(landmarks) > PALM_CENTER_ID:
             return landmarks[PALM_CENTER_ID]
         return None
     
@@ -92,12 +374,9 @@ class HandTracker:
         finger_tip = self.get_index_finger_tip(landmarks)
         palm_center = self.get_palm_center(landmarks)
         
-        if finger_tip and palm_center:
-            distance = np.sqrt(
-                (finger_tip['x'] - palm_center['x'])**2 + 
-                (finger_tip['y'] - palm_center['y'])**2
-            )
-            return distance
+        if finger_tip is not None and palm_center is not None:
+            return float(np.hypot(finger_tip[0] - palm_center[0], 
+                                  finger_tip[1] - palm_center[1]))
         return None
     
     def is_finger_pressed(self, landmarks, threshold_distance=PRESS_THRESHOLD_DISTANCE):
@@ -109,56 +388,74 @@ class HandTracker:
     
     def get_finger_movement(self, current_landmarks, previous_landmarks):
         """Calculate finger movement between frames"""
-        if not current_landmarks or not previous_landmarks:
+        if current_landmarks is None or previous_landmarks is None:
             return 0
         
         current_tip = self.get_index_finger_tip(current_landmarks)
         previous_tip = self.get_index_finger_tip(previous_landmarks)
         
-        if current_tip and previous_tip:
-            movement = np.sqrt(
-                (current_tip['x'] - previous_tip['x'])**2 + 
-                (current_tip['y'] - previous_tip['y'])**2
-            )
-            return movement
+        if current_tip is not None and previous_tip is not None:
+            return float(np.hypot(current_tip[0] - previous_tip[0], 
+                                  current_tip[1] - previous_tip[1]))
         return 0
     
+    def calculate_fingertip_distances(self, landmarks, tip_ids=FINGER_TIP_IDS):
+        """Distances from every fingertip to the palm center, shape (hands, fingers)"""
+        hands = landmarks.hands
+        offsets = hands[:, tip_ids, :2] - hands[:, PALM_CENTER_ID, None, :2]
+        return np.sqrt(np.einsum('hfi,hfi->hf', offsets, offsets))
+    
+    def get_pressed_fingers(self, landmarks, threshold_distance=PRESS_THRESHOLD_DISTANCE, 
+                            tip_ids=FINGER_TIP_IDS):
+        """Press state of every fingertip of every hand, shape (hands, fingers)"""
+        return self.calculate_fingertip_distances(landmarks, tip_ids) < threshold_distance
+    
+    def get_fingertip_movements(self, current, previous, tip_ids=FINGER_TIP_IDS):
+        """Movement of every fingertip between two frames, shape (hands, fingers).
+        
+        Only hands present in both frames are compared.
+        """
+        count = min(current.count, previous.count)
+        offsets = (current.pixel[:count, tip_ids, :2] - 
+                   previous.pixel[:count, tip_ids, :2])
+        return np.sqrt(np.einsum('hfi,hfi->hf', offsets, offsets))
+    
     def draw_finger_info(self, frame, landmarks):
         """Draw finger position and distance information"""
-        if not landmarks:
+        if landmarks is None or len(landmarks) <= max(INDEX_FINGER_TIP_ID, PALM_CENTER_ID):
             return
         
-        finger_tip = self.get_index_finger_tip(landmarks)
-        palm_center = self.get_palm_center(landmarks)
+        # Plain floats, so a frame allocates no NumPy scalars or views
+        tip_x, tip_y = landmarks.item(INDEX_FINGER_TIP_ID, 0), landmarks.item(INDEX_FINGER_TIP_ID, 1)
+        palm_x, palm_y = landmarks.item(PALM_CENTER_ID, 0), landmarks.item(PALM_CENTER_ID, 1)
+        tip_point = (int(tip_x), int(tip_y))
+        palm_point = (int(palm_x), int(palm_y))
+        
+        # Draw finger tip
+        cv2.circle(frame, tip_point, 8, COLORS['finger_tip'], -1)
+        
+        # Draw palm center
+        cv2.circle(frame, palm_point, 6, COLORS['palm_center'], -1)
+        
+        # Draw distance line
+        if self.show_debug and SHOW_DISTANCE_LINES:
+            cv2.line(frame, tip_point, palm_point, COLORS['hand_landmarks'], 2)
+        
+        # Show distance text
+        distance = math.hypot(tip_x - palm_x, tip_y - palm_y)
+        cv2.putText(frame, f"Dist: {distance:.1f}px", 
+                   (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, 
+                   COLORS['text_normal'], 2)
         
-        if finger_tip and palm_center:
-            # Draw finger tip
-            cv2.circle(frame, (finger_tip['x'], finger_tip['y']), 8, COLORS['finger_tip'], -1)
-            
-            # Draw palm center
-            cv2.circle(frame, (palm_center['x'], palm_center['y']), 6, COLORS['palm_center'], -1)
-            
-            # Draw distance line
-            if DEBUG_MODE and SHOW_DISTANCE_LINES:
-                cv2.line(frame, 
-                        (finger_tip['x'], finger_tip['y']), 
-                        (palm_center['x'], palm_center['y']), 
-                        COLORS['hand_landmarks'], 2)
-            
-            # Show distance text
-            distance = self.calculate_finger_distance(landmarks)
-            if distance is not None:
-                cv2.putText(frame, f"Dist: {distance:.1f}px", 
-                           (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, 
-                           COLORS['text_normal'], 2)
-                
-                # Show press status
-                is_pressed = self.is_finger_pressed(landmarks)
-                status = "PRESSED" if is_pressed else "HOVER"
-                color = COLORS['key_pressed'] if is_pressed else COLORS['key_hover']
-                cv2.putText(frame, status, (10, 60), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
+        # Show press status (as is_finger_pressed)
+        is_pressed = distance < PRESS_THRESHOLD_DISTANCE
+        status = "PRESSED" if is_pressed else "HOVER"
+        color = COLORS['key_pressed'] if is_pressed else COLORS['key_hover']
+        cv2.putText(frame, status, (10, 60), 
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
     
     def release(self):
-        """Release MediaPipe resources"""
-        self.hands.close() 
\ No newline at end of file
+        """Release the backend's resources"""
+        if self._loader is not None:
+            self._loader.join()
+        self.backend.close()
\ No newline at end of file
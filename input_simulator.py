@@ -2,93 +2,327 @@
 Input Simulation for Virtual Keyboard
 """
 
-import pyautogui
-import keyboard
+import queue
+import threading
 import time
+from collections import deque
+from profiling import StageProfiler
 from config import *
 
+_pyautogui = None
+_keyboard = None
+
+
+def get_pyautogui():
+    """Import and configure pyautogui on first use"""
+    global _pyautogui
+    if _pyautogui is None:
+        import pyautogui
+        
+        # Configure pyautogui for safety
+        pyautogui.FAILSAFE = True
+        pyautogui.PAUSE = 0.01  # Small delay between actions
+        _pyautogui = pyautogui
+    return _pyautogui
+
+
+def get_keyboard():
+    """Import the keyboard library on first use"""
+    global _keyboard
+    if _keyboard is None:
+        import keyboard
+        _keyboard = keyboard
+    return _keyboard
+
+
 class InputSimulator:
-    def __init__(self):
+    """Simulate keystrokes through pyautogui and the keyboard library.
+    
+    The OS-facing calls run on an injection worker thread fed by a queue,
+    so press_key() never stalls the render loop. The worker drains every
+    queued event at once and coalesces runs of plain characters into a
+    single type_text call, keeping the order of all events. Debouncing is
+    still decided synchronously in press_key(). pyautogui and keyboard are
+    only imported when the first event is injected.
+    """
+    
+    def __init__(self, async_injection=ASYNC_INJECTION):
         self.last_press_time = 0
+        self.last_press_times = {}  # per finger
         self.debounce_time = DEBOUNCE_TIME
         self.pressed_keys = set()
+        self.clock = time.time
         
-        # Configure pyautogui for safety
-        pyautogui.FAILSAFE = True
-        pyautogui.PAUSE = 0.01  # Small delay between actions
+        # Seconds each event spent queued before it was injected
+        self.injection_delays = deque(maxlen=INJECTION_STATS_SIZE)
+        
+        # End-to-end latency of recent keystrokes (see _record_keystroke)
+        self.keystroke_latencies = deque(maxlen=INJECTION_STATS_SIZE)
+        self.debounce_rejections = 0
+        
+        # Replaced by the app's shared profiler
+        self.profiler = StageProfiler(enabled=False)
+        
+        # Callbacks told about every typed key and text (see add_key_listener)
+        self.key_listeners = []
+        
+        self._events = queue.Queue()
+        self._worker = None
+        if async_injection:
+            self._worker = threading.Thread(target=self._injection_loop, 
+                                            name='input-injection', daemon=True)
+            self._worker.start()
     
-    def can_press_key(self):
-        """Check if enough time has passed since last key press"""
-        current_time = time.time()
-        return current_time - self.last_press_time >= self.debounce_time
+    def can_press_key(self, finger=None):
+        """Check if enough time has passed since last key press.
+        
+        With a finger (any hashable id, e.g. (hand, tip_id)) only that
+        finger's last press counts, so different fingers do not debounce
+        each other. Without one, the last press of any finger counts.
+        """
+        current_time = self.clock()
+        if finger is None:
+            last_press_time = self.last_press_time
+        else:
+            last_press_time = self.last_press_times.get(finger, 0)
+        return current_time - last_press_time >= self.debounce_time
     
-    def press_key(self, key_char):
-        """Simulate a key press"""
-        if not self.can_press_key():
+    def press_key(self, key_char, capture_time=None, finger=None):
+        """Simulate a key press.
+        
+        capture_time is the capture timestamp of the camera frame the press
+        was detected on, used for end-to-end latency reporting. finger
+        selects a per-finger debounce (see can_press_key). Returns True if
+        the press passed the debounce check and was queued for injection.
+        Injection errors are reported by the worker.
+        """
+        if not self.can_press_key(finger):
+            self.debounce_rejections += 1
             return False
         
-        try:
-            if self.is_special_key(key_char):
-                self._press_special_key(key_char)
-            else:
-                self._press_character_key(key_char)
+        self._submit('press', key_char, capture_time)
+        self.last_press_time = self.clock()
+        if finger is not None:
+            self.last_press_times[finger] = self.last_press_time
+        return True
+    
+    def add_key_listener(self, callback):
+        """Register callback(kind, value) for the typed-character stream.
+        
+        It is called with ('press', key_char) for every accepted key press
+        and ('text', text) for every type_text call, on the thread that
+        submitted the event, right after it is queued. Holds and releases
+        are not reported.
+        """
+        self.key_listeners.append(callback)
+    
+    def remove_key_listener(self, callback):
+        """Unregister a callback added with add_key_listener"""
+        self.key_listeners.remove(callback)
+    
+    def _submit(self, kind, value, capture_time=None):
+        """Queue an event for the injection worker (or inject it now if there is none)"""
+        now = self.clock()
+        event = (kind, value, now, now if capture_time is None else capture_time)
+        if self._worker is not None:
+            self._events.put(event)
+        else:
+            self._dispatch([event])
+        
+        # Listeners run after queueing so they never delay the injection
+        if kind in ('press', 'text'):
+            for callback in self.key_listeners:
+                callback(kind, value)
+    
+    def _injection_loop(self):
+        """Injection worker: inject queued events until the stop sentinel arrives"""
+        running = True
+        while running:
+            batch = [self._events.get()]
             
-            self.last_press_time = time.time()
-            return True
+            # Take everything else already queued so plain characters can be coalesced
+            while True:
+                try:
+                    batch.append(self._events.get_nowait())
+                except queue.Empty:
+                    break
             
-        except Exception as e:
-            print(f"Error pressing key '{key_char}': {e}")
-            return False
+            if None in batch:
+                running = False
+                batch = batch[:batch.index(None)]
+            
+            self._dispatch(batch)
+    
+    def _dispatch(self, events):
+        """Inject a batch of events in order, coalescing runs of plain characters"""
+        start = self.profiler.start()
+        text = ''
+        text_events = []
+        for event in events:
+            kind, value, timestamp, capture_time = event
+            delay = self.clock() - timestamp
+            self.injection_delays.append(delay)
+            self.profiler.record('injection_queue', delay)
+            
+            # Only single characters can be typed as text; other key names are pressed
+            if kind == 'text' or (kind == 'press' and len(value) == 1 and not self.is_special_key(value)):
+                text += value
+                text_events.append(event)
+                continue
+            
+            if text:
+                self._flush_text(text, text_events)
+                text = ''
+                text_events = []
+            
+            if kind == 'press':
+                injection_start = self.clock()
+                if self.is_special_key(value):
+                    self._press_special_key(value)
+                else:
+                    self._press_character_key(value)
+                self._record_keystroke(event, injection_start, self.clock())
+            elif kind == 'hold':
+                self._hold_key(value)
+            elif kind == 'release':
+                self._release_key(value)
+        
+        if text:
+            self._flush_text(text, text_events)
+        
+        self.profiler.stop('injection', start)
+    
+    def _flush_text(self, text, events):
+        """Type coalesced text and record the latency of each press in it"""
+        injection_start = self.clock()
+        self._type_text(text)
+        injected_time = self.clock()
+        for event in events:
+            if event[0] == 'press':
+                self._record_keystroke(event, injection_start, injected_time)
+    
+    def _record_keystroke(self, event, injection_start, injected_time):
+        """Record the latency breakdown of an injected key press.
+        
+        processing is capture -> press decision (tracking and typing logic),
+        queue is decision -> injection start, injection is the OS call itself
+        and total is capture -> key event issued. A press rejected by the
+        debounce is never injected; those are counted in debounce_rejections.
+        """
+        kind, value, submitted_time, capture_time = event
+        total = injected_time - capture_time
+        self.keystroke_latencies.append({
+            'key': value,
+            'capture_time': capture_time,
+            'processing_ms': (submitted_time - capture_time) * 1000,
+            'queue_ms': (injection_start - submitted_time) * 1000,
+            'injection_ms': (injected_time - injection_start) * 1000,
+            'total_ms': total * 1000
+        })
+        self.profiler.record('keystroke_latency', total)
+    
+    def get_latency_report(self):
+        """Summarize end-to-end keystroke latency (milliseconds)"""
+        report = {'keystrokes': len(self.keystroke_latencies), 
+                  'debounce_rejections': self.debounce_rejections}
+        for field in ('processing_ms', 'queue_ms', 'injection_ms', 'total_ms'):
+            values = sorted(record[field] for record in self.keystroke_latencies)
+            if values:
+                report[field] = {
+                    'mean': sum(values) / len(values),
+                    'p50': values[len(values) // 2],
+                    'p95': values[min(len(values) - 1, int(len(values) * 0.95))],
+                    'max': values[-1]
+                }
+        return report
+    
+    def print_latency_report(self):
+        """Print one line per recent keystroke followed by a summary"""
+        for record in self.keystroke_latencies:
+            print(f"  {record['key']!r}: total {record['total_ms']:.1f}ms "
+                  f"(processing {record['processing_ms']:.1f}, queue {record['queue_ms']:.1f}, "
+                  f"injection {record['injection_ms']:.1f})")
+        
+        report = self.get_latency_report()
+        print(f"Keystrokes: {report['keystrokes']}, "
+              f"rejected by debounce: {report['debounce_rejections']}")
+        for field in ('processing_ms', 'queue_ms', 'injection_ms', 'total_ms'):
+            if field in report:
+                stats = report[field]
+                print(f"  {field[:-3]}: mean {stats['mean']:.1f}ms, p50 {stats['p50']:.1f}ms, "
+                      f"p95 {stats['p95']:.1f}ms, max {stats['max']:.1f}ms")
     
     def is_special_key(self, key_char):
         """Check if the key is a special key"""
         return key_char in SPECIAL_KEYS
     
-    def _press_character_key(self, key_char):
-        """Press a character key"""
-        # Use pyautogui for character keys
-        pyautogui.press(key_char)
-        print(f"Pressed character: {key_char}")
-    
     def _press_special_key(self, key_char):
         """Press a special key"""
         special_key_name = SPECIAL_KEYS.get(key_char, key_char)
         
-        # Use keyboard library for special keys
-        keyboard.press_and_release(special_key_name)
-        print(f"Pressed special key: {key_char} -> {special_key_name}")
+        try:
+            # Use keyboard library for special keys
+            get_keyboard().press_and_release(special_key_name)
+            print(f"Pressed special key: {key_char} -> {special_key_name}")
+        except Exception as e:
+            print(f"Error pressing key '{key_char}': {e}")
+    
+    def _press_character_key(self, key_char):
+        """Press a key by its pyautogui name"""
+        try:
+            get_pyautogui().press(key_char)
+            print(f"Pressed character: {key_char}")
+        except Exception as e:
+            print(f"Error pressing key '{key_char}': {e}")
+    
+    def _type_text(self, text):
+        """Type a run of plain characters"""
+        try:
+            # Use pyautogui for character keys
+            get_pyautogui().write(text)
+            print(f"Typed text: {text}")
+        except Exception as e:
+            print(f"Error typing text '{text}': {e}")
     
     def hold_key(self, key_char):
         """Hold down a key"""
         if key_char not in self.pressed_keys:
-            try:
-                if self.is_special_key(key_char):
-                    special_key_name = SPECIAL_KEYS.get(key_char, key_char)
-                    keyboard.press(special_key_name)
-                else:
-                    pyautogui.keyDown(key_char)
-                
-                self.pressed_keys.add(key_char)
-                print(f"Holding key: {key_char}")
-                
-            except Exception as e:
-                print(f"Error holding key '{key_char}': {e}")
+            self.pressed_keys.add(key_char)
+            self._submit('hold', key_char)
+    
+    def _hold_key(self, key_char):
+        """Press a key down without releasing it"""
+        try:
+            if self.is_special_key(key_char):
+                special_key_name = SPECIAL_KEYS.get(key_char, key_char)
+                get_keyboard().press(special_key_name)
+            else:
+                get_pyautogui().keyDown(key_char)
+            
+            print(f"Holding key: {key_char}")
+            
+        except Exception as e:
+            print(f"Error holding key '{key_char}': {e}")
     
     def release_key(self, key_char):
         """Release a held key"""
         if key_char in self.pressed_keys:
-            try:
-                if self.is_special_key(key_char):
-                    special_key_name = SPECIAL_KEYS.get(key_char, key_char)
-                    keyboard.release(special_key_name)
-                else:
-                    pyautogui.keyUp(key_char)
-                
-                self.pressed_keys.remove(key_char)
-                print(f"Released key: {key_char}")
-                
-            except Exception as e:
-                print(f"Error releasing key '{key_char}': {e}")
+            self.pressed_keys.remove(key_char)
+            self._submit('release', key_char)
+    
+    def _release_key(self, key_char):
+        """Release a key held down by _hold_key"""
+        try:
+            if self.is_special_key(key_char):
+                special_key_name = SPECIAL_KEYS.get(key_char, key_char)
+                get_keyboard().release(special_key_name)
+            else:
+                get_pyautogui().keyUp(key_char)
+            
+            print(f"Released key: {key_char}")
+            
+        except Exception as e:
+            print(f"Error releasing key '{key_char}': {e}")
     
     def release_all_keys(self):
         """Release all currently held keys"""
@@ -97,11 +331,19 @@ class InputSimulator:
     
     def type_text(self, text):
         """Type a string of text"""
-        try:
-            pyautogui.write(text)
-            print(f"Typed text: {text}")
-        except Exception as e:
-            print(f"Error typing text '{text}': {e}")
+        if text:
+            self._submit('text', text)
+    
+    def get_injection_stats(self):
+        """Get queueing delay statistics (milliseconds) for recent events"""
+        delays = list(self.injection_delays)
+        if not delays:
+            return {'count': 0, 'mean_ms': 0.0, 'max_ms': 0.0}
+        return {
+            'count': len(delays),
+            'mean_ms': sum(delays) / len(delays) * 1000,
+            'max_ms': max(delays) * 1000
+        }
     
     def get_key_info(self, key_char):
         """Get information about a key"""
@@ -119,5 +361,40 @@ class InputSimulator:
             }
     
     def cleanup(self):
-        """Clean up resources and release any held keys"""
-        self.release_all_keys() 
\ No newline at end of file
+        """Release any held keys and drain the injection queue"""
+        self.release_all_keys()
+        
+        if self._worker is not None:
+            self._events.put(None)
+            self._worker.join(INJECTION_SHUTDOWN_TIMEOUT)
+            self._worker = None
+
+
+class NullInputSimulator(InputSimulator):
+    """InputSimulator that runs the full queueing path but issues no OS events.
+    
+    Used by benchmarks and headless runs. injection_cost simulates the time
+    an OS call would take, in seconds.
+    """
+    
+    def __init__(self, async_injection=ASYNC_INJECTION, injection_cost=0.0):
+        self.injection_cost = injection_cost
+        super().__init__(async_injection)
+    
+    def _press_special_key(self, key_char):
+        if self.injection_cost:
+            time.sleep(self.injection_cost)
+    
+    def _press_character_key(self, key_char):
+        if self.injection_cost:
+            time.sleep(self.injection_cost)
+    
+    def _type_text(self, text):
+        if self.injection_cost:
+            time.sleep(self.injection_cost)
+    
+    def _hold_key(self, key_char):
+        pass
+    
+    def _release_key(self, key_char):
+        pass
@@ -0,0 +1,190 @@
+"""
+Thin Client for the Networked Keyboard Server
+
+Reads the camera and sends either JPEG frames (the server tracks hands)
+or landmarks tracked locally (--mode landmarks) to keyboard_server.py,
+and prints the key events streamed back, or injects them on this machine
+with --inject.
+
+Usage: python keyboard_client.py [--server 127.0.0.1:8765] [--mode frames|landmarks]
+                                 [--batch 1] [--inject]
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+import cv2
+from net_protocol import (MODE_FRAMES, MODE_LANDMARKS, MSG_ERROR, MSG_EVENTS, ProtocolError, decode_event_batch,
+                          encode_frame_batch, encode_hello, encode_landmark_batch, read_message)
+from config import *
+
+
+class KeyboardClient:
+    """Connection to a keyboard server.
+
+    Every send waits for the server's EVENTS reply, so one batch is in
+    flight at a time.
+    """
+
+    def __init__(self, host=NET_HOST, port=NET_PORT, mode=MODE_FRAMES, frame_size=(CAMERA_WIDTH, CAMERA_HEIGHT)):
+        self.host = host
+        self.port = port
+        self.mode = mode
+        self.frame_size = frame_size
+        self.reader = None
+        self.writer = None
+
+    async def connect(self):
+        """Open the connection and say HELLO"""
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        self.writer.write(encode_hello(self.mode, self.frame_size))
+        await self.writer.drain()
+
+    async def send_landmarks(self, frames):
+        """Send (timestamp, hand count, normalized landmarks) frames.
+
+        Returns (frames processed, [(timestamp, capture time, kind, value)]).
+        """
+        self.writer.write(encode_landmark_batch(frames))
+        return await self._read_events()
+
+    async def send_frames(self, frames, quality=NET_JPEG_QUALITY):
+        """JPEG-encode and send (timestamp, BGR image) frames; returns like send_landmarks"""
+        encoded = []
+        for timestamp, image in frames:
+            success, data = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+            if not success:
+                raise ValueError("Frame could not be encoded")
+            encoded.append((timestamp, data.tobytes()))
+        return await self.send_encoded_frames(encoded)
+
+    async def send_encoded_frames(self, frames):
+        """Send (timestamp, encoded image bytes) frames; returns like send_landmarks"""
+        self.writer.write(encode_frame_batch(frames))
+        return await self._read_events()
+
+    async def _read_events(self):
+        await self.writer.drain()
+        message = await read_message(self.reader)
+        if message is None:
+            raise ConnectionError("Server closed the connection")
+        kind, payload = message
+        if kind == MSG_ERROR:
+            raise ProtocolError(payload.decode('utf-8', 'replace'))
+        if kind != MSG_EVENTS:
+            raise ProtocolError(f"Unexpected message type {kind}")
+        return decode_event_batch(payload)
+
+    async def close(self):
+        """Close the connection"""
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except ConnectionError:
+                pass
+            self.writer = None
+
+
+def inject_event(input_simulator, kind, value):
+    """Inject an event received from the server (already debounced there)"""
+    if kind == 'press':
+        input_simulator.press_key(value)
+    elif kind == 'text':
+        input_simulator.type_text(value)
+    elif kind == 'hold':
+        input_simulator.hold_key(value)
+    elif kind == 'release':
+        input_simulator.release_key(value)
+
+
+async def run_client(args):
+    """Stream the camera to the server until interrupted"""
+    host, _, port = args.server.rpartition(':')
+    mode = MODE_LANDMARKS if args.mode == 'landmarks' else MODE_FRAMES
+
+    capture = cv2.VideoCapture(CAMERA_INDEX)
+    capture.set(cv2.CAP_PROP_FRAME_WIDTH, CAMERA_WIDTH)
+    capture.set(cv2.CAP_PROP_FRAME_HEIGHT, CAMERA_HEIGHT)
+    if not capture.isOpened():
+        print("Error: Could not open camera")
+        return False
+    frame_size = (int(capture.get(cv2.CAP_PROP_FRAME_WIDTH)), int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+
+    tracker = None
+    if mode == MODE_LANDMARKS:
+        from hand_tracker import HandTracker
+        tracker = HandTracker(background_load=False)
+        tracker.show_debug = False
+
+    input_simulator = None
+    if args.inject:
+        from input_simulator import InputSimulator
+        input_simulator = InputSimulator()
+        input_simulator.debounce_time = 0
+
+    client = KeyboardClient(host or NET_HOST, int(port or NET_PORT), mode, frame_size)
+    await client.connect()
+    print(f"Connected to {client.host}:{client.port} ({args.mode})")
+
+    loop = asyncio.get_running_loop()
+    batch = []
+    try:
+        while True:
+            success, frame = await loop.run_in_executor(None, capture.read)
+            if not success:
+                print("Error reading frame")
+                break
+            timestamp = time.time()
+            if tracker is not None:
+                landmarks = tracker.process_frame(frame, timestamp)
+                batch.append((timestamp, landmarks.count, landmarks.normalized.copy()))
+            else:
+                batch.append((timestamp, frame))
+            if len(batch) < args.batch:
+                continue
+
+            if tracker is not None:
+                _, events = await client.send_landmarks(batch)
+            else:
+                _, events = await client.send_frames(batch)
+            batch = []
+
+            for _, capture_time, kind, value in events:
+                print(f"{kind}: {value!r} ({(time.time() - capture_time) * 1000:.0f}ms after capture)")
+                if input_simulator is not None:
+                    inject_event(input_simulator, kind, value)
+    finally:
+        await client.close()
+        capture.release()
+        if tracker is not None:
+            tracker.release()
+        if input_simulator is not None:
+            input_simulator.cleanup()
+    return True
+
+
+def main():
+    """Run the client with command-line options"""
+    parser = argparse.ArgumentParser(description="Networked virtual keyboard client")
+    parser.add_argument('--server', default=f"{NET_HOST}:{NET_PORT}", help="server host:port")
+    parser.add_argument('--mode', choices=['frames', 'landmarks'], default='frames',
+                        help="send camera frames, or landmarks tracked on this machine")
+    parser.add_argument('--batch', type=int, default=NET_BATCH_FRAMES, help="frames per message")
+    parser.add_argument('--inject', action='store_true', help="inject the key events on this machine")
+    args = parser.parse_args()
+
+    try:
+        return asyncio.run(run_client(args))
+    except KeyboardInterrupt:
+        print("Client stopped")
+        return True
+    except (ConnectionError, ProtocolError) as e:
+        print(f"Connection error: {e}")
+        return False
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -2,36 +2,251 @@
 Virtual Keyboard Layout and UI Management
 """
 
+import hashlib
+import json
+import os
+import threading
 import cv2
 import numpy as np
 from config import *
 
+KEY_STATES = ('normal', 'hover', 'pressed')
+
+# Bump when the compiled bundle format or the key rendering changes
+BUNDLE_VERSION = 2
+
+# Keys whose character is 'layout:<name>' switch to that layout
+LAYOUT_KEY_PREFIX = 'layout:'
+
+# Relative LAYOUT_DIR and LAYOUT_CACHE_DIR are inside the program directory
+PROGRAM_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def program_path(path):
+    """Resolve a configured path against the program directory (absolute paths are kept)"""
+    return os.path.join(PROGRAM_DIR, path)
+
+
+def load_layout(name):
+    """Load a layout definition from LAYOUT_DIR/<name>.json.
+    
+    A definition holds 'rows' of key characters, plus optional 'widths'
+    (in key widths, default 1) and 'labels' (text drawn instead of the
+    character), both keyed by character, and 'trailing': keys appended to
+    the end of a row (keyed by row index) that are left out of centering
+    the row, so adding them does not move the row's other keys.
+    """
+    with open(os.path.join(program_path(LAYOUT_DIR), f"{name}.json"), encoding='utf-8') as f:
+        layout = json.load(f)
+    layout.setdefault('name', name)
+    layout.setdefault('widths', {})
+    layout.setdefault('labels', {})
+    layout.setdefault('trailing', {})
+    return layout
+
+
+def list_layouts():
+    """Get the names of the layouts in LAYOUT_DIR"""
+    layout_dir = program_path(LAYOUT_DIR)
+    if not os.path.isdir(layout_dir):
+        return []
+    return sorted(os.path.splitext(name)[0] for name in os.listdir(layout_dir) 
+                  if name.endswith('.json'))
+
+
+class LayoutBundle:
+    """A layout compiled for hit-testing and drawing.
+    
+    Holds the key geometry, the display-sized hit-test label map and one
+    pre-rendered layer per key state. Bundles are saved as .npy files and
+    loaded memory-mapped read-only, so later launches map them instead of
+    rendering every key again. A bundle is never modified once built, so
+    one copy is shared by every VirtualKeyboard in the process (see
+    shared_bundle); each keyboard renders its own suggestion keys.
+    """
+    
+    def __init__(self, name, keys, hit_map, layers, layer_rect):
+        self.name = name
+        self.keys = keys
+        self.key_ids = list(keys)
+        self.suggestion_ids = [key_id for key_id, key in keys.items() if key.get('suggestion')]
+        self.hit_map = hit_map
+        self.layers = layers  # (len(KEY_STATES), height, width, 3)
+        self.layers.flags.writeable = False  # shared between keyboards
+        self.state_layers = dict(zip(KEY_STATES, layers))
+        self.layer_rect = tuple(layer_rect)
+        
+        # Sprite slices of each key inside the layers (rectangles are inclusive)
+        x1, y1, width, height = self.layer_rect
+        self.key_slices = {}
+        for key_id, key in keys.items():
+            kx1, ky1 = max(key['x'] - x1, 0), max(key['y'] - y1, 0)
+            kx2 = min(key['x'] + key['width'] + 1 - x1, width)
+            ky2 = min(key['y'] + key['height'] + 1 - y1, height)
+            if kx2 > kx1 and ky2 > ky1:
+                self.key_slices[key_id] = (slice(ky1, ky2), slice(kx1, kx2))
+    
+    def save(self, directory):
+        """Write the bundle to a directory (replaced atomically)"""
+        temporary = f"{directory}.tmp{os.getpid()}"
+        os.makedirs(temporary, exist_ok=True)
+        np.save(os.path.join(temporary, 'hit_map.npy'), self.hit_map)
+        np.save(os.path.join(temporary, 'layers.npy'), self.layers)
+        with open(os.path.join(temporary, 'keys.json'), 'w', encoding='utf-8') as f:
+            json.dump({'name': self.name, 'layer_rect': self.layer_rect, 'keys': self.keys}, f)
+        os.replace(temporary, directory)
+    
+    @classmethod
+    def load(cls, directory):
+        """Memory-map a bundle written by save()"""
+        with open(os.path.join(directory, 'keys.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        hit_map = np.load(os.path.join(directory, 'hit_map.npy'), mmap_mode='r')
+        layers = np.load(os.path.join(directory, 'layers.npy'), mmap_mode='r')
+        return cls(meta['name'], meta['keys'], hit_map, layers, meta['layer_rect'])
+
+
+_bundles = {}
+_bundles_lock = threading.Lock()
+
+
+def shared_bundle(key, build):
+    """Get the bundle stored under key, calling build() to make it the first time.
+    
+    Every app, hosted session and server connection in the process uses
+    the same bundle for the same layout definition, colors and settings.
+    """
+    with _bundles_lock:
+        bundle = _bundles.get(key)
+        if bundle is None:
+            bundle = build()
+            _bundles[key] = bundle
+    return bundle
+
+
 class VirtualKeyboard:
-    def __init__(self):
+    def __init__(self, layout=None, colors=None):
         self.keys = {}
-        self.pressed_key = None
-        self.hover_key = None
-        self._build_keyboard()
+        self.key_ids = []
+        self.pressed_keys = set()
+        self.hover_keys = set()
+        self.suggestion_ids = []
+        self.suggestions = []
+        self.layout = None
+        self.colors = dict(COLORS if colors is None else colors)
+        
+        # Compiled layouts by name, and the definitions they came from
+        self.bundles = {}
+        self.layout_definitions = {}
+        
+        # This keyboard's own copies of each layout's suggestion keys:
+        # layout name -> (bundle, keys, suggestion key sprites by state)
+        self._layout_states = {}
+        self._sprites = {}
+        
+        # State of the current layout (see LayoutBundle and _apply_bundle)
+        self._state_layers = {}
+        self._layer = None
+        self._layer_rect = (0, 0, 0, 0)
+        self._key_slices = {}
+        self._drawn_states = {}
+        self._drawn_hover = None
+        self._drawn_pressed = None
+        self._blit_targets = []  # (frame, frame slice, layer slice) of recently drawn-on frames
+        self._hit_map = None
+        
+        # Held while the current layout's arrays are swapped, patched or drawn
+        # (the typing stage switches layouts while the render stage draws)
+        self._lock = threading.RLock()
+        
+        self.set_layout(DEFAULT_LAYOUT if layout is None else layout)
+    
+    def get_bundle(self, layout):
+        """Get the compiled bundle of a layout name or definition.
+        
+        Bundles are kept in memory once built. Otherwise they are loaded
+        from LAYOUT_CACHE_DIR if a bundle for the same definition, colors
+        and geometry settings was saved there, and compiled (and saved)
+        if not.
+        """
+        if isinstance(layout, str):
+            bundle = self.bundles.get(layout)
+            if bundle is not None:
+                return bundle
+            layout = load_layout(layout)
+        
+        name = layout['name']
+        self.layout_definitions[name] = layout
+        digest = self._bundle_digest(layout)
+        bundle = shared_bundle(f"{name}-{digest}", lambda: self._load_bundle(layout, digest))
+        self.bundles[name] = bundle
+        return bundle
+    
+    def preload_layouts(self, names):
+        """Compile or map the bundles of several layouts ahead of switching"""
+        for name in names:
+            try:
+                self.get_bundle(name)
+            except (OSError, ValueError) as e:
+                print(f"Could not load layout '{name}': {e}")
     
-    def _build_keyboard(self):
-        """Build the keyboard layout with key positions"""
+    def _load_bundle(self, layout, digest):
+        """Map a cached bundle for a definition, or compile and cache it"""
+        if not LAYOUT_CACHE_DIR:
+            return self._compile(layout)
+        
+        cache_dir = program_path(LAYOUT_CACHE_DIR)
+        directory = os.path.join(cache_dir, f"{layout['name']}-{digest}")
+        if os.path.isdir(directory):
+            try:
+                return LayoutBundle.load(directory)
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Rebuilding layout cache {directory}: {e}")
+        
+        bundle = self._compile(layout)
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            bundle.save(directory)
+        except OSError as e:
+            print(f"Could not cache layout '{layout['name']}': {e}")
+        return bundle
+    
+    def _bundle_digest(self, layout):
+        """Hash of everything a compiled bundle depends on"""
+        inputs = {
+            'version': BUNDLE_VERSION,
+            'opencv': cv2.__version__,
+            'layout': layout,
+            'colors': self.colors,
+            'settings': [DISPLAY_WIDTH, DISPLAY_HEIGHT, KEYBOARD_X, KEYBOARD_Y, 
+                         KEYBOARD_WIDTH, KEYBOARD_HEIGHT, KEY_WIDTH, KEY_HEIGHT, 
+                         KEY_SPACING, KEY_ROUNDING, SUGGESTION_COUNT, SUGGESTION_ROW_HEIGHT]
+        }
+        encoded = json.dumps(inputs, sort_keys=True).encode('utf-8')
+        return hashlib.sha1(encoded).hexdigest()[:16]
+    
+    def _compile(self, layout):
+        """Compile a layout definition into a LayoutBundle"""
+        keys = self._build_keys(layout)
+        hit_map = self._build_hit_map(keys)
+        layers, layer_rect = self._build_layers(keys)
+        return LayoutBundle(layout['name'], keys, hit_map, layers, layer_rect)
+    
+    def _build_keys(self, layout):
+        """Lay out the keys of a definition with their positions"""
+        keys = {}
+        widths = layout.get('widths', {})
+        labels = layout.get('labels', {})
+        trailing = layout.get('trailing', {})
         current_y = KEYBOARD_Y
         
-        for row_idx, row in enumerate(KEYBOARD_LAYOUT):
+        for row_idx, row in enumerate(layout['rows']):
             # Calculate row width to center it
             row_width = len(row) * (KEY_WIDTH + KEY_SPACING) - KEY_SPACING
             current_x = KEYBOARD_X + (KEYBOARD_WIDTH - row_width) // 2
             
-            for col_idx, key_char in enumerate(row):
-                # Adjust key width for special keys
-                key_w = KEY_WIDTH
-                if key_char in ['backspace', 'tab', 'caps', 'enter', 'shift', 'space']:
-                    if key_char == 'space':
-                        key_w = KEY_WIDTH * 6
-                    elif key_char in ['backspace', 'enter']:
-                        key_w = KEY_WIDTH * 1.5
-                    elif key_char in ['tab', 'caps', 'shift']:
-                        key_w = KEY_WIDTH * 1.3
+            for col_idx, key_char in enumerate(row + trailing.get(str(row_idx), [])):
+                key_w = KEY_WIDTH * widths.get(key_char, 1)
                 
                 # Create key bounding box
                 key_rect = {
@@ -43,70 +258,347 @@ class VirtualKeyboard:
                     'row': row_idx,
                     'col': col_idx
                 }
+                if key_char in labels:
+                    key_rect['label'] = labels[key_char]
                 
-                self.keys[f"{row_idx}_{col_idx}"] = key_rect
+                keys[f"{row_idx}_{col_idx}"] = key_rect
                 current_x += key_w + KEY_SPACING
             
             current_y += KEY_HEIGHT + KEY_SPACING
+        
+        self._build_suggestion_row(keys)
+        return keys
+    
+    def _build_suggestion_row(self, keys):
+        """Add the word suggestion keys in a row above the keyboard"""
+        if SUGGESTION_COUNT <= 0:
+            return
+        
+        key_w = (KEYBOARD_WIDTH - (SUGGESTION_COUNT - 1) * KEY_SPACING) // SUGGESTION_COUNT
+        y = KEYBOARD_Y - SUGGESTION_ROW_HEIGHT - KEY_SPACING
+        for index in range(SUGGESTION_COUNT):
+            keys[f"suggestion_{index}"] = {
+                'x': KEYBOARD_X + index * (key_w + KEY_SPACING),
+                'y': y,
+                'width': key_w,
+                'height': SUGGESTION_ROW_HEIGHT,
+                'char': '',
+                'row': -1,
+                'col': index,
+                'suggestion': True
+            }
+    
+    def _build_hit_map(self, keys):
+        """Build a display-sized label map of key indices for hit-testing.
+        
+        Each pixel holds the index (in key order) of the key covering it,
+        or -1, so a lookup is a single array index instead of a scan over
+        every key. Keys are painted in reverse so the first key wins where
+        rectangles overlap, matching the old linear scan.
+        """
+        hit_map = np.full((DISPLAY_HEIGHT, DISPLAY_WIDTH), -1, dtype=np.int16)
+        key_list = list(keys.values())
+        for index in range(len(key_list) - 1, -1, -1):
+            key = key_list[index]
+            x1, y1 = max(key['x'], 0), max(key['y'], 0)
+            x2 = min(key['x'] + key['width'] + 1, DISPLAY_WIDTH)
+            y2 = min(key['y'] + key['height'] + 1, DISPLAY_HEIGHT)
+            hit_map[y1:y2, x1:x2] = index
+        return hit_map
+    
+    def _build_layers(self, keys):
+        """Pre-render the keyboard once per key state.
+        
+        Each state layer holds every key drawn in that state, so a key's
+        sprite for a state is just its slice of the matching layer. The
+        composited layer starts as the normal layer and only the keys whose
+        state changed are patched in before it is blitted onto the frame.
+        Returns the (states, height, width, 3) layers and their display rect.
+        """
+        # The layer covers the keyboard background plus any overflowing keys
+        x1, y1 = KEYBOARD_X, KEYBOARD_Y
+        x2, y2 = KEYBOARD_X + KEYBOARD_WIDTH + 1, KEYBOARD_Y + KEYBOARD_HEIGHT + 1
+        for key in keys.values():
+            x1 = min(x1, key['x'])
+            y1 = min(y1, key['y'])
+            x2 = max(x2, key['x'] + key['width'] + 1)
+            y2 = max(y2, key['y'] + key['height'] + 1)
+        x1, y1 = max(x1, 0), max(y1, 0)
+        x2, y2 = min(x2, DISPLAY_WIDTH), min(y2, DISPLAY_HEIGHT)
+        layer_rect = (x1, y1, max(x2 - x1, 0), max(y2 - y1, 0))
+        
+        layers = np.empty((len(KEY_STATES), layer_rect[3], layer_rect[2], 3), dtype=np.uint8)
+        for layer, state in zip(layers, KEY_STATES):
+            layer[:] = self.colors['background']
+            for key in keys.values():
+                self._draw_key(layer, key, state, (x1, y1))
+        return layers, layer_rect
+    
+    def _apply_bundle(self, bundle):
+        """Make a compiled bundle the current layout"""
+        state = self._layout_states.get(bundle.name)
+        if state is None or state[0] is not bundle:
+            # The suggestion keys change with the words shown, so they are copied
+            keys = dict(bundle.keys)
+            for key_id in bundle.suggestion_ids:
+                keys[key_id] = dict(keys[key_id])
+            state = self._layout_states[bundle.name] = (bundle, keys, {})
+        
+        self.layout = bundle.name
+        _, self.keys, self._sprites = state
+        self.key_ids = bundle.key_ids
+        self.suggestion_ids = bundle.suggestion_ids
+        self._hit_map = bundle.hit_map
+        self._state_layers = bundle.state_layers
+        self._layer_rect = bundle.layer_rect
+        self._key_slices = bundle.key_slices
+        self._layer = np.array(self._state_layers['normal'])
+        for key_id, sprites in self._sprites.items():
+            self._layer[self._key_slices[key_id]] = sprites['normal']
+        self._drawn_states = {}
+        self._drawn_hover = None
+        self._drawn_pressed = None
+        self._blit_targets = []
+        self.hover_keys = set()
+        self.pressed_keys = set()
+        
+        # Bring the bundle's suggestion row up to date
+        self.set_suggestions(self.suggestions)
+    
+    @property
+    def bounds(self):
+        """Display rectangle (x, y, width, height) that draw() fully overwrites"""
+        return self._layer_rect
+    
+    def set_layout(self, layout):
+        """Switch to a layout given by name or definition.
+        
+        Switching to a layout that is already compiled only swaps arrays,
+        so it takes effect on the next frame without a rebuild.
+        """
+        bundle = self.get_bundle(layout)
+        with self._lock:
+            self._apply_bundle(bundle)
+    
+    def get_layout_target(self, key_char):
+        """Get the layout a layout-switch key selects (None for other keys)"""
+        if key_char and key_char.startswith(LAYOUT_KEY_PREFIX):
+            return key_char[len(LAYOUT_KEY_PREFIX):]
+        return None
+    
+    def set_colors(self, colors):
+        """Update keyboard colors and rebuild every loaded layout.
+        
+        The bundles are rebuilt (or mapped from the cache) for the new
+        colors right away, so switching layouts afterwards stays instant.
+        """
+        with self._lock:
+            self.colors.update(colors)
+            names = list(self.bundles)
+            self.bundles = {}
+            for name in names:
+                self.get_bundle(self.layout_definitions[name])
+            self.set_layout(self.layout)
+            self.set_suggestions(self.suggestions)
+    
+    def set_suggestions(self, words):
+        """Show words in the suggestion row, leaving the remaining slots empty.
+        
+        Only the slots whose word changed are re-rendered into the cached
+        layers.
+        """
+        with self._lock:
+            self.suggestions = list(words[:len(self.suggestion_ids)])
+            for index, key_id in enumerate(self.suggestion_ids):
+                word = self.suggestions[index] if index < len(self.suggestions) else ''
+                if self.keys[key_id]['char'] != word:
+                    self.keys[key_id]['char'] = word
+                    self._redraw_key(key_id)
+    
+    def is_suggestion_key(self, key_id):
+        """Check if a key belongs to the suggestion row"""
+        return key_id in self.keys and self.keys[key_id].get('suggestion', False)
+    
+    def _redraw_key(self, key_id):
+        """Re-render one key's sprite for every state (the shared layers are left alone)"""
+        key_slice = self._key_slices.get(key_id)
+        if key_slice is None:
+            return
+        
+        # Draw into the key's own slice so nothing spills onto its neighbours
+        origin = (self._layer_rect[0] + key_slice[1].start, 
+                  self._layer_rect[1] + key_slice[0].start)
+        sprites = self._sprites.setdefault(key_id, {})
+        for state, layer in self._state_layers.items():
+            canvas = sprites.get(state)
+            if canvas is None:
+                canvas = sprites[state] = np.empty_like(layer[key_slice])
+            canvas[:] = self.colors['background']
+            self._draw_key(canvas, self.keys[key_id], state, origin)
+        
+        state = self._drawn_states.get(key_id, 'normal')
+        self._layer[key_slice] = sprites[state]
+    
+    def _key_pixels(self, key_id, state):
+        """A key's sprite in a state (this keyboard's own for suggestion keys)"""
+        sprites = self._sprites.get(key_id)
+        if sprites is not None:
+            return sprites[state]
+        return self._state_layers[state][self._key_slices[key_id]]
     
     def get_key_at_position(self, x, y):
         """Get the key at the given screen position"""
-        for key_id, key in self.keys.items():
-            if (key['x'] <= x <= key['x'] + key['width'] and 
-                key['y'] <= y <= key['y'] + key['height']):
-                return key_id, key
+        if 0 <= x < DISPLAY_WIDTH and 0 <= y < DISPLAY_HEIGHT:
+            index = self._hit_map[int(y), int(x)]
+            if index >= 0:
+                key_id = self.key_ids[index]
+                return key_id, self.keys[key_id]
         return None, None
     
+    def get_key_indices(self, points):
+        """Resolve an (N, 2) array of screen positions to key indices.
+        
+        Returns an integer array of indices into self.key_ids, with -1 for
+        positions that are not over any key.
+        """
+        points = np.asarray(points)
+        xs, ys = points[..., 0], points[..., 1]
+        inside = (xs >= 0) & (xs < DISPLAY_WIDTH) & (ys >= 0) & (ys < DISPLAY_HEIGHT)
+        
+        indices = np.full(inside.shape, -1, dtype=np.intp)
+        indices[inside] = self._hit_map[ys[inside].astype(np.intp), 
+                                        xs[inside].astype(np.intp)]
+        return indices
+    
+    def get_keys_at_positions(self, points):
+        """Get the key IDs at the given screen positions (None where no key)"""
+        return [self.key_ids[index] if index >= 0 else None 
+                for index in self.get_key_indices(points)]
+    
+    @property
+    def hover_key(self):
+        """One of the hovered keys (None if no key is hovered)"""
+        return next(iter(self.hover_keys), None)
+    
+    @property
+    def pressed_key(self):
+        """One of the pressed keys (None if no key is pressed)"""
+        return next(iter(self.pressed_keys), None)
+    
     def set_hover_key(self, key_id):
         """Set the currently hovered key"""
-        self.hover_key = key_id
+        self.hover_keys = {key_id} if key_id is not None else set()
+    
+    def set_hover_keys(self, key_ids):
+        """Set every currently hovered key (one per fingertip)"""
+        self.hover_keys = set(key_ids)
     
     def set_pressed_key(self, key_id):
         """Set the currently pressed key"""
-        self.pressed_key = key_id
+        self.pressed_keys = {key_id} if key_id is not None else set()
+    
+    def set_pressed_keys(self, key_ids):
+        """Set every currently pressed key (one per fingertip)"""
+        self.pressed_keys = set(key_ids)
     
     def clear_pressed_key(self):
         """Clear the pressed key state"""
-        self.pressed_key = None
+        self.pressed_keys = set()
     
     def draw(self, frame):
-        """Draw the virtual keyboard on the frame"""
-        # Draw background rectangle for keyboard
-        cv2.rectangle(frame, 
-                     (KEYBOARD_X, KEYBOARD_Y), 
-                     (KEYBOARD_X + KEYBOARD_WIDTH, KEYBOARD_Y + KEYBOARD_HEIGHT),
-                     COLORS['background'], -1)
-        
-        # Draw each key
-        for key_id, key in self.keys.items():
-            # Determine key color based on state
-            if key_id == self.pressed_key:
-                color = COLORS['key_pressed']
-                text_color = COLORS['text_hover']
-            elif key_id == self.hover_key:
-                color = COLORS['key_hover']
-                text_color = COLORS['text_hover']
-            else:
-                color = COLORS['key_normal']
-                text_color = COLORS['text_normal']
-            
-            # Draw key rectangle with rounded corners
-            self._draw_rounded_rect(frame, 
-                                  (key['x'], key['y']), 
-                                  (key['x'] + key['width'], key['y'] + key['height']),
-                                  color, KEY_ROUNDING)
-            
-            # Draw key text
-            text = key['char'].upper() if len(key['char']) == 1 else key['char']
-            text_size = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)[0]
-            text_x = key['x'] + (key['width'] - text_size[0]) // 2
-            text_y = key['y'] + (key['height'] + text_size[1]) // 2
-            
-            cv2.putText(frame, text, (text_x, text_y), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, text_color, 2)
+        """Draw the virtual keyboard on the frame.
+        
+        Keys are only patched into the composited layer on frames where the
+        hover or pressed keys changed, and the frame and layer slices of the
+        blit are kept for each display buffer, so a steady frame is a single
+        copy with no temporary objects.
+        """
+        with self._lock:
+            hover_keys, pressed_keys = self.hover_keys, self.pressed_keys
+            if hover_keys != self._drawn_hover or pressed_keys != self._drawn_pressed:
+                self._patch_key_states(hover_keys, pressed_keys)
             
-            # Draw bounding box in debug mode
-            if DEBUG_MODE and SHOW_BOUNDING_BOXES:
+            for target in self._blit_targets:
+                if target[0] is frame:
+                    break
+            else:
+                target = self._blit_target(frame)
+            if target[1] is not None:
+                np.copyto(target[1], target[2])
+    
+    def _patch_key_states(self, hover_keys, pressed_keys):
+        """Patch the keys whose state changed since the last frame into the composited layer"""
+        key_states = {}
+        for key_id in hover_keys:
+            if key_id in self._key_slices:
+                key_states[key_id] = 'hover'
+        for key_id in pressed_keys:
+            if key_id in self._key_slices:
+                key_states[key_id] = 'pressed'
+        
+        for key_id in set(self._drawn_states) | set(key_states):
+            state = key_states.get(key_id, 'normal')
+            key_slice = self._key_slices.get(key_id)
+            if key_slice is not None and self._drawn_states.get(key_id, 'normal') != state:
+                self._layer[key_slice] = self._key_pixels(key_id, state)
+        self._drawn_states = key_states
+        self._drawn_hover = hover_keys
+        self._drawn_pressed = pressed_keys
+    
+    def _blit_target(self, frame):
+        """Remember the slices that blit the composited layer onto a frame, clipped to it"""
+        x, y, width, height = self._layer_rect
+        width = min(width, frame.shape[1] - x)
+        height = min(height, frame.shape[0] - y)
+        target = (frame, None, None)
+        if width > 0 and height > 0:
+            target = (frame, frame[y:y + height, x:x + width], self._layer[:height, :width])
+        
+        # Display buffers are reused, so only a few frames are ever remembered
+        if len(self._blit_targets) >= 8:
+            del self._blit_targets[0]
+        self._blit_targets.append(target)
+        return target
+    
+    def _draw_key(self, canvas, key, state, origin):
+        """Render a single key in the given state onto a layer canvas"""
+        if state == 'pressed':
+            color = self.colors['key_pressed']
+            text_color = self.colors['text_hover']
+        elif state == 'hover':
+            color = self.colors['key_hover']
+            text_color = self.colors['text_hover']
+        else:
+            color = self.colors['key_normal']
+            text_color = self.colors['text_normal']
+        
+        x = key['x'] - origin[0]
+        y = key['y'] - origin[1]
+        
+        # Draw key rectangle with rounded corners
+        self._draw_rounded_rect(canvas, 
+                              (x, y), 
+                              (x + key['width'], y + key['height']),
+                              color, KEY_ROUNDING)
+        
+        # Draw key text
+        if 'label' in key:
+            text = key['label']
+        elif len(key['char']) == 1 and not key.get('suggestion'):
+            text = key['char'].upper()
+        else:
+            text = key['char']
+        text_size = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)[0]
+        text_x = x + (key['width'] - text_size[0]) // 2
+        text_y = y + (key['height'] + text_size[1]) // 2
+        
+        cv2.putText(canvas, text, (text_x, text_y), 
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, text_color, 2)
+    
+    def draw_bounding_boxes(self, frame):
+        """Outline every key's hit rectangle on the frame (debug overlay drawn after draw())"""
+        with self._lock:
+            for key in self.keys.values():
                 cv2.rectangle(frame, 
                              (key['x'], key['y']), 
                              (key['x'] + key['width'], key['y'] + key['height']),
@@ -0,0 +1,295 @@
+"""
+Networked Keyboard Server
+
+An asyncio TCP server that runs the typing logic centrally for many thin
+clients (see keyboard_client.py and net_protocol.py for the wire
+format). A client either tracks hands itself and sends landmark packets,
+or sends JPEG camera frames that the server tracks on a shared
+InferencePool. Every connection has its own keyboard and typing state
+(a headless VirtualKeyboardApp); the key events it produces are streamed
+back to the client instead of being injected on the server.
+
+Usage: python keyboard_server.py [--host 127.0.0.1] [--port 8765] [--workers 2]
+                                 [--backend mediapipe] [--no-frames] [--stats 10]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import numpy as np
+from net_protocol import (MSG_FRAMES, MSG_HELLO, MSG_LANDMARKS, MODE_FRAMES, ProtocolError, decode_frame_batch,
+                          decode_hello, decode_landmark_batch, encode_error, encode_event_batch, read_message)
+from parallel_inference import SLOT_TIMEOUT, InferencePool
+from session_host import SessionOutput
+from session_replay import ReplayClock, ReplayHandTracker
+from config import *
+
+
+def decode_images(images):
+    """Decode encoded camera frames (None for any that cannot be decoded)"""
+    return [cv2.imdecode(np.frombuffer(image, dtype=np.uint8), cv2.IMREAD_COLOR) for image in images]
+
+
+class ClientConnection:
+    """Keyboard and typing state of one connected client"""
+
+    def __init__(self, connection_id, mode, frame_size):
+        from virtual_keyboard import VirtualKeyboardApp
+
+        self.connection_id = connection_id
+        self.mode = mode
+        self.clock = ReplayClock()
+        self.tracker = ReplayHandTracker(frame_size)
+        self.output = SessionOutput(connection_id, self.clock, self._on_event, record=False)
+        self.app = VirtualKeyboardApp(hand_tracker=self.tracker, input_simulator=self.output)
+        self.app.quality_governor = None
+        self.events = []
+        self.frames = 0
+
+    def _on_event(self, connection_id, kind, value, timestamp, capture_time):
+        self.events.append((timestamp, capture_time, kind, value))
+
+    def process(self, timestamp, count, normalized):
+        """Run the typing logic on one frame of landmarks"""
+        self.clock.now = timestamp
+        self.app.process_typing_logic(self.tracker.load(timestamp, count, normalized))
+        self.frames += 1
+
+    def take_events(self):
+        """Get and clear the events produced since the last call"""
+        events, self.events = self.events, []
+        return events
+
+    def close(self):
+        """Release the typing state"""
+        self.output.cleanup()
+
+
+class KeyboardServer:
+    """Accept thin clients and stream their key events back"""
+
+    def __init__(self, host=NET_HOST, port=NET_PORT, workers=SESSION_HOST_WORKERS, backend=HAND_TRACKING_BACKEND,
+                 accept_frames=True):
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.backend = backend
+        self.accept_frames = accept_frames
+        self.pool = None
+        self.server = None
+        self.connections = {}
+
+        self.connections_total = 0
+        self.frames_total = 0
+        self.events_total = 0
+        self.messages_total = 0
+        self.errors_total = 0
+
+        self._next_id = 0
+        self._results = {}  # (connection id, seq) -> future of the tracking result
+        self._slot_freed = None
+        self._poller = None
+
+        # Connections are built off the event loop, one at a time (their layout caches share directories)
+        self._builder = ThreadPoolExecutor(max_workers=1)
+
+    async def start(self):
+        """Start listening (port 0 picks a free port, stored in self.port)"""
+        if self.accept_frames:
+            self.pool = InferencePool(self.workers, self.backend)
+            self._slot_freed = asyncio.Event()
+            self._poller = asyncio.create_task(self._poll_pool())
+        self.server = await asyncio.start_server(self._handle_client, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        print(f"Keyboard server listening on {self.host}:{self.port}")
+
+    async def serve_forever(self):
+        """Serve until cancelled"""
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def close(self):
+        """Stop accepting clients, drop every connection and stop the workers"""
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        if self._poller is not None:
+            self._poller.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._poller
+        if self.pool is not None:
+            self.pool.close()
+            self.pool = None
+        self._builder.shutdown(wait=False)
+
+    async def _poll_pool(self):
+        """Hand tracking results from the pool to the connections waiting for them"""
+        while True:
+            results = self.pool.collect()
+            for result in results:
+                future = self._results.pop((result['stream_id'], result['seq']), None)
+                if future is not None and not future.done():
+                    future.set_result(result)
+            if results:
+                self._slot_freed.set()
+            await asyncio.sleep(0 if results else NET_POLL_INTERVAL)
+
+    async def _handle_client(self, reader, writer):
+        """Serve one client: HELLO, then one EVENTS reply per batch"""
+        connection = None
+        try:
+            message = await read_message(reader)
+            if message is None:
+                return
+            kind, payload = message
+            if kind != MSG_HELLO:
+                raise ProtocolError("Expected HELLO")
+            mode, frame_size = decode_hello(payload)
+            if mode == MODE_FRAMES and self.pool is None:
+                raise ProtocolError("This server does not accept frames")
+
+            connection_id = self._next_id
+            self._next_id += 1
+            loop = asyncio.get_running_loop()
+            connection = await loop.run_in_executor(self._builder, ClientConnection, connection_id, mode, frame_size)
+            self.connections[connection.connection_id] = connection
+            self.connections_total += 1
+
+            while True:
+                message = await read_message(reader)
+                if message is None:
+                    break
+                kind, payload = message
+                if kind == MSG_LANDMARKS and mode != MODE_FRAMES:
+                    frames = decode_landmark_batch(payload)
+                    for frame in frames:
+                        connection.process(*frame)
+                        # Let other connections run between the frames of a large batch
+                        await asyncio.sleep(0)
+                elif kind == MSG_FRAMES and mode == MODE_FRAMES:
+                    frames = decode_frame_batch(payload)
+                    await self._track_frames(connection, frames)
+                else:
+                    raise ProtocolError(f"Unexpected message type {kind}")
+
+                events = connection.take_events()
+                self.messages_total += 1
+                self.frames_total += len(frames)
+                self.events_total += len(events)
+                writer.write(encode_event_batch(len(frames), events))
+                await writer.drain()
+
+        except ProtocolError as e:
+            self.errors_total += 1
+            print(f"Client error: {e}")
+            writer.write(encode_error(str(e)))
+            with contextlib.suppress(ConnectionError):
+                await writer.drain()
+
+        except ConnectionError:
+            pass
+
+        finally:
+            if connection is not None:
+                self.connections.pop(connection.connection_id, None)
+                for key in [key for key in self._results if key[0] == connection.connection_id]:
+                    del self._results[key]
+                connection.close()
+            writer.close()
+            with contextlib.suppress(ConnectionError):
+                await writer.wait_closed()
+
+    async def _track_frames(self, connection, frames):
+        """Track a batch of encoded frames on the pool and run the typing logic on them in order"""
+        while not self.pool.is_ready():
+            if self.pool.workers_failed >= self.pool.workers:
+                raise ProtocolError(f"Hand tracking unavailable: {self.pool.load_error}")
+            await asyncio.sleep(0.05)
+
+        loop = asyncio.get_running_loop()
+        images = await loop.run_in_executor(None, decode_images, [image for _, image in frames])
+
+        pending = []
+        try:
+            for (timestamp, _), image in zip(frames, images):
+                if image is None:
+                    raise ProtocolError("Frame could not be decoded")
+                seq = self.pool.submit(image, stream_id=connection.connection_id)
+                while seq is None:
+                    self._slot_freed.clear()
+                    await self._slot_freed.wait()
+                    seq = self.pool.submit(image, stream_id=connection.connection_id)
+                future = loop.create_future()
+                self._results[(connection.connection_id, seq)] = future
+                pending.append((timestamp, image.shape, seq, future))
+
+            for timestamp, shape, _, future in pending:
+                try:
+                    result = await asyncio.wait_for(future, SLOT_TIMEOUT)
+                except asyncio.TimeoutError:
+                    # The pool took the slot back; the frame is lost
+                    continue
+                connection.tracker.frame_size = (shape[1], shape[0])
+                connection.process(timestamp, result['count'], result['landmarks'])
+        finally:
+            # Results that timed out or were abandoned are never collected
+            for _, _, seq, _ in pending:
+                self._results.pop((connection.connection_id, seq), None)
+
+    def get_stats(self):
+        """Connection, frame and event counts"""
+        return {
+            'connections': len(self.connections),
+            'connections_total': self.connections_total,
+            'messages': self.messages_total,
+            'frames': self.frames_total,
+            'events': self.events_total,
+            'errors': self.errors_total
+        }
+
+
+async def run_server(args):
+    """Run the server until interrupted, printing statistics"""
+    server = KeyboardServer(args.host, args.port, args.workers, args.backend, accept_frames=not args.no_frames)
+    await server.start()
+    serve = asyncio.create_task(server.serve_forever())
+    try:
+        previous, last = server.get_stats(), time.perf_counter()
+        while True:
+            await asyncio.sleep(args.stats)
+            stats, now = server.get_stats(), time.perf_counter()
+            elapsed = now - last
+            print(f"{stats['connections']} connected ({stats['connections_total']} total), "
+                  f"{(stats['frames'] - previous['frames']) / elapsed:.0f} frames/s, "
+                  f"{(stats['events'] - previous['events']) / elapsed:.1f} events/s, {stats['errors']} errors")
+            previous, last = stats, now
+    finally:
+        serve.cancel()
+        await server.close()
+
+
+def main():
+    """Run the server with command-line options"""
+    parser = argparse.ArgumentParser(description="Networked virtual keyboard server")
+    parser.add_argument('--host', default=NET_HOST, help="address to listen on")
+    parser.add_argument('--port', type=int, default=NET_PORT, help="port to listen on")
+    parser.add_argument('--workers', type=int, default=SESSION_HOST_WORKERS, help="inference workers for frame clients")
+    parser.add_argument('--backend', default=HAND_TRACKING_BACKEND, help="hand tracking backend for frame clients")
+    parser.add_argument('--no-frames', action='store_true', help="only accept landmark clients (no inference workers)")
+    parser.add_argument('--stats', type=float, default=10.0, help="seconds between statistics lines")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(run_server(args))
+    except KeyboardInterrupt:
+        print("Server stopped")
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
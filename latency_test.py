@@ -0,0 +1,128 @@
+"""
+Synthetic Motion-to-Keystroke Latency Test
+
+Drives a known tap pattern through the typing logic and the asynchronous
+injection path in real time, and reports the distribution of the time
+from the camera frame where each tap's downward motion starts to the
+moment its key event is issued. No camera, MediaPipe or OS input is used. Tracking and
+injection costs can be simulated.
+
+Usage: python latency_test.py [--text TEXT] [--fps 30] [--inference-ms 15]
+                              [--injection-ms 2] [--repeat 1]
+"""
+
+import argparse
+import sys
+import time
+import numpy as np
+from input_simulator import NullInputSimulator
+from session_replay import ReplayHandTracker
+from synthetic_input import generate_tap_session
+from config import *
+
+
+def run_latency_test(text='hello world', fps=30, inference_ms=0.0, injection_ms=0.0, repeat=1):
+    """Run the tap pattern for text in real time and return per-keystroke latencies.
+
+    Returns a dict with 'latencies' (one dict per matched keystroke, in
+    milliseconds) and 'missed' (taps that produced no keystroke).
+    """
+    from virtual_keyboard import VirtualKeyboardApp
+
+    keys = [('space' if char == ' ' else char) for char in text.lower()] * repeat
+    injector = NullInputSimulator(async_injection=True, injection_cost=injection_ms / 1000)
+    tracker = ReplayHandTracker()
+    app = VirtualKeyboardApp(hand_tracker=tracker, input_simulator=injector)
+    app.quality_governor = None
+
+    session = generate_tap_session(app.keyboard, keys, fps=fps, frame_size=tracker.frame_size)
+    frame_period = 1.0 / fps
+    capture_times = np.zeros(len(session['timestamps']))
+
+    start = time.time()
+    for index in range(len(capture_times)):
+        # Wait for the synthetic camera to deliver the frame
+        delay = start + index * frame_period - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        capture_times[index] = time.time()
+
+        landmarks = tracker.load(capture_times[index], session['counts'][index],
+                                 session['landmarks'][index])
+        if inference_ms:
+            time.sleep(inference_ms / 1000)
+        app.process_typing_logic(landmarks)
+
+    injector.cleanup()
+
+    # Assign each keystroke to the tap whose contact frame is closest to it
+    contact_frames = np.array([frame for _, frame in session['presses']])
+    matched = {}
+    for record in injector.keystroke_latencies:
+        frame = np.searchsorted(capture_times, record['capture_time'])
+        tap = int(np.argmin(np.abs(contact_frames - frame)))
+        if tap not in matched and session['presses'][tap][0] == record['key']:
+            matched[tap] = record
+
+    latencies = []
+    missed = []
+    for tap, (key_char, _) in enumerate(session['presses']):
+        record = matched.get(tap)
+        if record is None:
+            missed.append(key_char)
+            continue
+        injected_time = record['capture_time'] + record['total_ms'] / 1000
+        latencies.append({
+            'key': key_char,
+            'gesture_ms': (injected_time - capture_times[session['tap_starts'][tap]]) * 1000,
+            'processing_ms': record['processing_ms'],
+            'queue_ms': record['queue_ms'],
+            'injection_ms': record['injection_ms'],
+            'total_ms': record['total_ms']
+        })
+
+    return {'latencies': latencies, 'missed': missed,
+            'debounce_rejections': injector.debounce_rejections}
+
+
+def print_latency_distribution(result):
+    """Print percentiles of every latency component"""
+    latencies = result['latencies']
+    print(f"Taps: {len(latencies) + len(result['missed'])}, "
+          f"keystrokes: {len(latencies)}, missed: {len(result['missed'])}, "
+          f"rejected by debounce: {result['debounce_rejections']}")
+    if not latencies:
+        return
+
+    labels = {
+        'gesture_ms': 'tap start -> key event',
+        'total_ms': 'capture -> key event',
+        'processing_ms': 'processing',
+        'queue_ms': 'queue',
+        'injection_ms': 'injection'
+    }
+    for field, label in labels.items():
+        values = np.array([record[field] for record in latencies])
+        print(f"  {label:22s} p50 {np.percentile(values, 50):7.2f}ms  "
+              f"p95 {np.percentile(values, 95):7.2f}ms  "
+              f"p99 {np.percentile(values, 99):7.2f}ms  max {values.max():7.2f}ms")
+
+
+def main():
+    """Run the latency test with command-line options"""
+    parser = argparse.ArgumentParser(description="Synthetic motion-to-keystroke latency test")
+    parser.add_argument('--text', default='hello world', help="text to tap out")
+    parser.add_argument('--fps', type=float, default=FPS_TARGET, help="synthetic camera frame rate")
+    parser.add_argument('--inference-ms', type=float, default=0.0, help="simulated tracking cost per frame")
+    parser.add_argument('--injection-ms', type=float, default=0.0, help="simulated OS injection cost")
+    parser.add_argument('--repeat', type=int, default=1, help="number of times to repeat the text")
+    args = parser.parse_args()
+
+    result = run_latency_test(args.text, args.fps, args.inference_ms, args.injection_ms, args.repeat)
+    print_latency_distribution(result)
+    return not result['missed']
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,191 @@
+"""
+Keyboard Server Load Test
+
+Opens many concurrent client connections to a keyboard server and has
+each one stream a synthetic tap session, in batches, as fast as the
+server answers. Reports how quickly the connections were established,
+messages, frames and key events per second, the round-trip time of a
+batch, and how many clients got back exactly the keys the session types
+when replayed locally.
+
+Without --server a server is started in this process on a free port.
+Landmark clients exercise the protocol and the typing logic; frame
+clients (--mode frames) add JPEG decoding and inference on the server's
+worker pool (use --backend contour, MediaPipe does not take the rendered
+hands for hands).
+
+Usage: python net_load_test.py [--connections 50] [--mode landmarks|frames] [--batch 4]
+                               [--duration 10] [--server host:port] [--workers 2] [--backend contour]
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+import cv2
+import numpy as np
+from backend_benchmark import track_frames
+from hand_backends import create_backend
+from keyboard_client import KeyboardClient
+from keyboard_layout import VirtualKeyboard
+from keyboard_server import KeyboardServer, decode_images
+from net_protocol import MODE_FRAMES, MODE_LANDMARKS
+from session_replay import replay_session
+from synthetic_input import generate_tap_session, make_background, render_hands
+from config import *
+
+LOAD_TEST_TEXT = 'hello world'
+
+
+def make_workload(mode, backend, text=LOAD_TEST_TEXT):
+    """Synthetic session, its frames in the wire form of mode, and the keys they should type.
+
+    For frames the expected keys are those typed when the same backend
+    tracks the same JPEG frames locally, so tracking errors of the
+    backend are not counted against the server.
+    """
+    keys = [('space' if char == ' ' else char) for char in text]
+    session = generate_tap_session(VirtualKeyboard(), keys, hand_scale=60)
+    counts, landmarks = session['counts'], session['landmarks']
+    if mode == MODE_LANDMARKS:
+        frames = [(counts[index], landmarks[index]) for index in range(len(counts))]
+        return session, frames, replay_session(session)['keys']
+
+    background = make_background(session['frame_size'])
+    frame = np.empty_like(background)
+    frames = []
+    for index in range(len(counts)):
+        render_hands(landmarks[index], counts[index], background, frame)
+        success, data = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, NET_JPEG_QUALITY])
+        frames.append(data.tobytes())
+
+    tracker = create_backend(backend)
+    tracker.load()
+    try:
+        tracked = track_frames(tracker, lambda: decode_images(frames))
+    finally:
+        tracker.close()
+    expected = replay_session(dict(session, landmarks=tracked['landmarks'], counts=tracked['counts']))['keys']
+    return session, frames, expected
+
+
+async def run_client(host, port, mode, session, frames, batch, deadline, stats):
+    """Stream the session over one connection until the deadline"""
+    start = time.perf_counter()
+    client = KeyboardClient(host, port, mode, session['frame_size'])
+    try:
+        await client.connect()
+    except OSError as e:
+        stats['errors'].append(str(e))
+        return
+    stats['connect_times'].append(time.perf_counter() - start)
+
+    timestamps = session['timestamps']
+    duration = timestamps[-1] - timestamps[0] + 1.0
+    typed = []
+    position = 0
+    try:
+        while time.perf_counter() < deadline:
+            # Later cycles continue the session's timeline so time only moves forward
+            cycle, first = divmod(position, len(frames))
+            indices = range(first, min(first + batch, len(frames)))
+            offset = cycle * duration
+            sent = time.perf_counter()
+            if mode == MODE_LANDMARKS:
+                processed, events = await client.send_landmarks(
+                    [(timestamps[i] + offset, *frames[i]) for i in indices])
+            else:
+                processed, events = await client.send_encoded_frames(
+                    [(timestamps[i] + offset, frames[i]) for i in indices])
+            stats['round_trips'].append(time.perf_counter() - sent)
+            stats['messages'] += 1
+            stats['frames'] += processed
+            stats['events'] += len(events)
+            position += len(indices)
+
+            if cycle == 0:
+                typed.extend(value for _, _, kind, value in events if kind in ('press', 'text'))
+                if position == len(frames):
+                    stats['typed'].append(typed)
+    except (ConnectionError, OSError) as e:
+        stats['errors'].append(str(e))
+    finally:
+        await client.close()
+
+
+async def run_load_test(connections=50, mode=MODE_LANDMARKS, batch=4, duration=10.0, server_address=None,
+                        workers=SESSION_HOST_WORKERS, backend=HAND_TRACKING_BACKEND):
+    """Run the load test and return its statistics"""
+    session, frames, expected = make_workload(mode, backend)
+
+    server = None
+    if server_address:
+        host, _, port = server_address.rpartition(':')
+        port = int(port)
+    else:
+        server = KeyboardServer('127.0.0.1', 0, workers, backend, accept_frames=mode == MODE_FRAMES)
+        await server.start()
+        host, port = server.host, server.port
+        if server.pool is not None:
+            while not server.pool.is_ready() and server.pool.workers_failed < server.pool.workers:
+                await asyncio.sleep(0.05)
+
+    stats = {'connect_times': [], 'round_trips': [], 'messages': 0, 'frames': 0, 'events': 0,
+             'typed': [], 'errors': []}
+    try:
+        start = time.perf_counter()
+        deadline = start + duration
+        await asyncio.gather(*(run_client(host, port, mode, session, frames, batch, deadline, stats)
+                               for _ in range(connections)))
+        elapsed = time.perf_counter() - start
+    finally:
+        if server is not None:
+            await server.close()
+
+    stats.update(connections=connections, elapsed=elapsed, expected=expected,
+                 connect_times=np.array(stats['connect_times']), round_trips=np.array(stats['round_trips']))
+    return stats
+
+
+def print_load_test(stats):
+    """Print the load test results"""
+    elapsed = stats['elapsed']
+    connect_times = stats['connect_times'] * 1000
+    round_trips = stats['round_trips'] * 1000
+    print(f"Connections: {len(connect_times)}/{stats['connections']} established, {len(stats['errors'])} errors")
+    if len(connect_times):
+        print(f"Connect time: p50 {np.percentile(connect_times, 50):.1f}ms, max {connect_times.max():.1f}ms "
+              f"({len(connect_times) / (connect_times.max() / 1000):.0f} connections/s)")
+    print(f"Throughput: {stats['messages'] / elapsed:.0f} messages/s, {stats['frames'] / elapsed:.0f} frames/s, "
+          f"{stats['events'] / elapsed:.1f} events/s")
+    if len(round_trips):
+        print(f"Batch round trip: p50 {np.percentile(round_trips, 50):.1f}ms, "
+              f"p95 {np.percentile(round_trips, 95):.1f}ms, p99 {np.percentile(round_trips, 99):.1f}ms")
+    correct = sum(typed == stats['expected'] for typed in stats['typed'])
+    print(f"Sessions typed correctly: {correct}/{len(stats['typed'])} (expected {''.join(stats['expected'])!r})")
+    for error in sorted(set(stats['errors']))[:5]:
+        print(f"  error: {error}")
+
+
+def main():
+    """Run the load test with command-line options"""
+    parser = argparse.ArgumentParser(description="Keyboard server load test")
+    parser.add_argument('--connections', type=int, default=50, help="concurrent client connections")
+    parser.add_argument('--mode', choices=['landmarks', 'frames'], default='landmarks', help="what clients send")
+    parser.add_argument('--batch', type=int, default=4, help="frames per message")
+    parser.add_argument('--duration', type=float, default=10.0, help="seconds to run")
+    parser.add_argument('--server', help="host:port of a running server (default: start one here)")
+    parser.add_argument('--workers', type=int, default=SESSION_HOST_WORKERS, help="inference workers of a local server")
+    parser.add_argument('--backend', default=HAND_TRACKING_BACKEND, help="hand tracking backend of a local server")
+    args = parser.parse_args()
+
+    mode = MODE_FRAMES if args.mode == 'frames' else MODE_LANDMARKS
+    stats = asyncio.run(run_load_test(args.connections, mode, max(1, args.batch), args.duration,
+                                      args.server, args.workers, args.backend))
+    print_load_test(stats)
+    return not stats['errors']
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
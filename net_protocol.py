@@ -0,0 +1,183 @@
+"""
+Binary Wire Format of the Keyboard Server
+
+Every message is a little-endian header (payload length u32, message
+type u8) followed by the payload. Clients open with HELLO and then send
+batches of either landmark frames or compressed camera frames; the server
+answers every batch with one EVENTS message carrying the key events the
+batch produced (possibly none), so the client can pace itself on the
+replies.
+
+HELLO     version u8, mode u8 (MODE_LANDMARKS or MODE_FRAMES), frame width u16, height u16
+LANDMARKS frames u16, then per frame: timestamp f64, hands u8, hands x 21 x 3 float16
+          (normalized MediaPipe coordinates)
+FRAMES    frames u16, then per frame: timestamp f64, size u32, JPEG/PNG bytes
+EVENTS    frames processed u32, events u16, then per event: timestamp f64,
+          capture time f64, kind u8 (index into EVENT_KINDS), size u16, UTF-8 value
+ERROR     UTF-8 message; the connection is closed after it
+"""
+
+import asyncio
+import struct
+import numpy as np
+from hand_model import NUM_LANDMARKS
+from config import *
+
+PROTOCOL_VERSION = 1
+
+# Message types
+MSG_HELLO = 1
+MSG_LANDMARKS = 2
+MSG_FRAMES = 3
+MSG_EVENTS = 4
+MSG_ERROR = 5
+
+# Client modes
+MODE_LANDMARKS = 0  # The client tracks hands and sends landmarks
+MODE_FRAMES = 1  # The client sends camera frames and the server tracks them
+
+EVENT_KINDS = ('press', 'text', 'hold', 'release')
+
+HEADER = struct.Struct('<IB')
+HELLO = struct.Struct('<BBHH')
+COUNT = struct.Struct('<H')
+LANDMARK_FRAME = struct.Struct('<dB')
+IMAGE_FRAME = struct.Struct('<dI')
+EVENTS = struct.Struct('<IH')
+EVENT = struct.Struct('<ddBH')
+
+HAND_BYTES = NUM_LANDMARKS * 3 * 2
+
+
+class ProtocolError(Exception):
+    """Raised for malformed or unexpected messages"""
+
+
+def encode_message(kind, payload=b''):
+    """Frame a payload as a message"""
+    return HEADER.pack(len(payload), kind) + payload
+
+
+async def read_message(reader, max_size=NET_MAX_MESSAGE_BYTES):
+    """Read one message as (type, payload), or None at the end of the stream"""
+    try:
+        header = await reader.readexactly(HEADER.size)
+    except asyncio.IncompleteReadError as e:
+        if e.partial:
+            raise ProtocolError("Connection closed inside a message header")
+        return None
+    size, kind = HEADER.unpack(header)
+    if size > max_size:
+        raise ProtocolError(f"Message of {size} bytes exceeds the limit of {max_size}")
+    try:
+        return kind, await reader.readexactly(size)
+    except asyncio.IncompleteReadError:
+        raise ProtocolError("Connection closed inside a message")
+
+
+def encode_hello(mode, frame_size):
+    """HELLO message opening a connection"""
+    return encode_message(MSG_HELLO, HELLO.pack(PROTOCOL_VERSION, mode, *frame_size))
+
+
+def decode_hello(payload):
+    """Get (mode, frame_size) from a HELLO payload"""
+    if len(payload) != HELLO.size:
+        raise ProtocolError("Malformed HELLO")
+    version, mode, width, height = HELLO.unpack(payload)
+    if version != PROTOCOL_VERSION:
+        raise ProtocolError(f"Unsupported protocol version {version}")
+    if mode not in (MODE_LANDMARKS, MODE_FRAMES):
+        raise ProtocolError(f"Unknown mode {mode}")
+    return mode, (width, height)
+
+
+def encode_landmark_batch(frames):
+    """LANDMARKS message from (timestamp, hand count, normalized landmarks) tuples"""
+    parts = [COUNT.pack(len(frames))]
+    for timestamp, count, normalized in frames:
+        parts.append(LANDMARK_FRAME.pack(timestamp, count))
+        parts.append(np.asarray(normalized[:count], dtype='<f2').tobytes())
+    return encode_message(MSG_LANDMARKS, b''.join(parts))
+
+
+def decode_landmark_batch(payload, max_hands=MAX_NUM_HANDS):
+    """Get (timestamp, hand count, (count, 21, 3) float32 landmarks) tuples from a LANDMARKS payload"""
+    frames = []
+    try:
+        (frame_count,), offset = COUNT.unpack_from(payload), COUNT.size
+        for _ in range(frame_count):
+            timestamp, count = LANDMARK_FRAME.unpack_from(payload, offset)
+            offset += LANDMARK_FRAME.size
+            if count > max_hands:
+                raise ProtocolError(f"Frame with {count} hands (at most {max_hands})")
+            size = count * HAND_BYTES
+            if offset + size > len(payload):
+                raise ProtocolError("Truncated LANDMARKS")
+            normalized = np.frombuffer(payload, dtype='<f2', count=count * NUM_LANDMARKS * 3, offset=offset)
+            if not (np.isfinite(timestamp) and np.isfinite(normalized).all()):
+                raise ProtocolError("LANDMARKS with a non-finite value")
+            frames.append((timestamp, count, normalized.reshape(count, NUM_LANDMARKS, 3).astype(np.float32)))
+            offset += size
+    except struct.error:
+        raise ProtocolError("Truncated LANDMARKS")
+    return frames
+
+
+def encode_frame_batch(frames):
+    """FRAMES message from (timestamp, encoded image bytes) tuples"""
+    parts = [COUNT.pack(len(frames))]
+    for timestamp, image in frames:
+        parts.append(IMAGE_FRAME.pack(timestamp, len(image)))
+        parts.append(bytes(image))
+    return encode_message(MSG_FRAMES, b''.join(parts))
+
+
+def decode_frame_batch(payload):
+    """Get (timestamp, encoded image memoryview) tuples from a FRAMES payload"""
+    frames = []
+    view = memoryview(payload)
+    try:
+        (frame_count,), offset = COUNT.unpack_from(payload), COUNT.size
+        for _ in range(frame_count):
+            timestamp, size = IMAGE_FRAME.unpack_from(payload, offset)
+            offset += IMAGE_FRAME.size
+            if offset + size > len(payload):
+                raise ProtocolError("Truncated FRAMES")
+            frames.append((timestamp, view[offset:offset + size]))
+            offset += size
+    except struct.error:
+        raise ProtocolError("Truncated FRAMES")
+    return frames
+
+
+def encode_event_batch(frames_processed, events):
+    """EVENTS message from (timestamp, capture time, kind, value) tuples"""
+    parts = [EVENTS.pack(frames_processed, len(events))]
+    for timestamp, capture_time, kind, value in events:
+        data = value.encode('utf-8')
+        parts.append(EVENT.pack(timestamp, capture_time, EVENT_KINDS.index(kind), len(data)))
+        parts.append(data)
+    return encode_message(MSG_EVENTS, b''.join(parts))
+
+
+def decode_event_batch(payload):
+    """Get (frames processed, [(timestamp, capture time, kind, value)]) from an EVENTS payload"""
+    try:
+        frames_processed, count = EVENTS.unpack_from(payload)
+        offset = EVENTS.size
+        events = []
+        for _ in range(count):
+            timestamp, capture_time, kind, size = EVENT.unpack_from(payload, offset)
+            offset += EVENT.size
+            value = bytes(payload[offset:offset + size]).decode('utf-8')
+            offset += size
+            events.append((timestamp, capture_time, EVENT_KINDS[kind], value))
+    except (struct.error, IndexError, UnicodeDecodeError):
+        raise ProtocolError("Malformed EVENTS")
+    return frames_processed, events
+
+
+def encode_error(message):
+    """ERROR message"""
+    return encode_message(MSG_ERROR, message.encode('utf-8'))
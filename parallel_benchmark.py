@@ -0,0 +1,171 @@
+"""
+Parallel Inference Scaling Benchmark
+
+Tracks the same synthetic frames in this process and with 1..N worker
+processes (ParallelHandTracker) and reports, for each:
+
+- throughput: frames per second when frames are fed as fast as the
+  tracker takes them
+- latency: capture to landmarks available, p50/p95, when frames arrive
+  at --fps (like a camera)
+- frames whose result was skipped by the reorder buffer, or arrived
+  stale after a newer frame's result had already been applied
+
+The contour backend is fast enough that process overhead dominates;
+--work-ms adds simulated model time per frame (a sleep, or busy CPU with
+--spin) to show how a MediaPipe-sized model scales. Only a spinning
+workload scales with the number of CPU cores.
+
+Usage: python parallel_benchmark.py [--workers 4] [--backend contour] [--frames 300]
+                                    [--work-ms 20] [--spin] [--fps 30]
+"""
+
+import argparse
+import functools
+import itertools
+import os
+import sys
+import time
+import numpy as np
+from hand_backends import create_backend
+from hand_tracker import HandTracker
+from parallel_inference import ParallelHandTracker
+from synthetic_input import synthetic_source
+from config import *
+
+
+class SlowBackend:
+    """Wrap a backend and add fixed extra work to every frame (simulated model time)"""
+
+    def __init__(self, name, work_ms, spin=False):
+        self.backend = create_backend(name)
+        self.work = work_ms / 1000
+        self.spin = spin
+
+    def __getattr__(self, attribute):
+        return getattr(self.backend, attribute)
+
+    def process(self, image, out, profiler):
+        end = time.perf_counter() + self.work
+        count = self.backend.process(image, out, profiler)
+        if self.spin:
+            while time.perf_counter() < end:
+                pass
+        else:
+            time.sleep(max(0.0, end - time.perf_counter()))
+        return count
+
+
+def make_backend(name, work_ms, spin):
+    """Backend name, or a picklable factory of a SlowBackend"""
+    if work_ms <= 0:
+        return name
+    return functools.partial(SlowBackend, name, work_ms, spin)
+
+
+def make_tracker(workers, backend):
+    """In-process HandTracker (workers = 0) or ParallelHandTracker, model loaded"""
+    if workers == 0:
+        tracker = HandTracker(background_load=False,
+                              backend=backend() if callable(backend) else create_backend(backend))
+        tracker.roi_tracking = False
+        return tracker
+
+    tracker = ParallelHandTracker(workers, backend)
+    while not tracker.pool.is_ready() and tracker.pool.workers_failed < workers:
+        tracker.pool.collect(timeout=0.1)
+    # Let every worker finish loading so the first frames are not queued behind a load
+    deadline = time.perf_counter() + 30
+    while tracker.pool.workers_ready + tracker.pool.workers_failed < workers and time.perf_counter() < deadline:
+        tracker.pool.collect(timeout=0.1)
+    return tracker
+
+
+def run_tracker(tracker, frames, count, fps=None):
+    """Feed count frames and return elapsed time and per-frame latencies.
+
+    Latency is measured from a frame's capture timestamp to the call that
+    first returns landmarks with that timestamp.
+    """
+    captured = {}
+    latencies = []
+    last_timestamp = None
+    start = time.perf_counter()
+    for index, frame in enumerate(itertools.islice(itertools.cycle(frames), count)):
+        if fps:
+            delay = start + index / fps - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        timestamp = time.perf_counter()
+        captured[timestamp] = True
+        landmarks = tracker.process_frame(frame, timestamp)
+        if landmarks.timestamp != last_timestamp and landmarks.timestamp in captured:
+            latencies.append(time.perf_counter() - landmarks.timestamp)
+            last_timestamp = landmarks.timestamp
+    return {'elapsed': time.perf_counter() - start, 'latencies': np.array(latencies)}
+
+
+def run_parallel_benchmark(max_workers=4, backend='contour', frames=300, work_ms=0.0, spin=False, fps=30):
+    """Measure the in-process tracker and 1..max_workers worker processes"""
+    frames_iter, _ = synthetic_source()
+    images = [frame.copy() for frame in frames_iter()]
+    backend = make_backend(backend, work_ms, spin)
+
+    results = []
+    for workers in range(max_workers + 1):
+        tracker = make_tracker(workers, backend)
+        tracker.show_debug = False
+        try:
+            if tracker.load_error is not None:
+                results.append({'workers': workers, 'error': str(tracker.load_error)})
+                continue
+            run_tracker(tracker, images, min(len(images), 30))
+            throughput = run_tracker(tracker, images, frames)
+            paced = run_tracker(tracker, images, frames, fps)
+            result = {'workers': workers, 'fps': frames / throughput['elapsed'],
+                      'latencies': paced['latencies'], 'skipped': 0, 'stale': 0}
+            if workers:
+                result.update(skipped=tracker.reorder.skipped, stale=tracker.reorder.stale)
+            results.append(result)
+        finally:
+            tracker.release()
+    return results
+
+
+def print_parallel_benchmark(results, fps):
+    """Print one line per worker count"""
+    baseline = next((r['fps'] for r in results if 'fps' in r), None)
+    print(f"CPU cores: {os.cpu_count()}")
+    print(f"{'workers':>8s} {'fps':>8s} {'speedup':>8s} {f'p50 ms @{fps}':>12s} {f'p95 ms @{fps}':>12s} "
+          f"{'skipped':>8s} {'stale':>6s}")
+    for r in results:
+        label = 'inline' if r['workers'] == 0 else str(r['workers'])
+        if 'error' in r:
+            print(f"{label:>8s} unavailable: {r['error']}")
+            continue
+        latencies = r['latencies'] * 1000
+        p50 = f"{np.percentile(latencies, 50):12.1f}" if len(latencies) else f"{'-':>12s}"
+        p95 = f"{np.percentile(latencies, 95):12.1f}" if len(latencies) else f"{'-':>12s}"
+        print(f"{label:>8s} {r['fps']:8.1f} {r['fps'] / baseline:7.2f}x {p50} {p95} "
+              f"{r['skipped']:8d} {r['stale']:6d}")
+
+
+def main():
+    """Run the benchmark with command-line options"""
+    parser = argparse.ArgumentParser(description="Parallel inference scaling benchmark")
+    parser.add_argument('--workers', type=int, default=4, help="largest number of worker processes")
+    parser.add_argument('--backend', default='contour', help="hand tracking backend")
+    parser.add_argument('--frames', type=int, default=300, help="frames per measurement")
+    parser.add_argument('--work-ms', type=float, default=0.0, help="simulated extra model time per frame")
+    parser.add_argument('--spin', action='store_true', help="simulate model time with busy CPU instead of sleeping")
+    parser.add_argument('--fps', type=float, default=FPS_TARGET, help="camera rate for the latency measurement")
+    args = parser.parse_args()
+
+    results = run_parallel_benchmark(args.workers, args.backend, args.frames, args.work_ms, args.spin, args.fps)
+    print_parallel_benchmark(results, args.fps)
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
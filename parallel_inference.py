@@ -0,0 +1,443 @@
+"""
+Multi-Process Hand Inference for the Virtual Keyboard
+
+A single tracking call per frame keeps one core busy and caps the frame
+rate at the model's speed. InferencePool spreads frames over worker
+processes, each with its own backend instance (its own MediaPipe Hands
+graph). Frames are copied once into a multiprocessing.shared_memory ring
+of frame slots and only the slot number travels to the worker, so frames
+are never pickled. The small landmark arrays come back on a result queue.
+
+ParallelHandTracker puts the pool behind the HandTracker interface for
+one camera stream, reassembling results in frame order.
+"""
+
+import multiprocessing
+import queue
+import threading
+import time
+from multiprocessing import shared_memory
+import cv2
+import numpy as np
+from hand_backends import HandBackend, create_backend
+from hand_model import NUM_LANDMARKS
+from hand_tracker import HandTracker, LandmarkBuffer, LandmarkPredictor
+from profiling import StageProfiler
+from config import *
+
+# A slot whose result has not come back after this long (a worker that
+# crashed or hung) is taken back, and its result ignored if it ever arrives
+SLOT_TIMEOUT = 5.0
+
+
+class FrameRing:
+    """Fixed-size frame slots in one shared memory block"""
+
+    def __init__(self, memory, slots, slot_bytes):
+        self.memory = memory
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self.buffer = np.ndarray((slots, slot_bytes), dtype=np.uint8, buffer=memory.buf)
+
+    @classmethod
+    def create(cls, slots, slot_bytes):
+        """Allocate a new ring"""
+        memory = shared_memory.SharedMemory(create=True, size=slots * slot_bytes)
+        return cls(memory, slots, slot_bytes)
+
+    @classmethod
+    def attach(cls, name, slots, slot_bytes):
+        """Open a ring created by another process"""
+        return cls(shared_memory.SharedMemory(name=name), slots, slot_bytes)
+
+    @property
+    def name(self):
+        return self.memory.name
+
+    def write(self, slot, frame):
+        """Copy a frame into a slot"""
+        data = self.buffer[slot, :frame.nbytes].reshape(frame.shape)
+        np.copyto(data, frame)
+
+    def read(self, slot, shape):
+        """View of the frame in a slot (valid until the slot is reused)"""
+        return self.buffer[slot, :int(np.prod(shape))].reshape(shape)
+
+    def close(self):
+        """Detach from the shared memory"""
+        self.buffer = None
+        self.memory.close()
+
+    def unlink(self):
+        """Free the shared memory (creator only, after every process closed it)"""
+        self.memory.unlink()
+
+
+def _inference_worker(worker_id, backend, tasks, results):
+    """Worker process: track the frames named by tasks and send back landmarks.
+
+    A task is (stream_id, seq, slot, (ring name, slots, slot bytes), shape,
+    inference_size, model_complexity); None stops the worker.
+    """
+    try:
+        backend = create_backend(backend) if isinstance(backend, str) else backend()
+        load_times = backend.load()
+    except Exception as e:
+        results.put(('error', worker_id, str(e)))
+        return
+    results.put(('ready', worker_id, load_times))
+
+    profiler = StageProfiler(enabled=False)
+    out = np.zeros((backend.max_hands, NUM_LANDMARKS, 3), dtype=np.float32)
+    ring = None
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+
+            stream_id, seq, slot, ring_spec, shape, inference_size, model_complexity = task
+            if ring is None or ring.name != ring_spec[0]:
+                if ring is not None:
+                    ring.close()
+                ring = FrameRing.attach(*ring_spec)
+
+            start = time.perf_counter()
+            image = ring.read(slot, shape)
+            if inference_size and max(shape[:2]) > inference_size:
+                scale = inference_size / max(shape[:2])
+                image = cv2.resize(image, (max(1, int(shape[1] * scale)), max(1, int(shape[0] * scale))),
+                                   interpolation=cv2.INTER_AREA)
+            if model_complexity is not None:
+                backend.set_model_complexity(model_complexity)
+            count = backend.process(image, out, profiler)
+            results.put(('result', worker_id, stream_id, seq, slot, count, out[:count].copy(),
+                         time.perf_counter() - start))
+    finally:
+        backend.close()
+        if ring is not None:
+            ring.close()
+
+
+class InferencePool:
+    """Hand tracking spread over worker processes.
+
+    Frames of any number of streams are submitted into free ring slots and
+    handed to whichever worker is idle. Each stream numbers its frames
+    (seq) so results, which come back in completion order, can be put back
+    in frame order by the consumer (see ReorderBuffer).
+    """
+
+    def __init__(self, workers=INFERENCE_WORKERS, backend=HAND_TRACKING_BACKEND, slots=INFERENCE_RING_SLOTS,
+                 frame_size=(CAMERA_WIDTH, CAMERA_HEIGHT)):
+        self.workers = max(1, workers)
+        self.slots = slots or self.workers
+        self.ready = threading.Event()
+        self.load_times = {}
+        self.load_error = None
+        self.workers_ready = 0
+        self.workers_failed = 0
+
+        self._ring = FrameRing.create(self.slots, frame_size[0] * frame_size[1] * 3)
+        self._old_rings = []
+        self._free_slots = list(range(self.slots))
+        self._slot_owner = {}  # slot -> (stream_id, seq, submit time)
+        self._next_seq = {}
+
+        context = multiprocessing.get_context()
+        self._tasks = context.Queue()
+        self._results = context.Queue()
+        self._processes = []
+        for worker_id in range(self.workers):
+            process = context.Process(target=_inference_worker, name=f'inference-{worker_id}', daemon=True,
+                                      args=(worker_id, backend, self._tasks, self._results))
+            process.start()
+            self._processes.append(process)
+
+    def is_ready(self):
+        """Check if at least one worker has loaded its model"""
+        return self.ready.is_set()
+
+    def free_slots(self):
+        """Number of frames that can be submitted without waiting"""
+        self._reclaim_stuck_slots()
+        return len(self._free_slots)
+
+    def in_flight(self, stream_id=None):
+        """Number of submitted frames (of one stream, or all) without a result yet"""
+        return sum(1 for owner in self._slot_owner.values()
+                   if stream_id is None or owner[0] == stream_id)
+
+    def submit(self, frame, stream_id=0, inference_size=None, model_complexity=None):
+        """Copy a frame into a free slot and queue it for the workers.
+
+        Returns the frame's sequence number within its stream, or None if
+        every slot is busy.
+        """
+        if not self.free_slots():
+            return None
+        if frame.nbytes > self._ring.slot_bytes:
+            if self._slot_owner:
+                # The ring can only be replaced once no worker is reading it
+                return None
+            self._replace_ring(frame.nbytes)
+
+        slot = self._free_slots.pop()
+        seq = self._next_seq.get(stream_id, 0)
+        self._next_seq[stream_id] = seq + 1
+        self._ring.write(slot, frame)
+        self._slot_owner[slot] = (stream_id, seq, time.perf_counter())
+
+        ring_spec = (self._ring.name, self._ring.slots, self._ring.slot_bytes)
+        self._tasks.put((stream_id, seq, slot, ring_spec, frame.shape, inference_size, model_complexity))
+        return seq
+
+    def collect(self, timeout=0.0):
+        """Get the results that have arrived, waiting up to timeout for the first.
+
+        Returns a list of dicts with the stream_id, seq, count, landmarks
+        (normalized, (count, 21, 3)), worker and inference_time (seconds).
+        """
+        results = []
+        block = timeout > 0
+        while True:
+            try:
+                message = self._results.get(block, timeout) if block else self._results.get_nowait()
+            except queue.Empty:
+                break
+            block = False
+
+            kind, worker_id = message[:2]
+            if kind == 'ready':
+                self.workers_ready += 1
+                if not self.load_times:
+                    self.load_times = message[2]
+                self.ready.set()
+            elif kind == 'error':
+                self.workers_failed += 1
+                self.load_error = message[2]
+                print(f"Inference worker {worker_id} failed to load: {message[2]}")
+            else:
+                _, _, stream_id, seq, slot, count, landmarks, inference_time = message
+                owner = self._slot_owner.get(slot)
+                if owner is None or owner[:2] != (stream_id, seq):
+                    # Slot was taken back after SLOT_TIMEOUT
+                    continue
+                del self._slot_owner[slot]
+                self._free_slots.append(slot)
+                results.append({'stream_id': stream_id, 'seq': seq, 'count': count, 'landmarks': landmarks,
+                                'worker': worker_id, 'inference_time': inference_time})
+        return results
+
+    def _reclaim_stuck_slots(self):
+        """Take back slots whose worker never answered"""
+        now = time.perf_counter()
+        for slot, (stream_id, seq, submitted) in list(self._slot_owner.items()):
+            if now - submitted > SLOT_TIMEOUT:
+                print(f"Inference of frame {seq} (stream {stream_id}) timed out")
+                del self._slot_owner[slot]
+                self._free_slots.append(slot)
+
+    def _replace_ring(self, slot_bytes):
+        """Allocate a ring with larger slots (frames bigger than expected)"""
+        # Workers may still have the old block open; it is freed on close()
+        self._old_rings.append(self._ring)
+        self._ring = FrameRing.create(self.slots, slot_bytes)
+
+    def close(self, timeout=2.0):
+        """Stop the workers and free the shared memory"""
+        for _ in self._processes:
+            self._tasks.put(None)
+        for process in self._processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+                process.join(timeout)
+        self._processes = []
+
+        for ring in [self._ring] + self._old_rings:
+            ring.close()
+            ring.unlink()
+        self._old_rings = []
+        self._tasks.close()
+        self._results.close()
+
+
+class ReorderBuffer:
+    """Release the results of one stream in frame order.
+
+    A result waits until every earlier frame's result has been released.
+    If an earlier frame is still missing after timeout seconds while later
+    results are waiting, it is given up on (skipped), and when its result
+    does arrive it is dropped as stale, so results never go backwards.
+    """
+
+    def __init__(self, timeout=INFERENCE_REORDER_TIMEOUT):
+        self.timeout = timeout
+        self.next_seq = 0
+        self.skipped = 0
+        self.stale = 0
+        self._pending = {}
+        self._submitted = {}
+
+    def submitted(self, seq, now):
+        """Note when a frame was submitted"""
+        self._submitted[seq] = now
+
+    def add(self, seq, result):
+        """Add a result. Returns False if it is stale and was dropped"""
+        if seq < self.next_seq:
+            self.stale += 1
+            return False
+        self._pending[seq] = result
+        return True
+
+    def pop(self, now):
+        """Get the results that are ready, in frame order"""
+        ready = []
+        while self._pending:
+            if self.next_seq in self._pending:
+                ready.append(self._pending.pop(self.next_seq))
+            elif now - self._submitted.get(self.next_seq, now) > self.timeout:
+                self.skipped += 1
+            else:
+                break
+            self._submitted.pop(self.next_seq, None)
+            self.next_seq += 1
+        return ready
+
+    def __len__(self):
+        return len(self._pending)
+
+
+class PoolBackend(HandBackend):
+    """Stand-in for the workers' backends on the tracker side of a pool.
+
+    Inference never runs in this process, so there is nothing to load here.
+    ROI crops are not used since consecutive frames go to different workers.
+    """
+
+    supports_roi = False
+
+    def __init__(self, pool, backend=HAND_TRACKING_BACKEND):
+        super().__init__()
+        self.pool = pool
+        self.name = f"{backend if isinstance(backend, str) else 'custom'} x{pool.workers}"
+
+
+class ParallelHandTracker(HandTracker):
+    """HandTracker that runs inference on an InferencePool.
+
+    Each process_frame call submits the frame and returns the newest
+    result that is ready in frame order, so with N workers about N frames
+    are in flight: throughput scales with the workers while each frame
+    still takes one inference, plus the wait behind the frames before it.
+    A frame's result is picked up by a later call, so the landmarks trail
+    the camera by at least one frame. When every slot is busy the call
+    waits for a worker. With skip_frames > 1 only every Nth frame is
+    submitted and the landmarks of the others are predicted from the
+    recent results, as in HandTracker.
+    """
+
+    def __init__(self, workers=INFERENCE_WORKERS, backend=HAND_TRACKING_BACKEND, slots=INFERENCE_RING_SLOTS,
+                 reorder_timeout=INFERENCE_REORDER_TIMEOUT):
+        # The backend is only created inside the workers
+        self.pool = InferencePool(workers, backend, slots)
+        self.reorder = ReorderBuffer(reorder_timeout)
+        super().__init__(background_load=False, backend=PoolBackend(self.pool, backend))
+        self.model_complexity = None
+        self._latest = LandmarkBuffer()
+        self._capture_times = {}
+        self.superseded = 0
+
+    def _start_loading(self, background_load):
+        # Every worker loads its own backend; ready, load_times and load_error come from the pool
+        pass
+
+    @property
+    def ready(self):
+        return self.pool.ready
+
+    @property
+    def load_times(self):
+        return self.pool.load_times
+
+    @property
+    def load_error(self):
+        # Only an error once no worker could load the model
+        if self.pool.workers_failed >= self.pool.workers:
+            return self.pool.load_error
+        return None
+
+    def set_model_complexity(self, model_complexity):
+        """Request a MediaPipe model complexity in every worker"""
+        self.model_complexity = model_complexity
+
+    def process_frame(self, frame, timestamp=None):
+        """Submit a frame and return the newest in-order result.
+
+        The landmarks keep the capture timestamp of the frame they were
+        tracked on. Until the first result arrives no hands are reported;
+        a call without a new result repeats the previous one, except on
+        skipped frames, which get the landmarks predicted for their own
+        timestamp.
+        """
+        if timestamp is None:
+            timestamp = time.time()
+
+        self._receive()
+        skipped = self.frame_index % self.skip_frames != 0
+        if self.pool.is_ready() and not skipped:
+            start = self.profiler.start()
+            seq = self.pool.submit(frame, inference_size=self.inference_size,
+                                   model_complexity=self.model_complexity)
+            while seq is None:
+                # Every worker is busy: wait for one
+                self._receive(timeout=0.05)
+                seq = self.pool.submit(frame, inference_size=self.inference_size,
+                                       model_complexity=self.model_complexity)
+            self.profiler.stop('inference', start)
+            self.reorder.submitted(seq, time.perf_counter())
+            self._capture_times[seq] = (timestamp, (frame.shape[1], frame.shape[0]))
+        if self.pool.is_ready():
+            self.frame_index += 1
+
+        ready = self.reorder.pop(time.perf_counter())
+        if ready:
+            self.superseded += len(ready) - 1
+            self._apply(ready[-1])
+
+        landmarks = self._next_buffer()
+        if skipped and LANDMARK_PREDICTION:
+            self.predictor.predict(timestamp, landmarks)
+        else:
+            landmarks.copy_from(self._latest)
+
+        if self.show_debug and SHOW_LANDMARKS:
+            for hand in landmarks:
+                self._draw_landmarks(frame, hand)
+        return landmarks
+
+    def _receive(self, timeout=0.0):
+        """Move arrived results into the reorder buffer"""
+        for result in self.pool.collect(timeout):
+            if not self.reorder.add(result['seq'], result):
+                self._capture_times.pop(result['seq'], None)
+
+    def _apply(self, result):
+        """Make a result the current landmarks"""
+        # Frames skipped by the reorder buffer never get a result
+        for seq in [seq for seq in self._capture_times if seq < result['seq']]:
+            del self._capture_times[seq]
+        timestamp, frame_size = self._capture_times.pop(result['seq'])
+
+        latest = self._latest
+        latest.count = min(result['count'], len(latest.normalized))
+        latest.normalized[:latest.count] = result['landmarks'][:latest.count]
+        latest.timestamp = timestamp
+        latest.update_pixels(frame_size)
+        self.predictor.update(latest, frame_size)
+
+    def release(self):
+        """Stop the worker processes"""
+        self.pool.close()
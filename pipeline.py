@@ -0,0 +1,181 @@
+"""
+Threaded Frame Pipeline for the Virtual Keyboard
+"""
+
+import threading
+from collections import deque
+
+# Queue drop policies
+DROP_OLDEST = 'drop_oldest'  # Discard the oldest queued item to make room
+DROP_NEWEST = 'drop_newest'  # Discard the incoming item when full
+BLOCK = 'block'  # Wait for room (never drops)
+
+DROP_POLICIES = (DROP_OLDEST, DROP_NEWEST, BLOCK)
+
+
+class PipelineClosed(Exception):
+    """Raised when reading from a queue that is closed and fully drained"""
+
+
+class FrameQueue:
+    """Bounded queue joining two pipeline stages.
+
+    With the default drop-oldest policy a consumer always receives the most
+    recent items, so a stale frame is never processed after a newer one is
+    available.
+    """
+
+    def __init__(self, maxsize=1, drop_policy=DROP_OLDEST):
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError(f"Unknown drop policy: {drop_policy}")
+
+        self.maxsize = max(1, maxsize)
+        self.drop_policy = drop_policy
+        self.closed = False
+        self.dropped = 0
+
+        self._items = deque()
+        self._condition = threading.Condition()
+
+    def put(self, item):
+        """Add an item, applying the drop policy when full. Returns False if dropped"""
+        with self._condition:
+            while len(self._items) >= self.maxsize and not self.closed:
+                if self.drop_policy == DROP_OLDEST:
+                    self._items.popleft()
+                    self.dropped += 1
+                elif self.drop_policy == DROP_NEWEST:
+                    self.dropped += 1
+                    return False
+                else:
+                    self._condition.wait()
+
+            if self.closed:
+                return False
+
+            self._items.append(item)
+            self._condition.notify_all()
+            return True
+
+    def get(self, timeout=None):
+        """Get the next item, or None on timeout.
+
+        Items queued before close() are still returned; PipelineClosed is
+        raised once the queue is closed and empty.
+        """
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._items or self.closed, timeout):
+                return None
+
+            if self._items:
+                item = self._items.popleft()
+                self._condition.notify_all()
+                return item
+
+            raise PipelineClosed()
+
+    def close(self):
+        """Close the queue, waking up any waiting producers and consumers"""
+        with self._condition:
+            self.closed = True
+            self._condition.notify_all()
+
+    def __len__(self):
+        with self._condition:
+            return len(self._items)
+
+
+class PipelineStage(threading.Thread):
+    """A pipeline stage running on its own thread.
+
+    A stage without an input queue is a source: its function is called with
+    no arguments until it raises StopIteration or the pipeline stops. Other
+    stages call their function for each input item. Results other than None
+    are put on the output queue. When a stage exits it closes its output
+    queue so shutdown cascades down the pipeline.
+    """
+
+    def __init__(self, name, func, input_queue=None, output_queue=None, stop_event=None):
+        super().__init__(name=name, daemon=True)
+        self.func = func
+        self.input_queue = input_queue
+        self.output_queue = output_queue
+        self.stop_event = stop_event or threading.Event()
+        self.error = None
+        self.processed = 0
+
+    def run(self):
+        try:
+            while True:
+                if self.input_queue is None:
+                    if self.stop_event.is_set():
+                        break
+                    result = self.func()
+                else:
+                    try:
+                        item = self.input_queue.get()
+                    except PipelineClosed:
+                        break
+                    result = self.func(item)
+
+                self.processed += 1
+                if result is not None and self.output_queue is not None:
+                    self.output_queue.put(result)
+
+        except StopIteration:
+            pass
+
+        except Exception as e:
+            self.error = e
+            print(f"Error in pipeline stage '{self.name}': {e}")
+
+        finally:
+            if self.output_queue is not None:
+                self.output_queue.close()
+
+
+class Pipeline:
+    """A set of stages joined by bounded queues"""
+
+    def __init__(self):
+        self.stages = []
+        self.queues = {}
+        self.stop_event = threading.Event()
+
+    def add_queue(self, name, maxsize=1, drop_policy=DROP_OLDEST):
+        """Create a named queue to join stages"""
+        queue = FrameQueue(maxsize, drop_policy)
+        self.queues[name] = queue
+        return queue
+
+    def add_stage(self, name, func, input_queue=None, output_queue=None):
+        """Create a stage reading from input_queue and writing to output_queue"""
+        stage = PipelineStage(name, func, input_queue, output_queue, self.stop_event)
+        self.stages.append(stage)
+        return stage
+
+    def start(self):
+        """Start all stage threads"""
+        for stage in self.stages:
+            stage.start()
+
+    def stop(self, timeout=2.0):
+        """Stop the source stages, close every queue and join the threads"""
+        self.stop_event.set()
+        for queue in self.queues.values():
+            queue.close()
+
+        for stage in self.stages:
+            if stage.is_alive():
+                stage.join(timeout)
+
+    def is_running(self):
+        """Check whether any stage is still running"""
+        return any(stage.is_alive() for stage in self.stages)
+
+    def get_stats(self):
+        """Get queue depth and drop counts for every queue"""
+        return {
+            name: {'depth': len(queue), 'dropped': queue.dropped}
+            for name, queue in self.queues.items()
+        }
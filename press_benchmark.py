@@ -0,0 +1,140 @@
+"""
+Press Detector Accuracy and Latency Benchmark
+
+Replays synthetic tap sessions at several hand sizes (distances from the
+camera) and noise levels through the typing logic once per press
+detector, and reports the share of taps detected, false presses and the
+press latency: the time from the first frame of each tap's downward
+motion to its key event. Measuring from the start of the motion keeps
+latencies non-negative and comparable between detectors that fire
+before the finger stops and detectors that wait for it.
+
+Recorded sessions given on the command line are replayed as well. They
+have no ground truth, so only the typed keys of each detector are shown.
+
+Usage: python press_benchmark.py [--text TEXT] [--fps 30] [session.vkl ...]
+"""
+
+import argparse
+import sys
+import numpy as np
+from press_detector import create_press_detector
+from session_recording import load_session
+from session_replay import ReplayClock, ReplayHandTracker, ReplayInputSimulator, replay_session
+from synthetic_input import add_noise, generate_tap_session
+from config import *
+
+DETECTORS = ('distance', 'state_machine', 'calibrated')
+
+# (name, hand scale in pixels, landmark noise in pixels)
+SCENARIOS = [
+    ('far hand', 50, 0.0),
+    ('typical hand', 80, 0.0),
+    ('near hand', 120, 0.0),
+    ('typical hand, noisy', 80, 1.5),
+    ('far hand, noisy', 50, 1.5),
+    ('far hand, very noisy', 50, 5.0),
+]
+
+
+def make_app(detector, frame_size=(CAMERA_WIDTH, CAMERA_HEIGHT)):
+    """Create a headless app using the given press detector"""
+    from virtual_keyboard import VirtualKeyboardApp
+
+    tracker = ReplayHandTracker(frame_size)
+    injector = ReplayInputSimulator(ReplayClock())
+    app = VirtualKeyboardApp(hand_tracker=tracker, input_simulator=injector)
+    app.quality_governor = None
+    app.press_detector = create_press_detector(detector, profile_path=None)
+    return app
+
+
+def score_taps(session, events):
+    """Match emitted key presses to the session's taps.
+
+    Each press is assigned to the tap whose contact frame is closest in
+    time; it counts as a hit if the key matches and the tap is not already
+    taken, otherwise as a false press. A hit's latency is measured from
+    the first frame of the tap's downward motion.
+    """
+    timestamps = session['timestamps']
+    contact_times = np.array([timestamps[frame] for _, frame in session['presses']])
+    start_times = timestamps[session['tap_starts']]
+    hits = {}
+    false_presses = 0
+    for timestamp, kind, value in events:
+        if kind != 'press':
+            continue
+        tap = int(np.argmin(np.abs(contact_times - timestamp)))
+        if tap not in hits and session['presses'][tap][0] == value:
+            hits[tap] = (timestamp - start_times[tap]) * 1000
+        else:
+            false_presses += 1
+
+    return {
+        'taps': len(contact_times),
+        'detected': len(hits),
+        'false_presses': false_presses,
+        'latencies_ms': np.array(list(hits.values()))
+    }
+
+
+def run_benchmark(text='the quick brown fox jumps over the lazy dog', fps=FPS_TARGET):
+    """Score every detector on every synthetic scenario"""
+    keys = [('space' if char == ' ' else char) for char in text.lower()]
+    results = []
+    for name, hand_scale, noise_px in SCENARIOS:
+        for detector in DETECTORS:
+            app = make_app(detector)
+            session = generate_tap_session(app.keyboard, keys, fps=fps, hand_scale=hand_scale,
+                                           start_time=10.0, frame_size=app.hand_tracker.frame_size)
+            add_noise(session, noise_px)
+            replay = replay_session(session, app)
+            score = score_taps(session, replay['events'])
+            score.update(scenario=name, detector=detector,
+                         frame_ms=float(replay['frame_times'].mean() * 1000))
+            results.append(score)
+    return results
+
+
+def print_benchmark(results):
+    """Print one line per scenario and detector"""
+    print(f"{'scenario':22s} {'detector':14s} {'detected':>9s} {'false':>6s} "
+          f"{'p50 ms':>8s} {'p95 ms':>8s} {'frame ms':>9s}")
+    for r in results:
+        latencies = r['latencies_ms']
+        p50 = f"{np.percentile(latencies, 50):8.1f}" if len(latencies) else f"{'-':>8s}"
+        p95 = f"{np.percentile(latencies, 95):8.1f}" if len(latencies) else f"{'-':>8s}"
+        print(f"{r['scenario']:22s} {r['detector']:14s} "
+              f"{r['detected']:4d}/{r['taps']:<4d} {r['false_presses']:6d} "
+              f"{p50} {p95} {r['frame_ms']:9.3f}")
+
+
+def compare_recorded(path):
+    """Print the keys each detector types for a recorded session"""
+    print(f"\n{path}")
+    for detector in DETECTORS:
+        session = load_session(path)
+        app = make_app(detector, session['frame_size'])
+        replay = replay_session(session, app)
+        print(f"  {detector:14s} ({len(replay['keys'])} keys): {' '.join(replay['keys'])}")
+
+
+def main():
+    """Run the benchmark with command-line options"""
+    parser = argparse.ArgumentParser(description="Press detector accuracy and latency benchmark")
+    parser.add_argument('--text', default='the quick brown fox jumps over the lazy dog',
+                        help="text to tap out in the synthetic sessions")
+    parser.add_argument('--fps', type=float, default=FPS_TARGET, help="synthetic camera frame rate")
+    parser.add_argument('sessions', nargs='*', help="recorded sessions to compare")
+    args = parser.parse_args()
+
+    print_benchmark(run_benchmark(args.text, args.fps))
+    for path in args.sessions:
+        compare_recorded(path)
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,185 @@
+"""
+Online Per-User Calibration of Press Thresholds
+
+A fingertip's extension (fingertip-to-wrist distance divided by the hand
+scale, the wrist to middle-finger MCP distance) does not depend on how
+far the hand is from the camera, but where a user's open and pressed
+fingers sit on that scale still varies from user to user. PressCalibration
+keeps a streaming estimate (exponentially weighted mean and variance) of
+every finger's open extension and of the extension at the bottom of its
+taps, and places the press threshold between the two distributions with
+a hysteresis band proportional to the gap.
+
+Taps are found as dips of the extension well below the open level,
+independently of the current threshold, so a threshold that starts out
+too deep for a light tapper still learns their shallower presses.
+
+The estimates are saved as a JSON profile and loaded at startup.
+"""
+
+import json
+import os
+import numpy as np
+from hand_model import FINGER_JOINTS, OPEN_HAND, CURLED_TIP_RATIO
+from config import *
+
+PROFILE_VERSION = 1
+
+
+def default_extensions(tip_ids):
+    """Open and fully curled extension of each fingertip in the hand model"""
+    open_extension = np.array([np.hypot(*OPEN_HAND[tip_id]) for tip_id in tip_ids], dtype=np.float64)
+    pressed_extension = np.array([np.hypot(*OPEN_HAND[FINGER_JOINTS[tip_id][0]]) * CURLED_TIP_RATIO
+                                  for tip_id in tip_ids], dtype=np.float64)
+    return open_extension, pressed_extension
+
+
+class RunningStats:
+    """Exponentially weighted mean and variance of one value per finger.
+
+    Until 1/rate samples have been seen every sample weighs the same; after
+    that the estimate follows the most recent ~1/rate samples.
+    """
+
+    def __init__(self, mean, std, count, rate):
+        self.mean = np.array(mean, dtype=np.float64)
+        self.var = np.square(np.broadcast_to(np.asarray(std, dtype=np.float64), self.mean.shape)).copy()
+        self.count = np.broadcast_to(np.asarray(count, dtype=np.int64), self.mean.shape).copy()
+        self.rate = rate
+
+    @property
+    def std(self):
+        return np.sqrt(self.var)
+
+    def add(self, finger, value):
+        """Add a sample of one finger"""
+        self.count[finger] += 1
+        weight = max(1.0 / self.count[finger], self.rate)
+        delta = value - self.mean[finger]
+        self.mean[finger] += weight * delta
+        self.var[finger] = (1 - weight) * (self.var[finger] + weight * delta * delta)
+
+    def to_dict(self):
+        return {'mean': self.mean.tolist(), 'std': self.std.tolist(), 'count': self.count.tolist()}
+
+
+class PressCalibration:
+    """Per-finger press threshold and hysteresis learned from a user's taps.
+
+    threshold and hysteresis (arrays over tip_ids, in hand scales) are used
+    by ThresholdPressDetector: a finger presses when its extension falls
+    below threshold - hysteresis / 2 and releases above threshold +
+    hysteresis / 2.
+    """
+
+    def __init__(self, tip_ids=TYPING_FINGER_TIP_IDS, max_hands=MAX_NUM_HANDS):
+        self.tip_ids = list(tip_ids)
+        open_extension, pressed_extension = default_extensions(self.tip_ids)
+        prior = CALIBRATION_PRIOR_SAMPLES
+        self.open = RunningStats(open_extension, CALIBRATION_MIN_STD, prior, CALIBRATION_RATE)
+        self.pressed = RunningStats(pressed_extension, CALIBRATION_MIN_STD, prior, CALIBRATION_RATE)
+        self.threshold = np.zeros(len(self.tip_ids))
+        self.hysteresis = np.zeros(len(self.tip_ids))
+        self.update_thresholds()
+
+        # Lowest extension of each (hand, finger) dip in progress (inf outside
+        # a dip) and highest extension since the last dip
+        self._dip_minimum = np.full((max_hands, len(self.tip_ids)), np.inf)
+        self._rest_maximum = np.full((max_hands, len(self.tip_ids)), -np.inf)
+        self.taps_observed = 0
+
+    def update_thresholds(self):
+        """Place each finger's threshold between its open and pressed distributions"""
+        open_std = np.maximum(self.open.std, CALIBRATION_MIN_STD)
+        pressed_std = np.maximum(self.pressed.std, CALIBRATION_MIN_STD)
+        gap = self.open.mean - self.pressed.mean
+        valid = gap >= CALIBRATION_MIN_GAP
+
+        # Equally many standard deviations from both means, but never close
+        # to either, so the hysteresis band stays between them
+        fraction = np.clip(pressed_std / (pressed_std + open_std), 0.3, 0.7)
+        threshold = self.pressed.mean + gap * fraction
+        self.threshold[valid] = threshold[valid]
+        self.hysteresis[valid] = CALIBRATION_HYSTERESIS * gap[valid]
+
+    def reset_hands(self):
+        """Forget the dips and rests in progress (the hands were lost)"""
+        self._dip_minimum[:] = np.inf
+        self._rest_maximum[:] = -np.inf
+
+    def observe(self, extension):
+        """Learn from one frame of fingertip extensions, shape (hands, fingers).
+
+        Each tap adds two samples: the highest extension of the rest
+        before it to the open distribution and the lowest extension of the
+        dip to the pressed one. Frames in between (the finger moving) are
+        never sampled.
+        """
+        count = len(extension)
+        dip_level = self.open.mean - CALIBRATION_DIP * (self.open.mean - self.pressed.mean)
+        dip_end = (self.open.mean + dip_level) / 2
+        dips = self._dip_minimum[:count]
+        rests = self._rest_maximum[:count]
+        changed = False
+
+        for hand, finger in zip(*np.nonzero((extension < dip_level) | np.isfinite(dips))):
+            value = extension[hand, finger]
+            if np.isinf(dips[hand, finger]) and np.isfinite(rests[hand, finger]):
+                # A dip starts: the rest before it was the open level
+                self.open.add(finger, rests[hand, finger])
+                rests[hand, finger] = -np.inf
+            if value < dip_end[finger]:
+                dips[hand, finger] = min(dips[hand, finger], value)
+            else:
+                # The finger opened again: the bottom of the dip was a tap
+                self.pressed.add(finger, dips[hand, finger])
+                dips[hand, finger] = np.inf
+                self.taps_observed += 1
+                changed = True
+
+        resting = np.isinf(dips)
+        np.maximum(rests, np.where(resting, extension, -np.inf), out=rests)
+
+        if changed:
+            self.update_thresholds()
+
+    def to_dict(self):
+        return {
+            'version': PROFILE_VERSION,
+            'tip_ids': self.tip_ids,
+            'open': self.open.to_dict(),
+            'pressed': self.pressed.to_dict(),
+            'threshold': self.threshold.tolist(),
+            'hysteresis': self.hysteresis.tolist(),
+            'taps_observed': self.taps_observed
+        }
+
+    def save(self, path):
+        """Write the profile (atomically, so a crash never leaves half a file)"""
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path, tip_ids=TYPING_FINGER_TIP_IDS):
+        """Load a saved profile, or start from the defaults if there is none"""
+        calibration = cls(tip_ids)
+        if not path or not os.path.exists(path):
+            return calibration
+        try:
+            with open(path) as f:
+                profile = json.load(f)
+            if profile.get('version') != PROFILE_VERSION or profile.get('tip_ids') != calibration.tip_ids:
+                raise ValueError("profile is for another version or finger set")
+            for name in ('open', 'pressed'):
+                stats = getattr(calibration, name)
+                setattr(calibration, name, RunningStats(profile[name]['mean'], profile[name]['std'],
+                                                        profile[name]['count'], stats.rate))
+            calibration.taps_observed = profile.get('taps_observed', 0)
+            calibration.update_thresholds()
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"Ignoring press calibration profile {path}: {e}")
+            return cls(tip_ids)
+        print(f"Loaded press calibration from {path} ({calibration.taps_observed} taps)")
+        return calibration
@@ -0,0 +1,272 @@
+"""
+Fingertip Press Detection for the Virtual Keyboard
+"""
+
+import numpy as np
+from press_calibration import PressCalibration
+from config import *
+
+# Press states of a finger
+IDLE = 0
+APPROACHING = 1
+PRESSED = 2
+RELEASED = 3
+
+STATE_NAMES = ('idle', 'approaching', 'pressed', 'released')
+
+
+def measure_fingertips(landmarks, count, tip_ids):
+    """Extension and depth of every fingertip in hand scales, shape (hands, fingers).
+
+    Extension is the fingertip-to-wrist distance and depth the fingertip's
+    z, both divided by the hand scale (wrist to middle-finger MCP).
+    """
+    hands = landmarks.pixel[:count]
+    wrist = hands[:, WRIST_ID, None, :2]
+    scale = np.hypot(*(hands[:, MIDDLE_FINGER_MCP_ID, :2] - hands[:, WRIST_ID, :2]).T)
+    scale = np.maximum(scale, 1e-6)[:, None]
+
+    offsets = hands[:, tip_ids, :2] - wrist
+    extension = np.sqrt(np.einsum('hfi,hfi->hf', offsets, offsets)) / scale
+
+    # MediaPipe z is relative to the wrist in units of the image width
+    width = landmarks.frame_size[0] if landmarks.frame_size else CAMERA_WIDTH
+    depth = landmarks.normalized[:count, tip_ids, 2] * width / scale
+    return extension, depth
+
+
+class PressDetector:
+    """Detect fingertip taps with a per-finger state machine.
+
+    Every frame each fingertip's extension (fingertip-to-wrist distance
+    divided by the hand scale, the wrist to middle-finger MCP distance) and
+    depth are smoothed and pushed into a short ring buffer. Working in hand
+    scales makes the thresholds independent of how far the hand is from the
+    camera.
+
+    - idle: the finger curls faster than PRESS_START_VELOCITY (extension
+      falling, or the fingertip moving toward the camera) -> approaching
+    - approaching: the finger has travelled PRESS_TRAVEL hand scales from
+      its resting extension, or has curled below PRESS_EXTENSION ->
+      pressed. Reversing, or stalling for longer than the history, falls
+      back to idle
+    - pressed: the finger re-extends PRESS_RELEASE_TRAVEL hand scales from
+      its most curled point -> released
+    - released: lasts one frame, then idle
+
+    A press therefore fires while the finger is still moving down, on the
+    frame the tap happens, rather than once it has fully curled.
+
+    While a finger is idle and not moving, its resting extension and its
+    jitter (the second difference of the extension between frames, near
+    zero for smooth movement) are tracked at PRESS_BASELINE_RATE per
+    frame. Travel is measured from the resting level rather than the last
+    frame, so a noise spike before an approach does not count as travel,
+    and both travels are widened by PRESS_NOISE_MARGIN times the jitter,
+    which keeps noisy, small (far away) hands from firing presses.
+    """
+
+    def __init__(self, tip_ids=TYPING_FINGER_TIP_IDS, max_hands=MAX_NUM_HANDS,
+                 history=PRESS_HISTORY_SIZE):
+        self.tip_ids = list(tip_ids)
+        self.max_hands = max_hands
+        self.history = history
+        shape = (max_hands, len(self.tip_ids))
+
+        # Ring buffer of the most recent frames
+        self._extension = np.zeros((history,) + shape, dtype=np.float32)
+        self._depth = np.zeros((history,) + shape, dtype=np.float32)
+        self._times = np.zeros(history, dtype=np.float64)
+        self._head = -1
+        self._length = 0
+
+        self.states = np.full(shape, IDLE, dtype=np.int8)
+        self._start_extension = np.zeros(shape, dtype=np.float32)  # before the approach
+        self._min_extension = np.zeros(shape, dtype=np.float32)  # while pressed
+        self._rest_extension = np.zeros(shape, dtype=np.float32)  # tracked while idle
+        self._jitter = np.zeros(shape, dtype=np.float32)  # mean deviation from the rest level
+        self._approach_frames = np.zeros(shape, dtype=np.int32)
+        self._hand_count = 0
+
+    def reset(self):
+        """Forget the history and return every finger to idle"""
+        self._head = -1
+        self._length = 0
+        self.states[:] = IDLE
+        self._approach_frames[:] = 0
+        self._hand_count = 0
+
+    def update(self, landmarks):
+        """Push one frame of landmarks and advance every finger's state.
+
+        Returns a (hands, fingers) bool array that is True for fingers in
+        the pressed state.
+        """
+        count = min(landmarks.count, self.max_hands)
+        if count != self._hand_count:
+            # Hand slots are reassigned when hands appear or disappear
+            self.reset()
+            self._hand_count = count
+        if count == 0:
+            return np.zeros((0, len(self.tip_ids)), dtype=bool)
+        if self._length and landmarks.timestamp <= self._times[self._head]:
+            # The same tracked frame again (held while inference catches up)
+            return self.states[:count] == PRESSED
+
+        extension, depth = measure_fingertips(landmarks, count, self.tip_ids)
+        if not self._length:
+            self._rest_extension[:count] = extension
+            self._jitter[:count] = 0
+        else:
+            # Exponential smoothing against landmark jitter
+            previous_extension = self._extension[self._head, :count]
+            previous_depth = self._depth[self._head, :count]
+            extension = previous_extension + PRESS_SMOOTHING * (extension - previous_extension)
+            depth = previous_depth + PRESS_SMOOTHING * (depth - previous_depth)
+
+        self._head = (self._head + 1) % self.history
+        self._length = min(self._length + 1, self.history)
+        self._extension[self._head, :count] = extension
+        self._depth[self._head, :count] = depth
+        self._times[self._head] = landmarks.timestamp
+
+        if self._length < 2:
+            return np.zeros((count, len(self.tip_ids)), dtype=bool)
+
+        self._step(count, extension)
+        return self.states[:count] == PRESSED
+
+    def _velocity(self, buffer, count):
+        """Rate of change per second over the last PRESS_VELOCITY_FRAMES frames.
+
+        update() only buffers frames with increasing timestamps and steps
+        once there are two, so the elapsed time is always positive.
+        """
+        previous = (self._head - min(PRESS_VELOCITY_FRAMES, self._length - 1)) % self.history
+        elapsed = self._times[self._head] - self._times[previous]
+        return (buffer[self._head, :count] - buffer[previous, :count]) / elapsed
+
+    def _step(self, count, extension):
+        """Advance the state machine of every finger by one frame"""
+        states = self.states[:count]
+
+        # Curling speed in hand scales per second: extension falling plus
+        # the fingertip moving toward the camera (z decreasing)
+        speed = -self._velocity(self._extension, count) - PRESS_DEPTH_WEIGHT * self._velocity(self._depth, count)
+
+        # released lasts a single frame
+        states[states == RELEASED] = IDLE
+
+        rest = self._rest_extension[:count]
+        margin = PRESS_NOISE_MARGIN * self._jitter[:count]
+
+        # idle -> approaching: remember the resting extension before the move
+        starting = (states == IDLE) & (speed > PRESS_START_VELOCITY)
+        if starting.any():
+            self._start_extension[:count][starting] = rest[starting]
+            self._approach_frames[:count][starting] = 0
+            states[starting] = APPROACHING
+
+        # approaching -> pressed, or back to idle
+        approaching = states == APPROACHING
+        if approaching.any():
+            self._approach_frames[:count][approaching] += 1
+            travel = self._start_extension[:count] - extension
+            pressing = approaching & ((travel >= PRESS_TRAVEL + margin) | (extension <= PRESS_EXTENSION))
+            abandoned = approaching & ~pressing & (
+                (speed < 0) | (self._approach_frames[:count] > self.history))
+            states[abandoned] = IDLE
+            states[pressing] = PRESSED
+            self._min_extension[:count][pressing] = extension[pressing]
+
+        # pressed -> released once the finger opens again
+        pressed = states == PRESSED
+        if pressed.any():
+            minimum = np.minimum(self._min_extension[:count], extension)
+            self._min_extension[:count][pressed] = minimum[pressed]
+            releasing = pressed & (extension - self._min_extension[:count] >= PRESS_RELEASE_TRAVEL + margin)
+            states[releasing] = RELEASED
+
+        # Follow the resting level and the jitter (second difference, which
+        # smooth movement barely has) while the finger is idle and still
+        still = (states == IDLE) & (np.abs(speed) < PRESS_START_VELOCITY)
+        rest[still] += PRESS_BASELINE_RATE * (extension - rest)[still]
+        if self._length >= 3 and still.any():
+            buffer = self._extension
+            second = np.abs(extension - 2 * buffer[(self._head - 1) % self.history, :count]
+                            + buffer[(self._head - 2) % self.history, :count])
+            jitter = self._jitter[:count]
+            jitter[still] += PRESS_BASELINE_RATE * (second[still] - jitter[still])
+
+    def get_state_names(self, hand_index):
+        """Get the state name of every finger of one hand"""
+        return [STATE_NAMES[state] for state in self.states[hand_index]]
+
+
+class ThresholdPressDetector:
+    """Detect presses with a calibrated extension threshold and hysteresis.
+
+    A finger presses when its smoothed extension (in hand scales, so the
+    distance to the camera does not matter) falls below its threshold
+    minus half the hysteresis band and releases above the threshold plus
+    half the band. Threshold and band come from a PressCalibration, which
+    learns from every frame when adapt is True.
+    """
+
+    def __init__(self, calibration, adapt=True, max_hands=MAX_NUM_HANDS):
+        self.calibration = calibration
+        self.tip_ids = calibration.tip_ids
+        self.adapt = adapt
+        self.max_hands = max_hands
+        shape = (max_hands, len(self.tip_ids))
+        self._extension = np.zeros(shape, dtype=np.float64)
+        self._pressed = np.zeros(shape, dtype=bool)
+        self._timestamp = None
+        self._hand_count = 0
+
+    def reset(self):
+        """Release every finger and forget the smoothing history"""
+        self._pressed[:] = False
+        self._timestamp = None
+        self._hand_count = 0
+        self.calibration.reset_hands()
+
+    def update(self, landmarks):
+        """Push one frame of landmarks; returns the (hands, fingers) press state"""
+        count = min(landmarks.count, self.max_hands)
+        if count != self._hand_count:
+            self.reset()
+            self._hand_count = count
+        if count == 0:
+            return np.zeros((0, len(self.tip_ids)), dtype=bool)
+        if self._timestamp is not None and landmarks.timestamp <= self._timestamp:
+            # The same tracked frame again (held while inference catches up)
+            return self._pressed[:count].copy()
+
+        extension, _ = measure_fingertips(landmarks, count, self.tip_ids)
+        if self._timestamp is not None:
+            extension = self._extension[:count] + PRESS_SMOOTHING * (extension - self._extension[:count])
+        self._extension[:count] = extension
+        self._timestamp = landmarks.timestamp
+
+        calibration = self.calibration
+        band = calibration.hysteresis / 2
+        pressed = self._pressed[:count]
+        pressed[:] = np.where(pressed, extension < calibration.threshold + band,
+                              extension < calibration.threshold - band)
+        if self.adapt:
+            calibration.observe(extension)
+        return pressed.copy()
+
+
+def create_press_detector(name=PRESS_DETECTOR, profile_path=CALIBRATION_PROFILE_PATH):
+    """Create the named press detector (None for the pixel distance check).
+
+    The calibrated detector starts from the profile at profile_path, if
+    there is one.
+    """
+    if name == 'state_machine':
+        return PressDetector()
+    if name == 'calibrated':
+        return ThresholdPressDetector(PressCalibration.load(profile_path), CALIBRATION_ADAPT)
+    return None
@@ -0,0 +1,164 @@
+"""
+Per-Stage Latency Profiling for the Virtual Keyboard
+"""
+
+import bisect
+import csv
+import json
+import math
+import time
+import cv2
+from config import *
+
+
+class LatencyHistogram:
+    """Fixed-size histogram of durations with log-spaced bins.
+
+    Memory and per-sample cost are constant no matter how long the app
+    runs. Percentiles are accurate to one bin, about 5% with the defaults.
+    """
+
+    def __init__(self, min_value=1e-6, max_value=10.0, bins=PROFILE_HISTOGRAM_BINS):
+        ratio = (max_value / min_value) ** (1.0 / bins)
+        self.edges = [min_value * ratio ** i for i in range(bins + 1)]
+        # One extra bin on each side for underflow and overflow
+        self.counts = [0] * (bins + 2)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value):
+        """Record a duration in seconds"""
+        self.counts[bisect.bisect_right(self.edges, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, q):
+        """Estimate the q-th percentile (0-100) in seconds"""
+        if self.count == 0:
+            return 0.0
+
+        target = q / 100.0 * self.count
+        cumulative = 0
+        for index, count in enumerate(self.counts):
+            cumulative += count
+            if cumulative >= target and count:
+                if index == 0:
+                    return self.edges[0]
+                if index > len(self.edges) - 1:
+                    return self.max
+                # Geometric middle of the bin
+                return min(math.sqrt(self.edges[index - 1] * self.edges[index]), self.max)
+        return self.max
+
+    def summary(self):
+        """Get count, mean, p50, p95, p99 and max in milliseconds"""
+        return {
+            'count': self.count,
+            'mean_ms': self.total / self.count * 1000 if self.count else 0.0,
+            'p50_ms': self.percentile(50) * 1000,
+            'p95_ms': self.percentile(95) * 1000,
+            'p99_ms': self.percentile(99) * 1000,
+            'max_ms': self.max * 1000
+        }
+
+    def reset(self):
+        """Clear all samples"""
+        self.counts = [0] * len(self.counts)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+
+class StageProfiler:
+    """Collect per-stage timings into latency histograms.
+
+    Typical use chains stops, since stop() returns the current time:
+
+        start = profiler.start()
+        read_frame()
+        start = profiler.stop('capture', start)
+        track_hands()
+        profiler.stop('tracking', start)
+
+    Stages are recorded from several threads without locking. A sample can
+    occasionally be lost under contention; that is the price of keeping the
+    hooks cheap.
+    """
+
+    def __init__(self, enabled=PROFILING_ENABLED):
+        self.enabled = enabled
+        self.histograms = {}
+
+    def start(self):
+        """Get a start time for stop()"""
+        return time.perf_counter()
+
+    def stop(self, stage, start):
+        """Record the time elapsed since start for a stage and return the current time"""
+        now = time.perf_counter()
+        if self.enabled:
+            self.record(stage, now - start)
+        return now
+
+    def record(self, stage, duration):
+        """Record a duration in seconds for a stage"""
+        if not self.enabled:
+            return
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            histogram = self.histograms[stage] = LatencyHistogram()
+        histogram.add(duration)
+
+    def summary(self):
+        """Get the summary of every stage, in first-recorded order"""
+        return {stage: histogram.summary() for stage, histogram in list(self.histograms.items())}
+
+    def reset(self):
+        """Clear all stage histograms"""
+        self.histograms = {}
+
+    def format_lines(self):
+        """Format one overlay line per stage"""
+        return [f"{stage}: p50 {s['p50_ms']:.1f} p95 {s['p95_ms']:.1f} p99 {s['p99_ms']:.1f} ms"
+                for stage, s in self.summary().items()]
+
+    def draw(self, frame, lines, origin=(10, 200)):
+        """Draw preformatted stage lines onto a frame.
+        
+        Returns the (x, y, width, height) rectangle the lines cover.
+        """
+        x, y = origin
+        width = 0
+        for i, line in enumerate(lines):
+            cv2.putText(frame, line, (x, y + i * 18),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.45, COLORS['text_normal'], 1)
+            width = max(width, cv2.getTextSize(line, cv2.FONT_HERSHEY_SIMPLEX, 0.45, 1)[0][0])
+        
+        # Text reaches about 14 pixels above and 5 below its baseline
+        top = max(y - 14, 0)
+        bottom = min(y + (len(lines) - 1) * 18 + 6, frame.shape[0])
+        right = min(x + width + 2, frame.shape[1])
+        return (x, top, max(right - x, 0), max(bottom - top, 0))
+
+    def export_json(self, path):
+        """Write the stage summaries to a JSON file"""
+        with open(path, 'w') as f:
+            json.dump(self.summary(), f, indent=2)
+
+    def export_csv(self, path):
+        """Write the stage summaries to a CSV file"""
+        fields = ['stage', 'count', 'mean_ms', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms']
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            for stage, s in self.summary().items():
+                writer.writerow({'stage': stage, **s})
+
+    def export(self, path_prefix):
+        """Write <prefix>.json and <prefix>.csv"""
+        self.export_json(f"{path_prefix}.json")
+        self.export_csv(f"{path_prefix}.csv")
+        print(f"Profile written to {path_prefix}.json and {path_prefix}.csv")
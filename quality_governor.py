@@ -0,0 +1,74 @@
+"""
+Adaptive Quality Governor for the Virtual Keyboard
+"""
+
+from config import *
+
+
+class QualityGovernor:
+    """Step through a ladder of quality settings to hold FPS_TARGET.
+
+    The governor keeps an exponential moving average of the per-frame
+    processing cost and compares it with the frame budget (1 / FPS_TARGET).
+    It steps down one level after QUALITY_DOWNGRADE_FRAMES consecutive
+    frames over budget. It steps back up after QUALITY_UPGRADE_FRAMES
+    consecutive frames with headroom. Level 0 is the highest quality.
+    """
+
+    def __init__(self, levels=QUALITY_LADDER, target_fps=FPS_TARGET):
+        self.levels = levels
+        self.level = 0
+        self.frame_budget = 1.0 / target_fps
+        self.average_cost = None
+
+        self._over_budget_frames = 0
+        self._headroom_frames = 0
+
+    @property
+    def settings(self):
+        """Settings of the current quality level"""
+        return self.levels[self.level]
+
+    def update(self, frame_cost):
+        """Record one frame's processing time in seconds.
+
+        Returns the new level's settings when the level changes, else None.
+        """
+        if self.average_cost is None:
+            self.average_cost = frame_cost
+        else:
+            self.average_cost += QUALITY_SMOOTHING * (frame_cost - self.average_cost)
+
+        if self.average_cost > self.frame_budget * QUALITY_DOWNGRADE_RATIO:
+            self._over_budget_frames += 1
+            self._headroom_frames = 0
+        elif self.average_cost < self.frame_budget * QUALITY_UPGRADE_RATIO:
+            self._headroom_frames += 1
+            self._over_budget_frames = 0
+        else:
+            self._over_budget_frames = 0
+            self._headroom_frames = 0
+
+        if (self._over_budget_frames >= QUALITY_DOWNGRADE_FRAMES and
+                self.level < len(self.levels) - 1):
+            return self._set_level(self.level + 1)
+
+        if self._headroom_frames >= QUALITY_UPGRADE_FRAMES and self.level > 0:
+            return self._set_level(self.level - 1)
+
+        return None
+
+    def _set_level(self, level):
+        """Switch to a quality level and log the transition"""
+        previous = self.levels[self.level]['name']
+        self.level = level
+        self._over_budget_frames = 0
+        self._headroom_frames = 0
+
+        print(f"Quality: {previous} -> {self.settings['name']} "
+              f"(frame cost {self.average_cost * 1000:.1f}ms, "
+              f"budget {self.frame_budget * 1000:.1f}ms)")
+
+        # Costs measured at the old level no longer apply
+        self.average_cost = None
+        return self.settings
@@ -0,0 +1,433 @@
+"""
+Multi-Session Host: Many Virtual Keyboards Sharing One Inference Pool
+
+Hosts independent keyboard sessions (one per kiosk camera) in one
+process. Each session has its own frame source, keyboard and typing
+state (a headless VirtualKeyboardApp) and output sink; hand tracking for
+all of them runs on one bounded InferencePool.
+
+Scheduling: whenever a frame slot is free, the frame with the earliest
+deadline (capture time + the session's latency budget) among sessions
+with fewer than SESSION_MAX_IN_FLIGHT frames in flight is submitted, so
+no session can take over the pool and equal budgets get equal shares.
+A frame that has already waited longer than its budget is dropped
+instead of tracked (counted as late). Results are applied to each
+session in frame order.
+
+Video files can stand in for cameras; --synthetic renders tap sessions
+to video files to host (use --backend contour for those, MediaPipe does
+not take the rendered hands for hands).
+
+Usage: python session_host.py [video ...] [--camera 0 ...] [--synthetic 3] [--workers 2]
+                              [--backend contour] [--budget 0.1] [--fast] [--loop] [--duration 30]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+import cv2
+import numpy as np
+from input_simulator import InputSimulator
+from parallel_inference import InferencePool, ReorderBuffer
+from pipeline import BLOCK, DROP_OLDEST, FrameQueue, PipelineClosed, PipelineStage
+from session_replay import ReplayClock, ReplayHandTracker
+from synthetic_input import synthetic_source
+from config import *
+
+
+class VideoSource:
+    """Frames from a camera (int index) or a video file.
+
+    Files are paced at their frame rate when realtime is True, like a
+    camera; otherwise frames are read as fast as they are taken and
+    timestamped with the file's own timeline.
+    """
+
+    def __init__(self, source, realtime=True, loop=False):
+        self.name = f"camera {source}" if isinstance(source, int) else os.path.basename(source)
+        self.camera = isinstance(source, int)
+        self.capture = cv2.VideoCapture(source)
+        if not self.capture.isOpened():
+            raise ValueError(f"Cannot open video source: {source}")
+        if self.camera:
+            self.capture.set(cv2.CAP_PROP_FRAME_WIDTH, CAMERA_WIDTH)
+            self.capture.set(cv2.CAP_PROP_FRAME_HEIGHT, CAMERA_HEIGHT)
+
+        self.fps = self.capture.get(cv2.CAP_PROP_FPS) or FPS_TARGET
+        self.frame_size = (int(self.capture.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                           int(self.capture.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+        self.realtime = realtime or self.camera
+        self.loop = loop and not self.camera
+        self.index = 0
+        self._start = None
+
+    def read(self):
+        """Get the next (frame, timestamp), or None at the end of the file"""
+        success, frame = self.capture.read()
+        if not success and self.loop and self.index:
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            success, frame = self.capture.read()
+        if not success:
+            return None
+
+        if self._start is None:
+            self._start = (time.perf_counter(), time.time())
+        if self.camera:
+            timestamp = time.time()
+        else:
+            offset = self.index / self.fps
+            if self.realtime:
+                delay = self._start[0] + offset - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            timestamp = self._start[1] + offset
+        self.index += 1
+        return frame, timestamp
+
+    def close(self):
+        """Release the capture"""
+        self.capture.release()
+
+
+class SessionOutput(InputSimulator):
+    """Output sink of one session: records its key events instead of injecting them.
+
+    on_event(session_id, kind, value, timestamp, capture_time) is called
+    for every event, on the thread running the session's typing logic.
+    With record False events are only passed on, not kept.
+    """
+
+    def __init__(self, session_id, clock, on_event=None, record=True):
+        super().__init__(async_injection=False)
+        self.session_id = session_id
+        self.clock = clock
+        self.on_event = on_event
+        self.record = record
+        self.emitted = []
+
+    def _dispatch(self, events):
+        """Record events and pass them to the callback"""
+        for kind, value, timestamp, capture_time in events:
+            if self.record:
+                self.emitted.append((timestamp, kind, value))
+            if self.on_event is not None:
+                self.on_event(self.session_id, kind, value, timestamp, capture_time)
+
+    def get_typed_text(self):
+        """Get the typed presses and text as a string"""
+        parts = []
+        for _, kind, value in self.emitted:
+            if kind == 'text':
+                parts.append(value)
+            elif kind == 'press':
+                parts.append(' ' if value == 'space' else value if len(value) == 1 else f"<{value}>")
+        return ''.join(parts)
+
+
+class Session:
+    """One keyboard: a frame source, a headless app and its scheduling state"""
+
+    def __init__(self, session_id, source, latency_budget=SESSION_LATENCY_BUDGET, on_event=None):
+        from virtual_keyboard import VirtualKeyboardApp
+
+        self.session_id = session_id
+        self.source = source
+        self.latency_budget = latency_budget
+
+        self.clock = ReplayClock()
+        self.tracker = ReplayHandTracker(source.frame_size)
+        self.output = SessionOutput(session_id, self.clock, on_event)
+        self.app = VirtualKeyboardApp(hand_tracker=self.tracker, input_simulator=self.output)
+        self.app.quality_governor = None
+
+        # Live sources drop old frames; files read ahead of real time wait instead
+        self.frames = FrameQueue(SESSION_QUEUE_SIZE, DROP_OLDEST if source.realtime else BLOCK)
+        self.pending = None
+        self.source_done = False
+        self.reorder = ReorderBuffer()
+        self._in_flight = {}  # seq -> (timestamp, capture perf_counter)
+
+        self.tracked = 0
+        self.late = 0
+        self.over_budget = 0
+        self.latencies = deque(maxlen=SESSION_STATS_SIZE)
+        self._applied_times = deque(maxlen=SESSION_STATS_SIZE)
+
+        self._capture = PipelineStage(f'capture-{session_id}', self._read_frame, output_queue=self.frames)
+
+    def start(self):
+        """Start reading frames"""
+        self._capture.start()
+
+    def _read_frame(self):
+        """Capture thread: read the next frame of the source"""
+        frame = self.source.read()
+        if frame is None:
+            raise StopIteration
+        return {'frame': frame[0], 'timestamp': frame[1], 'captured': time.perf_counter()}
+
+    def next_frame(self, now):
+        """The oldest frame waiting to be tracked (dropping those past the budget), or None"""
+        while self.pending is None and not self.source_done:
+            try:
+                self.pending = self.frames.get(timeout=0)
+            except PipelineClosed:
+                self.source_done = True
+                break
+            if self.pending is None:
+                break
+            if now - self.pending['captured'] > self.latency_budget:
+                self.late += 1
+                self.pending = None
+        return self.pending
+
+    def submitted(self, seq, now):
+        """Note that the pending frame was submitted as seq"""
+        packet, self.pending = self.pending, None
+        self._in_flight[seq] = (packet['timestamp'], packet['captured'])
+        self.reorder.submitted(seq, now)
+
+    def receive(self, result):
+        """Take a tracking result from the pool"""
+        if not self.reorder.add(result['seq'], result):
+            self._in_flight.pop(result['seq'], None)
+
+    def apply_ready(self, now):
+        """Run the typing logic on the results that are ready, in frame order"""
+        for result in self.reorder.pop(now):
+            seq = result['seq']
+            # Frames skipped by the reorder buffer never get a result
+            for skipped in [s for s in self._in_flight if s < seq]:
+                del self._in_flight[skipped]
+            timestamp, captured = self._in_flight.pop(seq)
+
+            self.clock.now = timestamp
+            landmarks = self.tracker.load(timestamp, result['count'], result['landmarks'])
+            self.app.process_typing_logic(landmarks)
+
+            latency = now - captured
+            self.latencies.append(latency)
+            self.over_budget += latency > self.latency_budget
+            self._applied_times.append(now)
+            self.tracked += 1
+
+    def is_finished(self):
+        """Check if the source has ended and every frame has been handled"""
+        return (self.source_done and self.pending is None and not self._in_flight
+                and not len(self.frames))
+
+    def get_stats(self, now, in_flight):
+        """Throughput, queueing and latency statistics"""
+        # A finished session keeps the rate of its last window instead of decaying to zero
+        end = self._applied_times[-1] if self._applied_times and self.is_finished() else now
+        recent = [t for t in self._applied_times if end - t <= SESSION_STATS_WINDOW]
+        window = min(SESSION_STATS_WINDOW, end - recent[0]) if len(recent) > 1 else 0
+        latencies = np.array(self.latencies) * 1000
+        return {
+            'source': self.source.name,
+            'fps': (len(recent) - 1) / window if window > 0 else 0.0,
+            'queue_depth': len(self.frames) + (self.pending is not None),
+            'in_flight': in_flight,
+            'tracked': self.tracked,
+            'dropped': self.frames.dropped,
+            'late': self.late,
+            'skipped': self.reorder.skipped,
+            'stale': self.reorder.stale,
+            'over_budget': self.over_budget,
+            'latency_p50_ms': float(np.percentile(latencies, 50)) if len(latencies) else None,
+            'latency_p95_ms': float(np.percentile(latencies, 95)) if len(latencies) else None,
+            'typed': self.output.get_typed_text()
+        }
+
+    def close(self):
+        """Stop reading and release the source"""
+        self.frames.close()
+        self._capture.stop_event.set()
+        self._capture.join(1.0)
+        self.source.close()
+        self.output.cleanup()
+
+
+class SessionHost:
+    """Sessions sharing one InferencePool, scheduled by earliest deadline"""
+
+    def __init__(self, workers=SESSION_HOST_WORKERS, backend=HAND_TRACKING_BACKEND, slots=INFERENCE_RING_SLOTS,
+                 max_in_flight=SESSION_MAX_IN_FLIGHT):
+        self.pool = InferencePool(workers, backend, slots)
+        self.max_in_flight = max(1, max_in_flight)
+        self.sessions = {}
+        self.running = False
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def add_session(self, source, latency_budget=SESSION_LATENCY_BUDGET, on_event=None):
+        """Start a session reading from source and return it"""
+        with self._lock:
+            session = Session(self._next_id, source, latency_budget, on_event)
+            self._next_id += 1
+            self.sessions[session.session_id] = session
+        session.start()
+        return session
+
+    def remove_session(self, session_id):
+        """Stop a session (results still in flight are ignored)"""
+        with self._lock:
+            session = self.sessions.pop(session_id, None)
+        if session is not None:
+            session.close()
+        return session
+
+    def step(self, timeout=0.005):
+        """Route arrived results, run the typing logic and submit frames"""
+        with self._lock:
+            sessions = dict(self.sessions)
+
+        for result in self.pool.collect(timeout):
+            session = sessions.get(result['stream_id'])
+            if session is not None:
+                session.receive(result)
+
+        now = time.perf_counter()
+        for session in sessions.values():
+            session.apply_ready(now)
+        if self.pool.is_ready():
+            self._schedule(sessions, now)
+
+    def _schedule(self, sessions, now):
+        """Fill free frame slots, earliest deadline first"""
+        while self.pool.free_slots():
+            best = None
+            for session in sessions.values():
+                if self.pool.in_flight(session.session_id) >= self.max_in_flight:
+                    continue
+                packet = session.next_frame(now)
+                if packet is None:
+                    continue
+                key = (packet['captured'] + session.latency_budget, session.tracked)
+                if best is None or key < best[0]:
+                    best = (key, session)
+            if best is None:
+                return
+
+            session = best[1]
+            seq = self.pool.submit(session.pending['frame'], stream_id=session.session_id)
+            if seq is None:
+                return
+            session.submitted(seq, now)
+
+    def run(self, duration=None, report_interval=None):
+        """Run until every source has ended, duration has passed or stop() is called"""
+        self.running = True
+        start = last_report = time.perf_counter()
+        while self.running:
+            self.step()
+            if self.pool.workers_failed >= self.pool.workers:
+                break
+            now = time.perf_counter()
+            if duration is not None and now - start >= duration:
+                break
+            if report_interval and now - last_report >= report_interval:
+                self.print_stats()
+                last_report = now
+            with self._lock:
+                if self.sessions and all(s.is_finished() for s in self.sessions.values()):
+                    break
+        self.running = False
+
+    def stop(self):
+        """Make run() return"""
+        self.running = False
+
+    def get_stats(self):
+        """Statistics of every session, by session id"""
+        now = time.perf_counter()
+        with self._lock:
+            sessions = dict(self.sessions)
+        return {session_id: session.get_stats(now, self.pool.in_flight(session_id))
+                for session_id, session in sessions.items()}
+
+    def print_stats(self):
+        """Print one line per session"""
+        print(f"{'id':>3s} {'source':20s} {'fps':>6s} {'queue':>6s} {'flight':>6s} {'p50 ms':>7s} "
+              f"{'p95 ms':>7s} {'late':>5s} {'drop':>5s} {'typed'}")
+        for session_id, s in self.get_stats().items():
+            p50 = f"{s['latency_p50_ms']:7.1f}" if s['latency_p50_ms'] is not None else f"{'-':>7s}"
+            p95 = f"{s['latency_p95_ms']:7.1f}" if s['latency_p95_ms'] is not None else f"{'-':>7s}"
+            print(f"{session_id:3d} {s['source'][:20]:20s} {s['fps']:6.1f} {s['queue_depth']:6d} "
+                  f"{s['in_flight']:6d} {p50} {p95} {s['late']:5d} {s['dropped']:5d} {s['typed']!r}")
+
+    def close(self):
+        """Stop every session and the inference workers"""
+        for session_id in list(self.sessions):
+            self.remove_session(session_id)
+        self.pool.close()
+
+
+def write_synthetic_video(path, text, fps=FPS_TARGET):
+    """Render a synthetic tap session typing text to a video file"""
+    frames_iter, session = synthetic_source(text)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), fps, session['frame_size'])
+    try:
+        for frame in frames_iter():
+            writer.write(frame)
+    finally:
+        writer.release()
+    return path
+
+
+SYNTHETIC_TEXTS = ['the quick brown fox', 'hello world', 'jumps over', 'lazy dog', 'pack my box', 'five dozen']
+
+
+def main():
+    """Host sessions from the command line"""
+    parser = argparse.ArgumentParser(description="Host many keyboard sessions on one inference pool")
+    parser.add_argument('videos', nargs='*', help="video files to use as session sources")
+    parser.add_argument('--camera', type=int, action='append', default=[], help="camera index (repeatable)")
+    parser.add_argument('--synthetic', type=int, default=0, help="render this many synthetic sessions to video files")
+    parser.add_argument('--workers', type=int, default=SESSION_HOST_WORKERS, help="inference worker processes")
+    parser.add_argument('--backend', default=HAND_TRACKING_BACKEND, help="hand tracking backend")
+    parser.add_argument('--budget', type=float, default=SESSION_LATENCY_BUDGET, help="latency budget per session (s)")
+    parser.add_argument('--fast', action='store_true', help="read files as fast as they are tracked, dropping nothing")
+    parser.add_argument('--loop', action='store_true', help="loop video files")
+    parser.add_argument('--duration', type=float, help="stop after this many seconds")
+    parser.add_argument('--report', type=float, default=2.0, help="seconds between statistics reports")
+    args = parser.parse_args()
+
+    sources = list(args.videos)
+    temp_dir = None
+    if args.synthetic:
+        temp_dir = tempfile.TemporaryDirectory()
+        for index in range(args.synthetic):
+            text = SYNTHETIC_TEXTS[index % len(SYNTHETIC_TEXTS)]
+            sources.append(write_synthetic_video(os.path.join(temp_dir.name, f"synthetic{index}.avi"), text))
+    if not sources and not args.camera:
+        print("No sources (give video files, --camera or --synthetic)")
+        return False
+
+    host = SessionHost(args.workers, args.backend)
+    try:
+        for source in sources:
+            host.add_session(VideoSource(source, realtime=not args.fast, loop=args.loop), args.budget)
+        for index in args.camera:
+            host.add_session(VideoSource(index), args.budget)
+        host.run(args.duration, args.report)
+        host.print_stats()
+        if host.pool.load_error and not host.pool.is_ready():
+            print(f"Hand tracking unavailable: {host.pool.load_error}")
+            return False
+    except KeyboardInterrupt:
+        print("Interrupted by user")
+    finally:
+        host.close()
+        if temp_dir is not None:
+            temp_dir.cleanup()
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
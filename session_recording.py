@@ -0,0 +1,94 @@
+"""
+Landmark Session Recording for the Virtual Keyboard
+"""
+
+import struct
+import numpy as np
+from config import *
+
+# File layout: a header followed by one record per frame. Each frame record
+# is a float64 capture timestamp and a uint8 hand count, followed by the
+# normalized (x, y, z) float32 landmarks of each hand. All values are
+# little-endian.
+SESSION_MAGIC = b'VKLS'
+SESSION_VERSION = 1
+HEADER_FORMAT = '<4sHHHHH'  # magic, version, max hands, landmarks per hand, frame width, frame height
+FRAME_FORMAT = '<dB'  # timestamp, hand count
+
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+FRAME_SIZE = struct.calcsize(FRAME_FORMAT)
+
+
+class SessionRecorder:
+    """Write per-frame hand landmarks and timestamps to a compact binary file"""
+    
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'wb')
+        self.frames = 0
+        self._header_written = False
+    
+    def record(self, landmarks):
+        """Append one frame's LandmarkBuffer to the session"""
+        if not self._header_written:
+            max_hands, num_landmarks = landmarks.normalized.shape[:2]
+            width, height = landmarks.frame_size
+            self.file.write(struct.pack(HEADER_FORMAT, SESSION_MAGIC, SESSION_VERSION, 
+                                        max_hands, num_landmarks, width, height))
+            self._header_written = True
+        
+        self.file.write(struct.pack(FRAME_FORMAT, landmarks.timestamp, landmarks.count))
+        self.file.write(landmarks.normalized[:landmarks.count].tobytes())
+        self.frames += 1
+    
+    def close(self):
+        """Flush and close the session file"""
+        if not self.file.closed:
+            self.file.close()
+            print(f"Recorded {self.frames} frames to {self.path}")
+
+
+def load_session(path):
+    """Load a recorded session.
+    
+    Returns a dict with 'frame_size' (width, height), 'timestamps' (N,),
+    'counts' (N,) and 'landmarks' (N, max_hands, landmarks, 3) normalized
+    coordinates, zero-filled past each frame's hand count.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    
+    if len(data) < HEADER_SIZE:
+        raise ValueError(f"{path} is not a landmark session")
+    
+    magic, version, max_hands, num_landmarks, width, height = struct.unpack_from(HEADER_FORMAT, data)
+    if magic != SESSION_MAGIC or version != SESSION_VERSION:
+        raise ValueError(f"{path} is not a version {SESSION_VERSION} landmark session")
+    
+    hand_size = num_landmarks * 3 * 4
+    timestamps = []
+    counts = []
+    hands = []
+    
+    offset = HEADER_SIZE
+    while offset + FRAME_SIZE <= len(data):
+        timestamp, count = struct.unpack_from(FRAME_FORMAT, data, offset)
+        offset += FRAME_SIZE
+        if offset + count * hand_size > len(data):
+            break  # Truncated final frame (e.g. the app was killed)
+        
+        timestamps.append(timestamp)
+        counts.append(count)
+        hands.append(np.frombuffer(data, dtype='<f4', count=count * num_landmarks * 3, offset=offset))
+        offset += count * hand_size
+    
+    landmarks = np.zeros((len(timestamps), max_hands, num_landmarks, 3), dtype=np.float32)
+    for index, (count, values) in enumerate(zip(counts, hands)):
+        landmarks[index, :count] = values.reshape(count, num_landmarks, 3)
+    
+    return {
+        'frame_size': (width, height),
+        'timestamps': np.array(timestamps, dtype=np.float64),
+        'counts': np.array(counts, dtype=np.int32),
+        'landmarks': landmarks
+    }
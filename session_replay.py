@@ -0,0 +1,149 @@
+"""
+Headless Replay of Recorded Landmark Sessions
+
+Feeds a session recorded with RECORD_SESSION_PATH back through
+VirtualKeyboardApp.process_typing_logic with a fake tracker and a fake
+injector, as fast as possible, and reports the emitted key sequence and
+per-frame processing time.
+
+Usage: python session_replay.py session.vkl
+"""
+
+import argparse
+import sys
+import threading
+import time
+import numpy as np
+from hand_backends import HandBackend
+from hand_tracker import HandTracker, LandmarkBuffer
+from input_simulator import InputSimulator
+from session_recording import load_session
+from config import *
+
+
+class ReplayClock:
+    """Clock driven by recorded timestamps instead of wall time"""
+
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class ReplayHandTracker(HandTracker):
+    """HandTracker that serves recorded landmarks instead of running MediaPipe"""
+
+    def __init__(self, frame_size=(CAMERA_WIDTH, CAMERA_HEIGHT)):
+        # The base backend does nothing, so no model is ever loaded
+        super().__init__(background_load=False, backend=HandBackend())
+        self.frame_size = frame_size
+        self.landmarks = LandmarkBuffer()
+        self.show_debug = False
+
+    def _start_loading(self, background_load):
+        # Recorded landmarks are ready right away
+        self.ready = threading.Event()
+        self.ready.set()
+        self.load_error = None
+        self.load_times = {}
+
+    def load(self, timestamp, count, normalized):
+        """Load one recorded frame into the landmark buffer"""
+        self.landmarks.count = count
+        self.landmarks.timestamp = timestamp
+        self.landmarks.normalized[:count] = normalized[:count]
+        self.landmarks.update_pixels(self.frame_size)
+        return self.landmarks
+
+    def process_frame(self, frame, timestamp=None):
+        """Return the currently loaded landmarks"""
+        return self.landmarks
+
+    def release(self):
+        """Nothing to release"""
+
+
+class ReplayInputSimulator(InputSimulator):
+    """InputSimulator that records events instead of injecting them"""
+
+    def __init__(self, clock):
+        super().__init__(async_injection=False)
+        self.clock = clock
+        self.emitted = []
+
+    def _dispatch(self, events):
+        """Record events with the replay time they were emitted at"""
+        for kind, value, timestamp, capture_time in events:
+            self.emitted.append((timestamp, kind, value))
+
+    def get_typed_sequence(self):
+        """Get the emitted presses and text as a list of key names"""
+        return [value for _, kind, value in self.emitted if kind in ('press', 'text')]
+
+
+def replay_session(session, app=None):
+    """Replay a session (path or load_session result) through the typing logic.
+
+    Returns a dict with the emitted 'events' as (timestamp, kind, value),
+    the typed 'keys' and the per-frame processing 'frame_times' in seconds.
+    """
+    from virtual_keyboard import VirtualKeyboardApp
+
+    if isinstance(session, str):
+        session = load_session(session)
+
+    clock = ReplayClock()
+    if app is None:
+        tracker = ReplayHandTracker(session['frame_size'])
+        injector = ReplayInputSimulator(clock)
+        app = VirtualKeyboardApp(hand_tracker=tracker, input_simulator=injector)
+        app.quality_governor = None
+    else:
+        app.input_simulator.clock = clock
+
+    tracker = app.hand_tracker
+    frame_times = np.zeros(len(session['timestamps']), dtype=np.float64)
+
+    for index, timestamp in enumerate(session['timestamps']):
+        clock.now = timestamp
+        start = time.perf_counter()
+
+        landmarks = tracker.load(timestamp, session['counts'][index], session['landmarks'][index])
+        app.process_typing_logic(landmarks)
+
+        frame_times[index] = time.perf_counter() - start
+
+    return {
+        'events': list(app.input_simulator.emitted),
+        'keys': app.input_simulator.get_typed_sequence(),
+        'frame_times': frame_times
+    }
+
+
+def print_replay_report(result):
+    """Print the key sequence and frame timing of a replay"""
+    frame_times = result['frame_times'] * 1000
+    print(f"Frames: {len(frame_times)}")
+    print(f"Keys ({len(result['keys'])}): {' '.join(result['keys'])}")
+    if len(frame_times):
+        print(f"Frame time: mean {frame_times.mean():.3f}ms, "
+              f"p50 {np.percentile(frame_times, 50):.3f}ms, "
+              f"p95 {np.percentile(frame_times, 95):.3f}ms, "
+              f"max {frame_times.max():.3f}ms")
+
+
+def main():
+    """Replay the session given on the command line"""
+    parser = argparse.ArgumentParser(description="Replay a recorded landmark session")
+    parser.add_argument('session', help="session file written with RECORD_SESSION_PATH")
+    args = parser.parse_args()
+
+    result = replay_session(args.session)
+    print_replay_report(result)
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
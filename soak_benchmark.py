@@ -0,0 +1,243 @@
+"""
+Long-Run Soak Benchmark
+
+Drives the whole per-frame path of the app (hand tracker, typing logic,
+keyboard drawing and compositing into the display frame, and keystroke
+injection through a NullInputSimulator on its worker thread) for
+hundreds of thousands of frames, cycling a synthetic tap session or
+recorded sessions with the timeline moving forward on every cycle.
+
+Every --interval frames it samples the tracemalloc traced memory, the
+process RSS and the frame-time percentiles of the interval. After the
+warm-up frames the first sample is the baseline; the run fails (exit
+status 1) if traced memory or RSS grow, or the median frame time
+drifts, by more than the configured limits (SOAK_* in config.py). The
+allocation sites that grew the most are listed at the end.
+
+With --tracker set to a backend name the frames are rendered from the
+synthetic session and tracked for real; by default recorded or synthetic
+landmarks are replayed.
+
+Usage: python soak_benchmark.py [--frames 200000] [--interval 10000] [--warmup 5000]
+                                [--tracker replay|contour] [--session session.vkl ...]
+"""
+
+import argparse
+import contextlib
+import os
+import sys
+import time
+import tracemalloc
+import numpy as np
+from input_simulator import NullInputSimulator
+from keyboard_layout import VirtualKeyboard
+from session_recording import load_session
+from session_replay import ReplayClock, ReplayHandTracker
+from synthetic_input import generate_tap_session, make_background, render_hands
+from config import *
+
+SOAK_TEXT = 'the quick brown fox jumps over the lazy dog'
+
+
+def get_rss():
+    """Resident set size of this process in bytes (peak RSS where /proc is missing)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss if sys.platform == 'darwin' else rss * 1024
+
+
+def make_sessions(paths, frame_size):
+    """Recorded sessions, or a synthetic tap session if there are none"""
+    if paths:
+        return [load_session(path) for path in paths]
+    keys = [('space' if char == ' ' else char) for char in SOAK_TEXT]
+    return [generate_tap_session(VirtualKeyboard(), keys, hand_scale=60, frame_size=frame_size)]
+
+
+def frame_source(sessions, render):
+    """Endless (timestamp, count, landmarks, camera frame) stream cycling the sessions"""
+    offset = 0.0
+    frame = None
+    backgrounds = {}
+    while True:
+        for session in sessions:
+            timestamps = session['timestamps']
+            start = timestamps[0]
+            width, height = session['frame_size']
+            if render:
+                if session['frame_size'] not in backgrounds:
+                    backgrounds[session['frame_size']] = make_background(session['frame_size'])
+                background = backgrounds[session['frame_size']]
+                frame = np.empty_like(background)
+            elif frame is None or frame.shape[:2] != (height, width):
+                frame = np.zeros((height, width, 3), dtype=np.uint8)
+
+            for index in range(len(timestamps)):
+                if render:
+                    render_hands(session['landmarks'][index], session['counts'][index], background, frame)
+                yield (timestamps[index] - start + offset, session['counts'][index],
+                       session['landmarks'][index], frame)
+            offset += timestamps[-1] - start + 1.0
+
+
+def make_soak_app(tracker_name, frame_size):
+    """Headless app with a null injector and the replay or a real tracker"""
+    import virtual_keyboard
+
+    if tracker_name == 'replay':
+        tracker = ReplayHandTracker(frame_size)
+    else:
+        from hand_backends import create_backend
+        tracker = virtual_keyboard.HandTracker(background_load=False, backend=create_backend(tracker_name))
+        tracker.show_debug = False
+    app = virtual_keyboard.VirtualKeyboardApp(hand_tracker=tracker,
+                                              input_simulator=NullInputSimulator(async_injection=True))
+    app.quality_governor = None
+    return app
+
+
+def run_soak(frames=200000, interval=10000, warmup=5000, tracker_name='replay', session_paths=()):
+    """Run the soak and return the interval samples and the top allocation growth"""
+    frame_size = (CAMERA_WIDTH, CAMERA_HEIGHT)
+    sessions = make_sessions(session_paths, frame_size)
+    app = make_soak_app(tracker_name, sessions[0]['frame_size'])
+    tracker = app.hand_tracker
+    source = frame_source(sessions, render=tracker_name != 'replay')
+
+    # Debounce on the session's timeline, not the (much faster) wall clock
+    clock = ReplayClock()
+    app.input_simulator.clock = clock
+    typed = [0]
+    app.input_simulator.add_key_listener(lambda kind, value: typed.__setitem__(0, typed[0] + 1))
+
+    def run_frame():
+        timestamp, count, landmarks, frame = next(source)
+        clock.now = timestamp
+        if tracker_name == 'replay':
+            tracker.frame_size = (frame.shape[1], frame.shape[0])
+            tracker.load(timestamp, count, landmarks)
+        start = time.perf_counter()
+        landmarks_list = tracker.process_frame(frame, timestamp)
+        app.process_typing_logic(landmarks_list)
+        app.render_frame(frame, landmarks_list)
+        app.update_fps()
+        return time.perf_counter() - start
+
+    tracemalloc.start(SOAK_TRACEMALLOC_FRAMES)
+    samples = []
+    times = np.zeros(interval)
+    baseline_snapshot = None
+
+    # The app's per-key console messages would flood the report
+    devnull = open(os.devnull, 'w')
+    try:
+        with contextlib.redirect_stdout(devnull):
+            for _ in range(warmup):
+                run_frame()
+
+        done = 0
+        while done < frames:
+            count = min(interval, frames - done)
+            with contextlib.redirect_stdout(devnull):
+                for index in range(count):
+                    times[index] = run_frame()
+            done += count
+
+            interval_ms = times[:count] * 1000
+            p50, p95, p99 = np.percentile(interval_ms, [50, 95, 99])
+            samples.append({
+                'frames': warmup + done,
+                'traced': tracemalloc.get_traced_memory()[0],
+                'rss': get_rss(),
+                'p50_ms': float(p50),
+                'p95_ms': float(p95),
+                'p99_ms': float(p99),
+                'keys': typed[0]
+            })
+
+            # Only the baseline and the latest snapshot are kept alive
+            snapshot = tracemalloc.take_snapshot().filter_traces([
+                tracemalloc.Filter(False, tracemalloc.__file__)])
+            if baseline_snapshot is None:
+                baseline_snapshot = snapshot
+            print_sample(samples[-1], samples[0])
+
+        growth = [stat for stat in snapshot.compare_to(baseline_snapshot, 'traceback')
+                  if stat.size_diff > 0][:SOAK_TOP_ALLOCATIONS]
+    finally:
+        devnull.close()
+        tracemalloc.stop()
+        app.input_simulator.cleanup()
+        tracker.release()
+    return samples, growth
+
+
+def check_limits(samples):
+    """Compare the last sample with the baseline; returns a list of failures"""
+    if len(samples) < 2:
+        return []
+    baseline, last = samples[0], samples[-1]
+    failures = []
+    traced_growth = (last['traced'] - baseline['traced']) / 2**20
+    if traced_growth > SOAK_MAX_TRACED_GROWTH_MB:
+        failures.append(f"traced memory grew {traced_growth:.1f}MiB (limit {SOAK_MAX_TRACED_GROWTH_MB}MiB)")
+    rss_growth = (last['rss'] - baseline['rss']) / 2**20
+    if rss_growth > SOAK_MAX_RSS_GROWTH_MB:
+        failures.append(f"RSS grew {rss_growth:.1f}MiB (limit {SOAK_MAX_RSS_GROWTH_MB}MiB)")
+    drift = last['p50_ms'] / baseline['p50_ms'] - 1
+    if drift > SOAK_MAX_FRAME_TIME_DRIFT:
+        failures.append(f"median frame time drifted {drift:+.0%} (limit {SOAK_MAX_FRAME_TIME_DRIFT:+.0%})")
+    return failures
+
+
+def print_sample(sample, baseline):
+    """Print one interval sample with its growth since the baseline"""
+    if sample is baseline:
+        print(f"{'frames':>9s} {'traced MiB':>11s} {'growth':>8s} {'RSS MiB':>8s} {'growth':>8s} "
+              f"{'p50 ms':>7s} {'p95 ms':>7s} {'p99 ms':>7s} {'keys':>7s}")
+    print(f"{sample['frames']:9d} {sample['traced'] / 2**20:11.2f} "
+          f"{(sample['traced'] - baseline['traced']) / 2**20:+8.2f} {sample['rss'] / 2**20:8.1f} "
+          f"{(sample['rss'] - baseline['rss']) / 2**20:+8.1f} {sample['p50_ms']:7.3f} {sample['p95_ms']:7.3f} "
+          f"{sample['p99_ms']:7.3f} {sample['keys']:7d}")
+
+
+def print_growth(growth):
+    """Print the allocation sites that grew the most since the baseline"""
+    print("Largest allocation growth since the baseline:")
+    for stat in growth:
+        frame = stat.traceback[-1] if len(stat.traceback) else None
+        where = f"{frame.filename}:{frame.lineno}" if frame else '?'
+        print(f"  {stat.size_diff / 1024:+9.1f}KiB {stat.count_diff:+7d} blocks  {where}")
+
+
+def main():
+    """Run the soak with command-line options"""
+    parser = argparse.ArgumentParser(description="Long-run soak benchmark")
+    parser.add_argument('--frames', type=int, default=200000, help="measured frames")
+    parser.add_argument('--interval', type=int, default=10000, help="frames between samples")
+    parser.add_argument('--warmup', type=int, default=5000, help="frames run before the baseline")
+    parser.add_argument('--tracker', default='replay', help="'replay' (landmarks) or a backend name")
+    parser.add_argument('--session', action='append', default=[], help="recorded session to cycle (repeatable)")
+    args = parser.parse_args()
+
+    if args.session and args.tracker != 'replay':
+        print("Recorded sessions have no camera frames; use --tracker replay")
+        return False
+
+    samples, growth = run_soak(max(1, args.frames), max(1, args.interval), args.warmup, args.tracker, args.session)
+    print_growth(growth)
+    failures = check_limits(samples)
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if not failures:
+        print("PASS: memory and frame time stayed within the limits")
+    return not failures
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
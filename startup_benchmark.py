@@ -0,0 +1,134 @@
+"""
+Cold Start Benchmark
+
+Starts a fresh interpreter for every run and breaks the cold start down
+into phases: importing numpy and OpenCV, importing the app modules,
+building the app, rendering the first frame, and, in the background,
+importing MediaPipe, building the model and warming it up. The OS input
+libraries, which are only imported on the first keystroke, are timed
+last. Time to first frame is what the user waits for before the window
+shows the keyboard.
+
+Usage: python startup_benchmark.py [--runs 3] [--foreground]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import numpy as np
+
+PHASES = [
+    ('import_numpy_cv2', "import numpy and OpenCV"),
+    ('import_app', "import app modules"),
+    ('create_app', "create the app"),
+    ('first_frame', "render the first frame"),
+    ('time_to_first_frame', "= time to first frame"),
+    ('model_import', "import MediaPipe (background)"),
+    ('model_create', "build the model (background)"),
+    ('model_warmup', "warm-up inference (background)"),
+    ('model_ready', "model ready after start"),
+    ('import_pyautogui', "import pyautogui (first keystroke)"),
+    ('import_keyboard', "import keyboard (first keystroke)"),
+]
+
+
+def measure_startup(foreground=False):
+    """Measure one cold start in this interpreter and return phase times in seconds"""
+    times = {}
+    start = time.perf_counter()
+
+    now = time.perf_counter()
+    import cv2
+    times['import_numpy_cv2'] = time.perf_counter() - now
+
+    now = time.perf_counter()
+    import virtual_keyboard
+    import hand_tracker
+    import input_simulator
+    times['import_app'] = time.perf_counter() - now
+
+    now = time.perf_counter()
+    tracker = hand_tracker.HandTracker(background_load=not foreground)
+    app = virtual_keyboard.VirtualKeyboardApp(hand_tracker=tracker)
+    app.quality_governor = None
+    times['create_app'] = time.perf_counter() - now
+
+    now = time.perf_counter()
+    blank = np.zeros((virtual_keyboard.CAMERA_HEIGHT, virtual_keyboard.CAMERA_WIDTH, 3), dtype=np.uint8)
+    app.render_frame(blank, [])
+    times['first_frame'] = time.perf_counter() - now
+    times['time_to_first_frame'] = time.perf_counter() - start
+
+    if tracker._loader is not None:
+        tracker._loader.join()
+    times['model_ready'] = time.perf_counter() - start
+    for phase, duration in tracker.load_times.items():
+        times[f"model_{phase}"] = duration
+    if tracker.load_error is not None:
+        times['model_error'] = str(tracker.load_error)
+
+    for name, loader in (('pyautogui', input_simulator.get_pyautogui),
+                         ('keyboard', input_simulator.get_keyboard)):
+        now = time.perf_counter()
+        try:
+            loader()
+            times[f"import_{name}"] = time.perf_counter() - now
+        except Exception as e:
+            times[f"import_{name}_error"] = str(e)
+
+    app.input_simulator.cleanup()
+    return times
+
+
+def run_startup_benchmark(runs=3, foreground=False):
+    """Measure runs cold starts, each in a fresh interpreter"""
+    command = [sys.executable, os.path.abspath(__file__), '--child']
+    if foreground:
+        command.append('--foreground')
+
+    results = []
+    for _ in range(runs):
+        output = subprocess.run(command, capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+        lines = [line for line in output.stdout.splitlines() if line.startswith('{')]
+        if not lines:
+            print(output.stdout + output.stderr)
+            raise RuntimeError("Startup measurement failed")
+        results.append(json.loads(lines[-1]))
+    return results
+
+
+def print_startup_benchmark(results):
+    """Print the median time of every phase"""
+    print(f"Cold starts: {len(results)}")
+    for phase, label in PHASES:
+        values = [r[phase] for r in results if phase in r]
+        if values:
+            print(f"  {label:38s} {np.median(values) * 1000:9.1f}ms")
+    for key in sorted({key for r in results for key in r if key.endswith('error')}):
+        print(f"  {key}: {results[-1].get(key)}")
+
+
+def main():
+    """Run the benchmark with command-line options"""
+    parser = argparse.ArgumentParser(description="Cold start benchmark")
+    parser.add_argument('--runs', type=int, default=3, help="number of cold starts")
+    parser.add_argument('--foreground', action='store_true',
+                        help="load the model before the first frame, as before background loading")
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure_startup(args.foreground)))
+        return True
+
+    print_startup_benchmark(run_startup_benchmark(args.runs, args.foreground))
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
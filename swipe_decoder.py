@@ -0,0 +1,167 @@
+"""
+Swipe (Shape-Writing) Decoder for the Virtual Keyboard
+"""
+
+import numpy as np
+from config import *
+
+
+def resample_path(points, samples=SWIPE_SAMPLES):
+    """Resample a polyline to samples points equally spaced along its length"""
+    points = np.asarray(points, dtype=np.float32).reshape(-1, 2)
+    if len(points) == 1:
+        return np.repeat(points, samples, axis=0)
+
+    lengths = np.hypot(*np.diff(points, axis=0).T)
+    cumulative = np.concatenate(([0.0], np.cumsum(lengths)))
+    if cumulative[-1] == 0:
+        return np.repeat(points[:1], samples, axis=0)
+
+    targets = np.linspace(0.0, cumulative[-1], samples)
+    return np.stack([np.interp(targets, cumulative, points[:, 0]),
+                     np.interp(targets, cumulative, points[:, 1])], axis=1).astype(np.float32)
+
+
+def resample_paths(paths, lengths, samples=SWIPE_SAMPLES):
+    """Resample a batch of padded polylines at once.
+
+    paths is (W, L, 2) with each row padded by repeating its last point,
+    lengths is the number of real points of each row. Returns (W, samples, 2).
+    """
+    if paths.shape[1] < 2:
+        # Single points have no segment to interpolate along: repeat them
+        paths = np.concatenate((paths, paths[:, -1:]), axis=1)
+    segments = np.hypot(*np.moveaxis(np.diff(paths, axis=1), -1, 0))
+    cumulative = np.concatenate((np.zeros((len(paths), 1), dtype=np.float32),
+                                 np.cumsum(segments, axis=1)), axis=1)
+    totals = cumulative[:, -1:]
+    targets = np.linspace(0.0, 1.0, samples, dtype=np.float32) * totals
+
+    # Segment of every target point: count the vertices before it
+    segment = (cumulative[:, None, :] <= targets[:, :, None]).sum(axis=2) - 1
+    segment = np.clip(segment, 0, np.maximum(lengths - 2, 0)[:, None])
+
+    rows = np.arange(len(paths))[:, None]
+    start = cumulative[rows, segment]
+    span = cumulative[rows, segment + 1] - start
+    fraction = np.divide(targets - start, span, out=np.zeros_like(targets), where=span > 0)
+    fraction = np.clip(fraction, 0.0, 1.0)[..., None]
+    return paths[rows, segment] + (paths[rows, segment + 1] - paths[rows, segment]) * fraction
+
+
+class SwipeDecoder:
+    """Decode a fingertip path across the keyboard into the most likely word.
+
+    Every lexicon word spelled with the keyboard's letter keys gets an
+    ideal path through its key centers, resampled to SWIPE_SAMPLES points.
+    A gesture is resampled the same way and compared with the templates
+    of the words whose first and last letters are on keys near its start
+    and end points, using the mean point-to-point distance in key widths.
+    Word frequency breaks ties between similar shapes.
+    """
+
+    def __init__(self, keyboard, lexicon, samples=SWIPE_SAMPLES):
+        self.keyboard = keyboard
+        self.lexicon = lexicon
+        self.samples = samples
+        self.letter_centers = {}
+        self.words = []
+        self.templates = np.zeros((0, samples, 2), dtype=np.float32)
+        self.log_counts = np.zeros(0, dtype=np.float32)
+        self._index = {}
+        self.build()
+
+    def build(self):
+        """Build the word templates and the start/end-key index.
+
+        Call again after the keyboard layout changes.
+        """
+        self.letter_centers = {}
+        for key in self.keyboard.keys.values():
+            char = key['char']
+            if len(char) == 1 and char.isalpha() and char not in self.letter_centers:
+                self.letter_centers[char] = (key['x'] + key['width'] / 2,
+                                             key['y'] + key['height'] / 2)
+
+        words = []
+        counts = []
+        key_paths = []
+        for word, count in zip(self.lexicon.words, self.lexicon.counts):
+            word = word.decode('utf-8')
+            if len(word) < 2 or any(char not in self.letter_centers for char in word):
+                continue
+            # Repeated letters do not move the finger
+            keys = [word[0]] + [b for a, b in zip(word, word[1:]) if b != a]
+            words.append(word)
+            counts.append(count)
+            key_paths.append([self.letter_centers[char] for char in keys])
+
+        self.words = words
+        self.log_counts = np.log(np.maximum(np.asarray(counts, dtype=np.float64), 1)).astype(np.float32)
+        if not words:
+            self.templates = np.zeros((0, self.samples, 2), dtype=np.float32)
+            self._index = {}
+            return
+
+        # Pad every key path to the longest one by repeating its last center
+        lengths = np.array([len(path) for path in key_paths])
+        paths = np.empty((len(words), lengths.max(), 2), dtype=np.float32)
+        for row, path in enumerate(key_paths):
+            paths[row, :len(path)] = path
+            paths[row, len(path):] = path[-1]
+        self.templates = resample_paths(paths, lengths, self.samples)
+
+        # (first letter, last letter) -> template rows
+        index = {}
+        for row, word in enumerate(words):
+            index.setdefault((word[0], word[-1]), []).append(row)
+        self._index = {pair: np.array(rows, dtype=np.intp) for pair, rows in index.items()}
+
+    def _letters_near(self, point):
+        """Letters whose key center lies within SWIPE_KEY_RADIUS key widths of point"""
+        radius = SWIPE_KEY_RADIUS * KEY_WIDTH
+        return [char for char, (x, y) in self.letter_centers.items()
+                if (x - point[0]) ** 2 + (y - point[1]) ** 2 <= radius * radius]
+
+    def candidates(self, path):
+        """Template rows of the words that can start and end where path does"""
+        starts = self._letters_near(path[0])
+        ends = self._letters_near(path[-1])
+        rows = [self._index[pair] for pair in
+                ((start, end) for start in starts for end in ends) if pair in self._index]
+        if not rows:
+            return np.zeros(0, dtype=np.intp)
+        return np.concatenate(rows)
+
+    def decode(self, path, count=SUGGESTION_COUNT):
+        """Get the count best words for a path of display positions.
+
+        Returns a list of (word, score) with the best (lowest) score first,
+        or an empty list if no word fits.
+        """
+        if len(path) == 0 or not self.words:
+            return []
+
+        gesture = resample_path(path, self.samples)
+        rows = self.candidates(gesture)
+        if len(rows) == 0:
+            return []
+
+        # Mean distance between corresponding points, in key widths
+        offsets = self.templates[rows] - gesture
+        distances = np.sqrt(np.einsum('wsi,wsi->ws', offsets, offsets)).mean(axis=1) / KEY_WIDTH
+        scores = distances - SWIPE_FREQUENCY_WEIGHT * self.log_counts[rows]
+
+        best = np.argsort(scores)[:count]
+        return [(self.words[rows[i]], float(scores[i])) for i in best]
+
+    def decode_word(self, path):
+        """Get the best word for a path (None if no word fits)"""
+        results = self.decode(path, 1)
+        return results[0][0] if results else None
+
+
+def path_length(path):
+    """Total length of a polyline in pixels"""
+    path = np.asarray(path, dtype=np.float32).reshape(-1, 2)
+    return float(np.hypot(*np.diff(path, axis=0).T).sum()) if len(path) > 1 else 0.0
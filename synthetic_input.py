@@ -0,0 +1,300 @@
+"""
+Synthetic Hand Landmark Generation for Tests and Benchmarks
+
+Builds landmark sessions in the same format as session_recording.load_session
+from a known pattern of key presses, so the typing pipeline can be driven
+without a camera and every press has a known ground-truth time.
+"""
+
+import cv2
+import numpy as np
+from hand_model import NUM_LANDMARKS, HAND_CONNECTIONS, OPEN_HAND, FINGER_JOINTS, hand_pose
+from config import *
+
+# BGR color of rendered hands (inside the default skin range) and their
+# finger width in hand scales
+SKIN_COLOR = (110, 140, 200)
+FINGER_WIDTH = 0.2
+
+# Landmarks outlining the palm
+PALM_LANDMARKS = [0, 1, 5, 9, 13, 17]
+
+
+def place_hand(pose, anchor_id, anchor_position, hand_scale, frame_size):
+    """Place a pose so landmark anchor_id lands on anchor_position (pixels).
+
+    Returns normalized (21, 3) landmarks for a frame of frame_size.
+    """
+    width, height = frame_size
+    pixels = (pose[:, :2] - pose[anchor_id, :2]) * hand_scale + np.asarray(anchor_position, dtype=np.float32)
+    normalized = np.empty((NUM_LANDMARKS, 3), dtype=np.float32)
+    normalized[:, 0] = pixels[:, 0] / width
+    normalized[:, 1] = pixels[:, 1] / height
+    normalized[:, 2] = pose[:, 2]
+    return normalized
+
+
+def key_center(keyboard, key_char):
+    """Get the display position of the first key with the given character"""
+    for key in keyboard.keys.values():
+        if key['char'] == key_char:
+            return (key['x'] + key['width'] / 2, key['y'] + key['height'] / 2)
+    raise KeyError(f"No key for {key_char!r} in the layout")
+
+
+def display_to_camera(position, frame_size):
+    """Map a display position to camera pixels (inverse of the typing logic's mapping)"""
+    return (position[0] * frame_size[0] / DISPLAY_WIDTH,
+            position[1] * frame_size[1] / DISPLAY_HEIGHT)
+
+
+def generate_tap_session(keyboard, keys, fps=30, hand_scale=80, hover_time=0.3,
+                         press_time=0.1, release_time=0.15, start_time=0.0,
+                         frame_size=(CAMERA_WIDTH, CAMERA_HEIGHT), press_depth=1.0, rest_curl=0.0):
+    """Generate a session that taps each key in turn with the index finger.
+
+    For every key the fingertip rests on the key center for hover_time,
+    curls over press_time and opens again over release_time. The finger
+    rests at rest_curl and curls to press_depth (1 folds it fully, a
+    light tapper stops earlier). The returned
+    session dict matches load_session() and adds 'presses', a list of
+    (key_char, contact_frame) where contact_frame is the index of the
+    frame at which the curl completes, and 'tap_starts', the index of the
+    first frame of each tap's downward motion (latencies are measured
+    from it, since a detector may fire before the curl completes).
+    """
+    frame_period = 1.0 / fps
+    frames = []
+    presses = []
+    tap_starts = []
+
+    def add_frame(tip, curl):
+        pose = hand_pose({INDEX_FINGER_TIP_ID: curl})
+        frames.append(place_hand(pose, INDEX_FINGER_TIP_ID, tip, hand_scale, frame_size))
+
+    for key_char in keys:
+        tip = display_to_camera(key_center(keyboard, key_char), frame_size)
+
+        for _ in range(max(1, round(hover_time * fps))):
+            add_frame(tip, rest_curl)
+
+        press_frames = max(1, round(press_time * fps))
+        tap_starts.append(len(frames))
+        for step in range(1, press_frames + 1):
+            add_frame(tip, rest_curl + (press_depth - rest_curl) * step / press_frames)
+        presses.append((key_char, len(frames) - 1))
+
+        release_frames = max(1, round(release_time * fps))
+        for step in range(release_frames - 1, -1, -1):
+            add_frame(tip, rest_curl + (press_depth - rest_curl) * step / release_frames)
+
+    count = len(frames)
+    landmarks = np.zeros((count, MAX_NUM_HANDS, NUM_LANDMARKS, 3), dtype=np.float32)
+    landmarks[:, 0] = frames
+
+    return {
+        'frame_size': frame_size,
+        'timestamps': start_time + np.arange(count, dtype=np.float64) * frame_period,
+        'counts': np.ones(count, dtype=np.int32),
+        'landmarks': landmarks,
+        'presses': presses,
+        'tap_starts': tap_starts
+    }
+
+
+def text_to_keys(keyboard, text):
+    """Map text to key names of the layout.
+
+    Whitespace runs become 'space' and letters are typed lowercase (the
+    generator does not use shift). Returns (keys, number of characters
+    skipped because the layout has no key for them).
+    """
+    available = {key['char'] for key in keyboard.keys.values()}
+    keys = []
+    skipped = 0
+    for char in ' '.join(text.split()).lower():
+        key_char = 'space' if char == ' ' else char
+        if key_char in available:
+            keys.append(key_char)
+        else:
+            skipped += 1
+    return keys, skipped
+
+
+def minimum_jerk(u):
+    """Minimum-jerk easing of a movement fraction in [0, 1]"""
+    return u * u * u * (10 - 15 * u + 6 * u * u)
+
+
+def generate_typing_session(keyboard, text, wpm=40, fps=30, hand_scale=80, hands=2,
+                            press_time=0.1, release_time=0.15, press_depth=1.0, rest_curl=0.0,
+                            move_time=0.1, aim_error=0.0, timing_jitter=0.0, noise_px=0.0,
+                            hover_time=0.3, seed=0, start_time=0.0,
+                            frame_size=(CAMERA_WIDTH, CAMERA_HEIGHT)):
+    """Generate a session that types text with the index fingers of one or two hands.
+
+    Keys left of the keyboard's middle are typed by the left hand when
+    hands is 2, the rest by the right hand. Key presses are scheduled
+    every 12 / wpm seconds (a word is five characters), each interval
+    scaled by a log-normal factor with sigma timing_jitter. Between taps
+    a hand moves on a minimum-jerk path to its next key, taking
+    move_time * log2(1 + distance / key width) seconds (Fitts' law), and
+    a press waits for the hand to arrive, so slow movements lower the
+    achieved speed. The fingertip aims at the key center with a gaussian
+    error of aim_error key sizes. Presses curl the finger from rest_curl
+    to press_depth over press_time and open it over release_time, and
+    noise_px adds landmark jitter.
+
+    The palm follows the fingertip rigidly. The returned session matches
+    generate_tap_session(), with 'presses' and 'tap_starts' in typing
+    order, plus 'keys' (the key names typed) and 'skipped' (characters
+    with no key).
+    """
+    rng = np.random.default_rng(seed)
+    keys, skipped = text_to_keys(keyboard, text)
+    if not keys:
+        raise ValueError("The text has no characters on the keyboard")
+
+    geometry = {}
+    for key in keyboard.keys.values():
+        geometry.setdefault(key['char'], key)
+    bounds_x, _, bounds_width, _ = keyboard.bounds
+    middle = bounds_x + bounds_width / 2
+
+    def hand_for(key_char):
+        return 0 if hands == 2 and key_center(keyboard, key_char)[0] < middle else hands - 1
+
+    # Keyframes of each hand: (time, x, y, curl), display coordinates
+    keyframes = [[] for _ in range(hands)]
+    free_time = [0.0] * hands
+
+    def add_keyframe(hand, time, position, curl):
+        frames = keyframes[hand]
+        if frames and time <= frames[-1][0]:
+            frames[-1] = (frames[-1][0], position[0], position[1], curl)
+        else:
+            frames.append((time, position[0], position[1], curl))
+
+    # Every hand starts over its home key (or its first key)
+    for hand, home in enumerate(['f', 'j'][-hands:]):
+        own_keys = [key_char for key_char in keys if hand_for(key_char) == hand]
+        start_key = home if home in geometry else (own_keys[0] if own_keys else keys[0])
+        add_keyframe(hand, 0.0, key_center(keyboard, start_key), rest_curl)
+
+    presses = []
+    scheduled = hover_time
+    for index, key_char in enumerate(keys):
+        hand = hand_for(key_char)
+        key = geometry[key_char]
+        center = key_center(keyboard, key_char)
+        target = (center[0] + rng.normal(0, aim_error) * key['width'],
+                  center[1] + rng.normal(0, aim_error) * key['height'])
+
+        _, x, y, _ = keyframes[hand][-1]
+        distance = np.hypot(target[0] - x, target[1] - y)
+        arrival = free_time[hand] + move_time * np.log2(1 + distance / key['width'])
+        if index:
+            scheduled += 12.0 / wpm * rng.lognormal(0, timing_jitter)
+        press_start = max(scheduled, arrival)
+        scheduled = press_start
+
+        add_keyframe(hand, free_time[hand], (x, y), rest_curl)
+        add_keyframe(hand, arrival, target, rest_curl)
+        add_keyframe(hand, press_start, target, rest_curl)
+        add_keyframe(hand, press_start + press_time, target, press_depth)
+        free_time[hand] = press_start + press_time + release_time
+        add_keyframe(hand, free_time[hand], target, rest_curl)
+        presses.append((key_char, press_start, press_start + press_time))
+
+    duration = max(free_time) + hover_time
+    times = np.arange(0, duration, 1.0 / fps)
+    count = len(times)
+    landmarks = np.zeros((count, MAX_NUM_HANDS, NUM_LANDMARKS, 3), dtype=np.float32)
+
+    for hand in range(hands):
+        frames = np.array(keyframes[hand], dtype=np.float64)
+        if len(frames) == 1:
+            frames = np.vstack([frames, frames + (duration, 0, 0, 0)])
+        segment = np.clip(np.searchsorted(frames[:, 0], times, side='right') - 1, 0, len(frames) - 2)
+        begin, end = frames[segment], frames[segment + 1]
+        eased = minimum_jerk(np.clip((times - begin[:, 0]) / (end[:, 0] - begin[:, 0]), 0, 1))[:, None]
+        states = begin[:, 1:] + (end[:, 1:] - begin[:, 1:]) * eased
+
+        # The left hand of a two-handed typist is the mirrored right hand
+        mirrored = hands == 2 and hand == 0
+        for frame, (x, y, curl) in enumerate(states):
+            pose = hand_pose({INDEX_FINGER_TIP_ID: curl})
+            if mirrored:
+                pose[:, 0] = -pose[:, 0]
+            tip = display_to_camera((x, y), frame_size)
+            landmarks[frame, hand] = place_hand(pose, INDEX_FINGER_TIP_ID, tip, hand_scale, frame_size)
+
+    session = {
+        'frame_size': frame_size,
+        'timestamps': start_time + times,
+        'counts': np.full(count, hands, dtype=np.int32),
+        'landmarks': landmarks,
+        'presses': [(key_char, min(count - 1, int(round(contact * fps)))) for key_char, _, contact in presses],
+        'tap_starts': [min(count - 1, int(np.floor(start * fps)) + 1) for _, start, _ in presses],
+        'keys': keys,
+        'skipped': skipped
+    }
+    return add_noise(session, noise_px, seed)
+
+
+def add_noise(session, noise_px, seed=0):
+    """Add gaussian landmark jitter of noise_px pixels to a session in place"""
+    if noise_px <= 0:
+        return session
+    rng = np.random.default_rng(seed)
+    width, height = session['frame_size']
+    landmarks = session['landmarks']
+    landmarks[..., 0] += rng.normal(0, noise_px / width, landmarks.shape[:-1])
+    landmarks[..., 1] += rng.normal(0, noise_px / height, landmarks.shape[:-1])
+    landmarks[..., 2] += rng.normal(0, noise_px / width, landmarks.shape[:-1])
+    return session
+
+
+def make_background(frame_size=(CAMERA_WIDTH, CAMERA_HEIGHT), seed=0):
+    """Get a noisy gray camera background with no skin-colored pixels"""
+    width, height = frame_size
+    rng = np.random.default_rng(seed)
+    return rng.integers(20, 90, (height, width, 1), dtype=np.uint8).repeat(3, axis=2)
+
+
+def render_hands(normalized, count, background, out=None):
+    """Draw the silhouettes of count hands of normalized landmarks on a background.
+
+    Gives camera-like frames with known landmarks for the hand tracking
+    backends. The drawing is flat, so it only resembles a hand to
+    detectors that work on shape and color.
+    """
+    if out is None:
+        out = background.copy()
+    else:
+        out[:] = background
+    height, width = background.shape[:2]
+    for hand in normalized[:count]:
+        points = (hand[:, :2] * (width, height)).astype(np.int32)
+        hand_scale = np.hypot(*(points[MIDDLE_FINGER_MCP_ID] - points[WRIST_ID]))
+        thickness = max(1, int(FINGER_WIDTH * hand_scale))
+        cv2.fillConvexPoly(out, points[PALM_LANDMARKS], SKIN_COLOR)
+        for start, end in HAND_CONNECTIONS:
+            cv2.line(out, tuple(points[start]), tuple(points[end]), SKIN_COLOR, thickness)
+    return out
+
+
+def synthetic_source(text='the quick brown fox', hand_scale=60):
+    """Frames rendered from a synthetic tap session typing text, and the session"""
+    from keyboard_layout import VirtualKeyboard
+
+    keys = [('space' if char == ' ' else char) for char in text.lower()]
+    session = generate_tap_session(VirtualKeyboard(), keys, hand_scale=hand_scale, start_time=10.0)
+    background = make_background(session['frame_size'])
+
+    def frames_iter():
+        frame = np.empty_like(background)
+        for index in range(len(session['timestamps'])):
+            yield render_hands(session['landmarks'][index], session['counts'][index], background, frame)
+
+    return frames_iter, session
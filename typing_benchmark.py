@@ -0,0 +1,193 @@
+"""
+Typing Throughput Benchmark
+
+Types a corpus of phrases with synthetic fingertip and palm trajectories
+(synthetic_input.generate_typing_session) under several typist
+configurations (speed, noise, aim, press dynamics, hand size), replays
+them through the typing logic once per press detector and reports:
+
+- effective WPM: characters typed per minute of typing, in five-character
+  words, scaled by (1 - CER)
+- CER: character error rate, the edit distance between the typed and the
+  intended text over the intended length
+- press latency: time from the first frame of a tap's downward motion to
+  its key event
+- CPU time per frame spent in process_typing_logic
+
+Each configuration's phrases are typed one after the other by the same
+app, so the calibrated detector learns over the whole corpus like it
+would for a real user. --corpus takes a text file with one phrase per line.
+
+Usage: python typing_benchmark.py [--corpus phrases.txt] [--detector calibrated ...] [--fps 30] [--seed 0]
+"""
+
+import argparse
+import contextlib
+import os
+import sys
+import time
+import numpy as np
+from press_benchmark import DETECTORS, make_app, score_taps
+from session_replay import replay_session
+from synthetic_input import generate_typing_session
+from config import *
+
+PHRASES = [
+    'the quick brown fox jumps over the lazy dog',
+    'my watch fell in the water',
+    'prevailing wind from the east',
+    'never too rich and never too thin',
+    'breathing is difficult',
+    'i can see the rings on saturn',
+    'physics and chemistry are hard',
+    'my bank account is overdrawn',
+]
+
+# (name, generate_typing_session options)
+CONFIGURATIONS = [
+    ('slow', {'wpm': 20}),
+    ('moderate', {'wpm': 40}),
+    ('fast', {'wpm': 60, 'press_time': 0.07, 'release_time': 0.1, 'move_time': 0.07}),
+    ('one hand', {'wpm': 30, 'hands': 1}),
+    ('far from camera', {'wpm': 40, 'hand_scale': 40}),
+    ('sloppy aim and rhythm', {'wpm': 40, 'aim_error': 0.2, 'timing_jitter': 0.3}),
+    ('noisy tracking', {'wpm': 40, 'noise_px': 2.0}),
+    ('light tapper', {'wpm': 40, 'press_depth': 0.55, 'rest_curl': 0.1}),
+]
+
+PHRASE_GAP = 2.0  # Seconds between phrases
+
+
+def typed_text(events):
+    """Text produced by (kind, value) key events (other special keys add nothing)"""
+    text = []
+    for kind, value in events:
+        if kind == 'text':
+            text.extend(value)
+        elif kind != 'press':
+            continue
+        elif value == 'space':
+            text.append(' ')
+        elif value == 'backspace':
+            if text:
+                text.pop()
+        elif len(value) == 1:
+            text.append(value)
+    return ''.join(text)
+
+
+def edit_distance(typed, reference):
+    """Levenshtein distance between two strings"""
+    reference_codes = np.array([ord(char) for char in reference])
+    columns = np.arange(len(reference) + 1)
+    previous = columns
+    for i, char in enumerate(typed, 1):
+        current = np.empty_like(previous)
+        current[0] = i
+        current[1:] = np.minimum(previous[:-1] + (reference_codes != ord(char)), previous[1:] + 1)
+        # Insertions run along the row: current[j] = min(current[j], current[j - 1] + 1)
+        previous = np.minimum.accumulate(current - columns) + columns
+    return int(previous[-1])
+
+
+def run_configuration(options, detector, phrases, fps=FPS_TARGET, seed=0):
+    """Type every phrase with one configuration and detector; returns the totals"""
+    app = make_app(detector)
+    totals = {'chars': 0, 'errors': 0, 'typing_time': 0.0, 'typed_chars': 0, 'frames': 0, 'cpu': 0.0,
+              'taps': 0, 'detected': 0, 'false_presses': 0, 'latencies_ms': [], 'skipped': 0}
+    start_time = 10.0
+    devnull = open(os.devnull, 'w')
+    try:
+        for index, phrase in enumerate(phrases):
+            session = generate_typing_session(app.keyboard, phrase, fps=fps, seed=seed + index,
+                                              start_time=start_time, frame_size=app.hand_tracker.frame_size,
+                                              **options)
+            emitted = len(app.input_simulator.emitted)
+            cpu_start = time.process_time()
+            with contextlib.redirect_stdout(devnull):
+                replay = replay_session(session, app)
+            totals['cpu'] += time.process_time() - cpu_start
+            totals['frames'] += len(session['timestamps'])
+            start_time = session['timestamps'][-1] + PHRASE_GAP
+
+            events = replay['events'][emitted:]
+            typed = typed_text([(kind, value) for _, kind, value in events])
+            reference = typed_text([('press', key) for key in session['keys']])
+            totals['chars'] += len(reference)
+            totals['errors'] += edit_distance(typed, reference)
+            totals['skipped'] += session['skipped']
+            key_times = [timestamp for timestamp, kind, _ in events if kind in ('press', 'text')]
+            if len(typed) > 1 and len(key_times) > 1:
+                # MacKenzie's WPM: the first character starts the clock
+                totals['typed_chars'] += len(typed) - 1
+                totals['typing_time'] += key_times[-1] - key_times[0]
+
+            score = score_taps(session, events)
+            for name in ('taps', 'detected', 'false_presses'):
+                totals[name] += score[name]
+            totals['latencies_ms'].extend(score['latencies_ms'])
+    finally:
+        devnull.close()
+
+    totals['latencies_ms'] = np.array(totals['latencies_ms'])
+    return totals
+
+
+def run_benchmark(phrases=PHRASES, detectors=DETECTORS, configurations=CONFIGURATIONS, fps=FPS_TARGET, seed=0):
+    """Run every configuration with every detector"""
+    results = []
+    for name, options in configurations:
+        for detector in detectors:
+            totals = run_configuration(options, detector, phrases, fps, seed)
+            cer = totals['errors'] / totals['chars'] if totals['chars'] else 0.0
+            wpm = totals['typed_chars'] / 5 / (totals['typing_time'] / 60) if totals['typing_time'] else 0.0
+            totals.update(configuration=name, detector=detector, cer=cer, wpm=wpm,
+                          effective_wpm=wpm * max(0.0, 1 - cer),
+                          cpu_ms=totals['cpu'] / totals['frames'] * 1000)
+            results.append(totals)
+    return results
+
+
+def print_benchmark(results):
+    """Print one line per configuration and detector"""
+    print(f"{'configuration':22s} {'detector':14s} {'WPM':>6s} {'eff WPM':>8s} {'CER':>7s} {'taps':>9s} "
+          f"{'false':>6s} {'p50 ms':>7s} {'p95 ms':>7s} {'CPU ms/frame':>13s}")
+    for r in results:
+        latencies = r['latencies_ms']
+        p50 = f"{np.percentile(latencies, 50):7.1f}" if len(latencies) else f"{'-':>7s}"
+        p95 = f"{np.percentile(latencies, 95):7.1f}" if len(latencies) else f"{'-':>7s}"
+        print(f"{r['configuration']:22s} {r['detector']:14s} {r['wpm']:6.1f} {r['effective_wpm']:8.1f} "
+              f"{r['cer']:7.1%} {r['detected']:4d}/{r['taps']:<4d} {r['false_presses']:6d} "
+              f"{p50} {p95} {r['cpu_ms']:13.3f}")
+    skipped = max((r['skipped'] for r in results), default=0)
+    if skipped:
+        print(f"{skipped} corpus characters have no key on the layout and were left out")
+
+
+def load_phrases(path):
+    """Non-empty lines of a text file"""
+    with open(path, encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def main():
+    """Run the benchmark with command-line options"""
+    parser = argparse.ArgumentParser(description="Typing throughput benchmark")
+    parser.add_argument('--corpus', help="text file with one phrase per line")
+    parser.add_argument('--detector', action='append', choices=DETECTORS,
+                        help="press detector to benchmark (repeatable, default: all)")
+    parser.add_argument('--fps', type=float, default=FPS_TARGET, help="synthetic camera frame rate")
+    parser.add_argument('--seed', type=int, default=0, help="seed of the generated noise and timing")
+    args = parser.parse_args()
+
+    phrases = load_phrases(args.corpus) if args.corpus else PHRASES
+    if not phrases:
+        print(f"No phrases in {args.corpus}")
+        return False
+    print_benchmark(run_benchmark(phrases, args.detector or DETECTORS, fps=args.fps, seed=args.seed))
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
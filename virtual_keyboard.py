@@ -3,18 +3,80 @@ Virtual Keyboard Main Application
 """
 
 import cv2
+import signal
 import time
 import numpy as np
-from keyboard_layout import VirtualKeyboard
+from keyboard_layout import VirtualKeyboard, program_path
 from hand_tracker import HandTracker
+from parallel_inference import ParallelHandTracker
 from input_simulator import InputSimulator
+from pipeline import Pipeline, PipelineClosed
+from quality_governor import QualityGovernor
+from session_recording import SessionRecorder
+from profiling import StageProfiler
+from word_completion import WordCompleter, load_lexicon
+from swipe_decoder import SwipeDecoder, path_length
+from press_detector import create_press_detector
 from config import *
 
+INSTRUCTIONS = [
+    "ESC: Exit",
+    "Space: Toggle Keyboard",
+    "S: Toggle Swipe Typing",
+    "L: Next Layout",
+    "Index finger: Point to keys",
+    "Tap a finger down to press"
+]
+
+
+# Startup status line, just above the suggestion row
+STATUS_TEXT_ORIGIN = (KEYBOARD_X, KEYBOARD_Y - SUGGESTION_ROW_HEIGHT - 20)
+
+
+def draw_text(frame, text, origin, scale, thickness):
+    """Draw overlay text and return the (x, y, width, height) it covers, clipped to the display"""
+    cv2.putText(frame, text, origin, cv2.FONT_HERSHEY_SIMPLEX, scale, COLORS['text_normal'], thickness)
+    (width, height), baseline = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, scale, thickness)
+    return clip_rect((origin[0] - thickness, origin[1] - height - thickness,
+                      width + 2 * thickness, height + baseline + 2 * thickness))
+
+
+def clip_rect(rect):
+    """Clip an (x, y, width, height) rect to the display"""
+    x, y, width, height = rect
+    x1, y1 = max(x, 0), max(y, 0)
+    x2, y2 = min(x + width, DISPLAY_WIDTH), min(y + height, DISPLAY_HEIGHT)
+    return (x1, y1, max(x2 - x1, 0), max(y2 - y1, 0))
+
+
+def rect_inside(rect, cover):
+    """Check if rect lies entirely within cover"""
+    return (rect[0] >= cover[0] and rect[1] >= cover[1] and
+            rect[0] + rect[2] <= cover[0] + cover[2] and
+            rect[1] + rect[3] <= cover[1] + cover[3])
+
+
+def rect_covered(rect, covers):
+    """Check if rect lies entirely within any of the covers (a loop, so no generator per call)"""
+    for cover in covers:
+        if rect_inside(rect, cover):
+            return True
+    return False
+
+
 class VirtualKeyboardApp:
-    def __init__(self):
+    def __init__(self, hand_tracker=None, input_simulator=None):
         self.keyboard = VirtualKeyboard()
-        self.hand_tracker = HandTracker()
-        self.input_simulator = InputSimulator()
+        self.keyboard.preload_layouts(PRELOAD_LAYOUTS)
+        self.hand_tracker = hand_tracker or (ParallelHandTracker() if INFERENCE_WORKERS > 0 else HandTracker())
+        self.input_simulator = input_simulator or InputSimulator()
+        self.recorder = None
+        
+        # Shared per-stage latency profiler
+        self.profiler = StageProfiler()
+        self.hand_tracker.profiler = self.profiler
+        self.input_simulator.profiler = self.profiler
+        self._profile_lines = []
         
         self.cap = None
         self.running = False
@@ -23,11 +85,126 @@ class VirtualKeyboardApp:
         self.fps_start_time = time.time()
         self.current_fps = 0
         
-        # Typing state
-        self.current_hover_key = None
-        self.current_press_key = None
+        # Rendering options (adjusted by the quality governor)
+        self.show_debug = DEBUG_MODE
+        self.preview_size = CAMERA_PREVIEW_SIZE
+        self.quality_governor = QualityGovernor() if ADAPTIVE_QUALITY else None
+        self.status_message = None
+        
+        # Reused display buffers, each with the rects its last frame drew over
+        # and its camera preview slice by preview size
+        self._display_buffers = []
+        self._display_index = 0
+        
+        # Typing state: the key each (hand, fingertip id) is pressing
+        self.profile_path = program_path(CALIBRATION_PROFILE_PATH) if CALIBRATION_PROFILE_PATH else None
+        self.press_detector = create_press_detector(profile_path=self.profile_path)
+        self.finger_press_keys = {}
         self.last_landmarks = None
+        self._pending_layout = None  # applied at the start of the next typing frame
+        self._display_scale = np.array([DISPLAY_WIDTH, DISPLAY_HEIGHT], dtype=np.float32)
+        
+        # Word completion follows everything the input simulator types
+        self.lexicon = None
+        self.completer = None
+        if WORD_COMPLETION and self._load_lexicon() is not None:
+            self.completer = WordCompleter(self.lexicon)
+            self.input_simulator.add_key_listener(self._on_key_typed)
+        
+        # Swipe typing: (start key, display path) of each swiping finger
+        self.swipe_mode = False
+        self.swipe_decoder = None
+        self.swipe_decoders = {}  # by layout name
+        self.swipe_paths = {}
+        self._pending_swipe_mode = None  # applied at the start of the next typing frame
+        if SWIPE_MODE:
+            self.set_swipe_mode(True)
+        
+    def _load_lexicon(self):
+        """Get the word-frequency lexicon shared by every app (None if it is missing)"""
+        if self.lexicon is None:
+            try:
+                self.lexicon = load_lexicon(program_path(WORD_FREQUENCY_PATH))
+            except OSError as e:
+                print(f"Word list not available: {e}")
+                return None
+        return self.lexicon
+    
+    def set_swipe_mode(self, enabled):
+        """Switch between tapping single keys and swiping whole words"""
+        if enabled and self.swipe_decoder is None:
+            if self._load_lexicon() is None:
+                print("Swipe typing needs a word list")
+                return
+            self._update_swipe_decoder()
+        
+        self.swipe_mode = enabled
+        self.swipe_paths = {}
+        print(f"Swipe typing: {'ON' if enabled else 'OFF'}")
+    
+    def request_swipe_mode(self, enabled):
+        """Switch swipe typing on or off on the next typing frame.
+        
+        Like request_layout, this lets the window's key handler toggle it
+        while the typing stage runs on another thread.
+        """
+        self._pending_swipe_mode = enabled
+    
+    def toggle_swipe_mode(self):
+        """Request the opposite of the current (or already requested) swipe mode"""
+        pending = self._pending_swipe_mode
+        self.request_swipe_mode(not (self.swipe_mode if pending is None else pending))
+    
+    def _update_swipe_decoder(self):
+        """Use the swipe decoder of the current layout, building it once"""
+        layout = self.keyboard.layout
+        if layout not in self.swipe_decoders:
+            self.swipe_decoders[layout] = SwipeDecoder(self.keyboard, self.lexicon)
+        self.swipe_decoder = self.swipe_decoders[layout]
+    
+    def request_layout(self, name):
+        """Switch to another keyboard layout on the next typing frame.
+        
+        The switch is deferred so it never happens halfway through a
+        frame's hit-test results, and so the window's key handler can
+        request it while the typing stage runs on another thread.
+        """
+        self._pending_layout = name
+    
+    def next_layout(self):
+        """Request the layout after the current one in PRELOAD_LAYOUTS"""
+        layouts = [name for name in PRELOAD_LAYOUTS if name in self.keyboard.bundles]
+        if not layouts:
+            return
+        current = self.keyboard.layout
+        index = layouts.index(current) + 1 if current in layouts else 0
+        self.request_layout(layouts[index % len(layouts)])
+    
+    def _apply_pending_layout(self):
+        """Switch to the requested layout. Returns True if the layout changed"""
+        name = self._pending_layout
+        self._pending_layout = None
+        if name is None or name == self.keyboard.layout:
+            return False
+        
+        try:
+            start = time.perf_counter()
+            self.keyboard.set_layout(name)
+        except (OSError, ValueError) as e:
+            print(f"Could not switch to layout '{name}': {e}")
+            return False
         
+        self.swipe_paths = {}
+        if self.swipe_decoder is not None:
+            self._update_swipe_decoder()
+        print(f"Layout: {name} ({(time.perf_counter() - start) * 1000:.2f}ms)")
+        return True
+    
+    def _on_key_typed(self, kind, value):
+        """Update the suggestion row from the typed-character stream"""
+        if self.completer.feed(kind, value):
+            self.keyboard.set_suggestions(self.completer.suggestions)
+    
     def initialize_camera(self):
         """Initialize the webcam"""
         self.cap = cv2.VideoCapture(CAMERA_INDEX)
@@ -42,87 +219,200 @@ class VirtualKeyboardApp:
         return True
     
     def process_typing_logic(self, landmarks):
-        """Process the typing logic based on hand landmarks"""
+        """Process the typing logic based on hand landmarks.
+        
+        Every fingertip in TYPING_FINGER_TIP_IDS of every tracked hand can
+        hover and press keys at the same time. All fingertips are resolved
+        against the keyboard in one batched hit-test per frame, and each
+        finger keeps its own press state and debounce.
+        """
+        if self._pending_swipe_mode is not None:
+            enabled, self._pending_swipe_mode = self._pending_swipe_mode, None
+            self.set_swipe_mode(enabled)
+        
         if not landmarks:
             self._clear_keyboard_states()
             return
         
-        # Get the first hand (primary hand)
-        primary_hand = landmarks[0]
+        layout_changed = self._pending_layout is not None and self._apply_pending_layout()
         
-        # Get finger tip position
-        finger_tip = self.hand_tracker.get_index_finger_tip(primary_hand)
-        if not finger_tip:
-            self._clear_keyboard_states()
+        # Map normalized camera coordinates to display coordinates
+        tips = landmarks.normalized[:landmarks.count, TYPING_FINGER_TIP_IDS, :2]
+        positions = tips * self._display_scale
+        key_indices = self.keyboard.get_key_indices(positions)
+        
+        if layout_changed:
+            # Fingers still down from the switch hold whatever key is now
+            # under them instead of pressing it
+            for finger in list(self.finger_press_keys):
+                hand_index, tip_id = finger
+                key_index = -1
+                if hand_index < landmarks.count:
+                    key_index = key_indices[hand_index, TYPING_FINGER_TIP_IDS.index(tip_id)]
+                if key_index >= 0:
+                    self.finger_press_keys[finger] = self.keyboard.key_ids[key_index]
+                else:
+                    del self.finger_press_keys[finger]
+        
+        # Check which fingers are pressed
+        if self.press_detector is not None:
+            pressed = self.press_detector.update(landmarks)
+        else:
+            pressed = self.hand_tracker.get_pressed_fingers(landmarks, tip_ids=TYPING_FINGER_TIP_IDS)
+        
+        hover_keys = set()
+        for hand_index in range(landmarks.count):
+            for finger_index, tip_id in enumerate(TYPING_FINGER_TIP_IDS):
+                finger = (hand_index, tip_id)
+                key_index = key_indices[hand_index, finger_index]
+                key_id = self.keyboard.key_ids[key_index] if key_index >= 0 else None
+                if key_id is not None:
+                    hover_keys.add(key_id)
+                
+                if self.swipe_mode and tip_id == INDEX_FINGER_TIP_ID:
+                    self._process_swipe(finger, key_id, positions[hand_index, finger_index],
+                                        pressed[hand_index, finger_index], landmarks.timestamp)
+                    continue
+                
+                # Process press logic
+                if pressed[hand_index, finger_index]:
+                    if key_id is not None and key_id != self.finger_press_keys.get(finger):
+                        # New key press detected
+                        self.finger_press_keys[finger] = key_id
+                        self._activate_key(key_id, landmarks.timestamp, finger)
+                
+                elif finger in self.finger_press_keys:
+                    # Finger released
+                    del self.finger_press_keys[finger]
+        
+        # Forget presses and swipes of hands that are no longer tracked
+        for finger in list(self.finger_press_keys):
+            if finger[0] >= landmarks.count:
+                del self.finger_press_keys[finger]
+        for finger in list(self.swipe_paths):
+            if finger[0] >= landmarks.count:
+                del self.swipe_paths[finger]
+        
+        # Update hover and pressed states
+        self.keyboard.set_hover_keys(hover_keys)
+        self.keyboard.set_pressed_keys(self.finger_press_keys.values())
+        
+        # Store landmarks for next frame (the tracker reuses its buffers)
+        self.last_landmarks = landmarks[0].copy()
+    
+    def _activate_key(self, key_id, capture_time=None, finger=None):
+        """Act on a pressed key: accept a suggestion, switch layouts or type it"""
+        key_char = self.keyboard.get_key_character(key_id)
+        if not key_char:
             return
         
-        # Map camera coordinates to display coordinates
-        display_x = int(finger_tip['x'] * DISPLAY_WIDTH / CAMERA_WIDTH)
-        display_y = int(finger_tip['y'] * DISPLAY_HEIGHT / CAMERA_HEIGHT)
+        layout = self.keyboard.get_layout_target(key_char)
+        if self.keyboard.is_suggestion_key(key_id):
+            self._accept_suggestion(key_char)
+        elif layout is not None:
+            self.request_layout(layout)
+        else:
+            self._emit_key(key_char, capture_time, finger)
+    
+    def _emit_key(self, key_char, capture_time=None, finger=None):
+        """Send a key press to the input simulator (injected off the render loop)"""
+        success = self.input_simulator.press_key(key_char, capture_time, finger)
+        if success:
+            print(f"Successfully pressed: {key_char}")
+    
+    def _process_swipe(self, finger, key_id, position, is_pressed, timestamp):
+        """Record a swiping finger's path while pressed and decode it on release.
+        
+        A swipe has to start on a key. A path shorter than SWIPE_MIN_LENGTH
+        key widths is treated as a tap on its start key.
+        """
+        swipe = self.swipe_paths.get(finger)
+        if is_pressed:
+            if swipe is None:
+                if key_id is None:
+                    return
+                swipe = self.swipe_paths[finger] = (key_id, [])
+            swipe[1].append((float(position[0]), float(position[1])))
+            if key_id is not None:
+                self.finger_press_keys[finger] = key_id
+            return
         
-        # Check if finger is over a key
-        key_id, key_data = self.keyboard.get_key_at_position(display_x, display_y)
+        if swipe is None:
+            return
         
-        # Update hover state
-        if key_id != self.current_hover_key:
-            self.current_hover_key = key_id
-            self.keyboard.set_hover_key(key_id)
+        # Finger released: finish the gesture
+        del self.swipe_paths[finger]
+        self.finger_press_keys.pop(finger, None)
+        start_key, path = swipe
         
-        # Check if finger is pressed (close to palm)
-        is_pressed = self.hand_tracker.is_finger_pressed(primary_hand)
+        if path_length(path) < SWIPE_MIN_LENGTH * KEY_WIDTH:
+            self._activate_key(start_key, timestamp, finger)
+            return
         
-        # Process press logic
-        if is_pressed and key_id and key_id != self.current_press_key:
-            # New key press detected
-            self.current_press_key = key_id
-            self.keyboard.set_pressed_key(key_id)
-            
-            # Get the key character and press it
-            key_char = self.keyboard.get_key_character(key_id)
-            if key_char:
-                success = self.input_simulator.press_key(key_char)
-                if success:
-                    print(f"Successfully pressed: {key_char}")
-        
-        elif not is_pressed:
-            # Finger released
-            if self.current_press_key:
-                self.keyboard.clear_pressed_key()
-                self.current_press_key = None
-        
-        # Store landmarks for next frame
-        self.last_landmarks = primary_hand
+        word = self.swipe_decoder.decode_word(path)
+        if word:
+            self.input_simulator.type_text(word + ' ')
+            print(f"Swiped: {word}")
+    
+    def _accept_suggestion(self, word):
+        """Type the rest of a suggested word followed by a space"""
+        if self.completer is None:
+            return
+        
+        remainder = self.completer.get_remainder(word)
+        self.input_simulator.type_text(remainder + ' ')
+        print(f"Completed: {word}")
     
     def _clear_keyboard_states(self):
         """Clear all keyboard states when no hand is detected"""
-        self.current_hover_key = None
-        self.current_press_key = None
+        self.finger_press_keys = {}
+        self.swipe_paths = {}
+        if self.press_detector is not None:
+            self.press_detector.reset()
         self.keyboard.set_hover_key(None)
         self.keyboard.clear_pressed_key()
     
     def draw_debug_info(self, frame):
-        """Draw debug information on the frame"""
-        if not DEBUG_MODE:
-            return
+        """Draw debug information on the frame.
+        
+        Returns the display rectangles drawn over, so the next frame on the
+        same buffer knows what to clear.
+        """
+        rects = []
+        if not self.show_debug:
+            return rects
         
         # Draw FPS
         if SHOW_FPS:
-            cv2.putText(frame, f"FPS: {self.current_fps:.1f}", 
-                       (10, DISPLAY_HEIGHT - 30), cv2.FONT_HERSHEY_SIMPLEX, 
-                       0.7, COLORS['text_normal'], 2)
+            fps_text = f"FPS: {self.current_fps:.1f}"
+            if self.quality_governor is not None:
+                fps_text += f" | Quality: {self.quality_governor.settings['name']}"
+            rects.append(draw_text(frame, fps_text, (10, DISPLAY_HEIGHT - 30), 0.7, 2))
         
         # Draw instructions
-        instructions = [
-            "ESC: Exit",
-            "Space: Toggle Keyboard",
-            "Index finger: Point to keys",
-            "Bring finger close to palm to press"
-        ]
-        
-        for i, instruction in enumerate(instructions):
+        for i, instruction in enumerate(INSTRUCTIONS):
             y_pos = 90 + i * 25
-            cv2.putText(frame, instruction, (10, y_pos), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, COLORS['text_normal'], 1)
+            rects.append(draw_text(frame, instruction, (10, y_pos), 0.5, 1))
+        
+        # Draw per-stage latency percentiles
+        if PROFILE_OVERLAY and self._profile_lines:
+            rects.append(self.profiler.draw(frame, self._profile_lines, 
+                                            (10, 90 + len(INSTRUCTIONS) * 25 + 10)))
+        return rects
+    
+    def update_quality(self, frame_cost):
+        """Feed a frame's processing time to the quality governor and apply level changes"""
+        if self.quality_governor is None:
+            return
+        
+        settings = self.quality_governor.update(frame_cost)
+        if settings is not None:
+            self.hand_tracker.set_inference_size(settings['inference_size'])
+            self.hand_tracker.set_model_complexity(settings['model_complexity'])
+            self.hand_tracker.skip_frames = max(1, settings['skip_frames'])
+            self.hand_tracker.show_debug = settings['debug_overlay']
+            self.show_debug = settings['debug_overlay']
+            self.preview_size = settings['preview_size']
     
     def update_fps(self):
         """Update FPS counter"""
@@ -133,78 +423,275 @@ class VirtualKeyboardApp:
             self.current_fps = self.fps_counter / (current_time - self.fps_start_time)
             self.fps_counter = 0
             self.fps_start_time = current_time
+            
+            # Refresh the latency overlay at the same rate
+            if PROFILE_OVERLAY and self.show_debug:
+                self._profile_lines = self.profiler.format_lines()
+    
+    def render_frame(self, frame, landmarks_list):
+        """Compose the display frame from the keyboard and camera frame.
+        
+        The frame is drawn into a reused display buffer. Only regions drawn
+        over on the buffer's previous use that this frame does not fully
+        overwrite (the keyboard and the camera preview) are cleared, and
+        the preview is resized straight into its slice of the buffer, so
+        no frame-sized arrays are allocated per frame.
+        """
+        start = self.profiler.start()
+        
+        display_frame, dirty_rects, previews = self._next_display_buffer()
+        
+        # Regions fully overwritten below
+        camera_display_width, camera_display_height = self.preview_size
+        camera_x = DISPLAY_WIDTH - camera_display_width - 20
+        camera_y = 20
+        preview_rect = (camera_x, camera_y, camera_display_width, camera_display_height)
+        covered = [preview_rect]
+        if self.show_keyboard:
+            covered.append(self.keyboard.bounds)
+        
+        # Clear what the buffer's last frame drew that this one will not cover
+        for rect in dirty_rects:
+            if not rect_covered(rect, covered):
+                x, y, width, height = rect
+                display_frame[y:y + height, x:x + width] = COLORS['background']
+        start = self.profiler.stop('clear', start)
+        
+        # Draw hand information on camera frame
+        if landmarks_list:
+            self.hand_tracker.draw_finger_info(frame, landmarks_list[0])
+        
+        # Draw virtual keyboard
+        if self.show_keyboard:
+            self.keyboard.draw(display_frame)
+            # Not part of the pre-rendered layers, so the quality governor can turn it off
+            if self.show_debug and SHOW_BOUNDING_BOXES:
+                self.keyboard.draw_bounding_boxes(display_frame)
+        start = self.profiler.stop('keyboard_draw', start)
+        
+        # Resize the camera frame straight into its place on the display
+        preview = previews.get(self.preview_size)
+        if preview is None:
+            preview = previews[self.preview_size] = display_frame[camera_y:camera_y + camera_display_height, 
+                                                                  camera_x:camera_x + camera_display_width]
+        cv2.resize(frame, self.preview_size, dst=preview)
+        start = self.profiler.stop('compose', start)
+        
+        # Draw debug information
+        overlay_rects = self.draw_debug_info(display_frame)
+        status = self.get_status_text()
+        if status:
+            overlay_rects.append(draw_text(display_frame, status, STATUS_TEXT_ORIGIN, 0.8, 2))
+        self.profiler.stop('debug_overlay', start)
+        
+        dirty_rects[:] = covered + overlay_rects
+        return display_frame
+    
+    def get_status_text(self):
+        """Get the startup status line to show above the keyboard (None when running)"""
+        if self.status_message:
+            return self.status_message
+        if not self.hand_tracker.is_ready():
+            if getattr(self.hand_tracker, 'load_error', None) is not None:
+                return "Hand tracking unavailable (see console)"
+            return "Loading hand tracking model..."
+        return None
+    
+    def show_startup_frame(self):
+        """Open the window with the keyboard and the startup status, before any camera frame"""
+        blank = np.zeros((CAMERA_HEIGHT, CAMERA_WIDTH, 3), dtype=np.uint8)
+        cv2.imshow('Virtual Keyboard', self.render_frame(blank, []))
+        cv2.waitKey(1)
+    
+    def _next_display_buffer(self):
+        """Get the next display buffer of the ring, the rects drawn on its last use and its preview slices.
+        
+        In pipeline mode frames are still in the display queue or on
+        screen while the next one is rendered, so the ring holds one buffer
+        per frame that can be in flight. The serial loop needs only one.
+        """
+        count = PIPELINE_QUEUE_SIZE + 2 if PIPELINE_ENABLED else 1
+        if len(self._display_buffers) != count:
+            self._display_buffers = []
+            for _ in range(count):
+                buffer = np.empty((DISPLAY_HEIGHT, DISPLAY_WIDTH, 3), dtype=np.uint8)
+                buffer[:] = COLORS['background']
+                self._display_buffers.append((buffer, [], {}))
+            self._display_index = 0
+        
+        buffer = self._display_buffers[self._display_index]
+        self._display_index = (self._display_index + 1) % count
+        return buffer
+    
+    def handle_key_event(self, key):
+        """Handle a window key event. Returns False when the app should exit"""
+        if key == 27:  # ESC
+            return False
+        elif key == 32:  # Space
+            self.show_keyboard = not self.show_keyboard
+            print(f"Keyboard visibility: {'ON' if self.show_keyboard else 'OFF'}")
+        elif key == ord('s'):
+            self.toggle_swipe_mode()
+        elif key == ord('l'):
+            self.next_layout()
+        return True
     
     def run(self):
         """Main application loop"""
+        # Show the keyboard right away; the camera and the model come up behind it
+        self.status_message = "Starting camera..."
+        self.show_startup_frame()
+        self.status_message = None
+        
         if not self.initialize_camera():
+            self.cleanup()
             return
         
         print("Virtual Keyboard started!")
-        print("Press ESC to exit, Space to toggle keyboard visibility")
+        print("Press ESC to exit, Space to toggle keyboard visibility, S to toggle swipe typing, L for the next layout")
+        
+        if PROFILE_EXPORT_PATH and hasattr(signal, 'SIGUSR1'):
+            signal.signal(signal.SIGUSR1, lambda signum, frame: self.profiler.export(PROFILE_EXPORT_PATH))
+        
+        if RECORD_SESSION_PATH:
+            self.recorder = SessionRecorder(RECORD_SESSION_PATH)
+            print(f"Recording landmarks to {RECORD_SESSION_PATH}")
         
         self.running = True
         
+        try:
+            if PIPELINE_ENABLED:
+                self._run_pipelined()
+            else:
+                self._run_serial()
+        
+        except KeyboardInterrupt:
+            print("Interrupted by user")
+        
+        finally:
+            self.cleanup()
+    
+    def _run_serial(self):
+        """Run every stage of the main loop on the calling thread"""
+        while self.running:
+            # Read frame from camera
+            start = self.profiler.start()
+            ret, frame = self.cap.read()
+            if not ret:
+                print("Error reading frame")
+                break
+            capture_time = time.time()
+            frame_start = self.profiler.stop('capture', start)
+            
+            # Process hand tracking
+            landmarks_list = self.hand_tracker.process_frame(frame, capture_time)
+            if self.recorder:
+                self.recorder.record(landmarks_list)
+            start = self.profiler.stop('tracking', frame_start)
+            
+            # Process typing logic
+            self.process_typing_logic(landmarks_list)
+            self.profiler.stop('typing', start)
+            
+            # Draw keyboard, camera feed and debug information
+            display_frame = self.render_frame(frame, landmarks_list)
+            
+            # Update FPS
+            self.update_fps()
+            
+            # Display the frame
+            start = self.profiler.start()
+            cv2.imshow('Virtual Keyboard', display_frame)
+            key = cv2.waitKey(1) & 0xFF
+            end = self.profiler.stop('display', start)
+            self.profiler.record('frame', end - frame_start)
+            
+            # Adapt quality to the time spent on this frame
+            self.update_quality(end - frame_start)
+            
+            # Handle key events
+            if not self.handle_key_event(key):
+                break
+    
+    def _run_pipelined(self):
+        """Run capture, inference, typing and rendering on separate threads.
+        
+        Stages are joined by bounded queues using PIPELINE_DROP_POLICY, so a
+        slow stage drops stale frames instead of building up latency. Key
+        injection runs on the InputSimulator's own worker thread. The window
+        itself stays on this thread because OpenCV's HighGUI is not
+        thread-safe.
+        """
+        pipeline = Pipeline()
+        frames = pipeline.add_queue('frames', PIPELINE_QUEUE_SIZE, PIPELINE_DROP_POLICY)
+        tracked = pipeline.add_queue('tracked', PIPELINE_QUEUE_SIZE, PIPELINE_DROP_POLICY)
+        typed = pipeline.add_queue('typed', PIPELINE_QUEUE_SIZE, PIPELINE_DROP_POLICY)
+        displays = pipeline.add_queue('display', PIPELINE_QUEUE_SIZE, PIPELINE_DROP_POLICY)
+        
+        pipeline.add_stage('capture', self._capture_stage, output_queue=frames)
+        pipeline.add_stage('inference', self._inference_stage, frames, tracked)
+        pipeline.add_stage('typing', self._typing_stage, tracked, typed)
+        pipeline.add_stage('render', self._render_stage, typed, displays)
+        
+        pipeline.start()
+        
         try:
             while self.running:
-                # Read frame from camera
-                ret, frame = self.cap.read()
-                if not ret:
-                    print("Error reading frame")
+                try:
+                    packet = displays.get(timeout=0.1)
+                except PipelineClosed:
                     break
                 
-                # Create display frame
-                display_frame = np.zeros((DISPLAY_HEIGHT, DISPLAY_WIDTH, 3), dtype=np.uint8)
-                display_frame[:] = COLORS['background']
-                
-                # Process hand tracking
-                landmarks_list = self.hand_tracker.process_frame(frame)
-                
-                # Draw hand information on camera frame
-                if landmarks_list:
-                    self.hand_tracker.draw_finger_info(frame, landmarks_list[0])
-                
-                # Process typing logic
-                self.process_typing_logic(landmarks_list)
-                
-                # Draw virtual keyboard
-                if self.show_keyboard:
-                    self.keyboard.draw(display_frame)
-                
-                # Draw camera feed (scaled down)
-                camera_display_width = 320
-                camera_display_height = 240
-                camera_x = DISPLAY_WIDTH - camera_display_width - 20
-                camera_y = 20
-                
-                # Resize camera frame for display
-                camera_frame_resized = cv2.resize(frame, (camera_display_width, camera_display_height))
-                
-                # Overlay camera frame on display
-                display_frame[camera_y:camera_y + camera_display_height, 
-                            camera_x:camera_x + camera_display_width] = camera_frame_resized
-                
-                # Draw debug information
-                self.draw_debug_info(display_frame)
-                
-                # Update FPS
-                self.update_fps()
-                
-                # Display the frame
-                cv2.imshow('Virtual Keyboard', display_frame)
+                start = self.profiler.start()
+                if packet is not None:
+                    self.update_fps()
+                    cv2.imshow('Virtual Keyboard', packet['display'])
+                    
+                    # Throughput is bounded by the slowest stage
+                    self.update_quality(packet['cost'])
                 
                 # Handle key events
                 key = cv2.waitKey(1) & 0xFF
-                if key == 27:  # ESC
+                self.profiler.stop('display', start)
+                if not self.handle_key_event(key):
                     break
-                elif key == 32:  # Space
-                    self.show_keyboard = not self.show_keyboard
-                    print(f"Keyboard visibility: {'ON' if self.show_keyboard else 'OFF'}")
-        
-        except KeyboardInterrupt:
-            print("Interrupted by user")
         
         finally:
-            self.cleanup()
+            self.running = False
+            pipeline.stop()
+    
+    def _capture_stage(self):
+        """Pipeline source: read the next camera frame"""
+        start = self.profiler.start()
+        ret, frame = self.cap.read()
+        if not ret:
+            print("Error reading frame")
+            raise StopIteration
+        self.profiler.stop('capture', start)
+        return {'frame': frame, 'timestamp': time.time(), 'cost': 0.0}
+    
+    def _inference_stage(self, packet):
+        """Pipeline stage: run hand tracking on a frame"""
+        start = self.profiler.start()
+        packet['landmarks'] = self.hand_tracker.process_frame(packet['frame'], packet['timestamp'])
+        packet['cost'] = max(packet['cost'], self.profiler.stop('tracking', start) - start)
+        return packet
+    
+    def _typing_stage(self, packet):
+        """Pipeline stage: update hover/press state and emit key events"""
+        start = self.profiler.start()
+        if self.recorder:
+            self.recorder.record(packet['landmarks'])
+        self.process_typing_logic(packet['landmarks'])
+        packet['cost'] = max(packet['cost'], self.profiler.stop('typing', start) - start)
+        return packet
+    
+    def _render_stage(self, packet):
+        """Pipeline stage: compose the display frame"""
+        start = self.profiler.start()
+        packet['display'] = self.render_frame(packet['frame'], packet['landmarks'])
+        packet['cost'] = max(packet['cost'], time.perf_counter() - start)
+        return packet
     
     def cleanup(self):
         """Clean up resources"""
@@ -213,10 +700,26 @@ class VirtualKeyboardApp:
         if self.cap:
             self.cap.release()
         
+        if self.recorder:
+            self.recorder.close()
+            self.recorder = None
+        
         self.hand_tracker.release()
         self.input_simulator.cleanup()
         cv2.destroyAllWindows()
         
+        calibration = getattr(self.press_detector, 'calibration', None)
+        if calibration is not None and self.profile_path:
+            calibration.save(self.profile_path)
+            print(f"Saved press calibration to {self.profile_path}")
+        
+        if PROFILE_EXPORT_PATH:
+            self.profiler.export(PROFILE_EXPORT_PATH)
+        
+        if LATENCY_REPORT and self.input_simulator.keystroke_latencies:
+            print("Motion-to-keystroke latency:")
+            self.input_simulator.print_latency_report()
+        
         print("Virtual Keyboard closed")
 
 def main():
@@ -0,0 +1,185 @@
+"""
+Word Completion for the Virtual Keyboard
+"""
+
+import os
+import threading
+import numpy as np
+from config import *
+
+# Keys that change the text without ending the current word
+MODIFIER_KEYS = ('shift', 'caps', 'ctrl', 'alt', 'win', 'menu')
+
+
+class Lexicon:
+    """Word list with frequencies, stored as a sorted array of UTF-8 words.
+
+    A sorted array is a flattened prefix trie: every prefix owns one
+    contiguous range of it, found with two binary searches, and the range
+    of a longer prefix lies inside the range of a shorter one. Words live
+    in a single fixed-width bytes array and counts in an int64 array, so a
+    100k-word lexicon takes a few MB and no per-word Python objects.
+    """
+
+    def __init__(self, words, counts):
+        words = np.asarray(words, dtype=np.bytes_)
+        counts = np.asarray(counts, dtype=np.int64)
+
+        # Sort and merge duplicate words
+        self.words, inverse = np.unique(words, return_inverse=True)
+        self.counts = np.bincount(inverse.ravel(), weights=counts,
+                                  minlength=len(self.words)).astype(np.int64)
+
+    @classmethod
+    def load(cls, path, max_words=None):
+        """Load a word-frequency file.
+
+        Each line holds a word and its count separated by whitespace (a
+        line with only a word counts as 1); lines starting with # are
+        comments. Words are lowercased; the first max_words words are used
+        if given.
+        """
+        words = []
+        counts = []
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                fields = line.split()
+                if not fields or fields[0].startswith('#'):
+                    continue
+                words.append(fields[0].lower().encode('utf-8'))
+                counts.append(int(fields[1]) if len(fields) > 1 else 1)
+                if max_words is not None and len(words) >= max_words:
+                    break
+        return cls(words, counts)
+
+    def __len__(self):
+        return len(self.words)
+
+    def prefix_range(self, prefix, lo=0, hi=None):
+        """Get the [lo, hi) range of words starting with prefix.
+
+        The search can be restricted to the range of a shorter prefix,
+        which is how completions are narrowed incrementally.
+        """
+        if hi is None:
+            hi = len(self.words)
+        if isinstance(prefix, str):
+            prefix = prefix.encode('utf-8')
+        if not prefix:
+            return lo, hi
+
+        words = self.words[lo:hi]
+        start = lo + int(np.searchsorted(words, prefix, side='left'))
+        # 0xff never occurs in UTF-8, so it sorts after every completion
+        end = lo + int(np.searchsorted(words, prefix + b'\xff', side='left'))
+        return start, end
+
+    def top_words(self, lo, hi, k):
+        """Get the k most frequent words in a range, most frequent first"""
+        count = hi - lo
+        if count <= 0 or k <= 0:
+            return []
+
+        counts = self.counts[lo:hi]
+        if count > k:
+            best = np.argpartition(counts, count - k)[count - k:]
+        else:
+            best = np.arange(count)
+        # Most frequent first, alphabetical among equals
+        best = best[np.lexsort((best, -counts[best]))]
+        return [self.words[lo + i].decode('utf-8') for i in best]
+
+
+# Lexicons loaded by load_lexicon, by absolute path
+_lexicons = {}
+_lexicons_lock = threading.Lock()
+
+
+def load_lexicon(path=WORD_FREQUENCY_PATH):
+    """Load a word-frequency file once per process and share the Lexicon.
+
+    A Lexicon is never modified after loading, so every app, hosted
+    session and server connection uses the same one. Raises OSError like
+    Lexicon.load.
+    """
+    key = os.path.abspath(path)
+    with _lexicons_lock:
+        lexicon = _lexicons.get(key)
+        if lexicon is None:
+            lexicon = Lexicon.load(path)
+            _lexicons[key] = lexicon
+            print(f"Loaded {len(lexicon)} words")
+    return lexicon
+
+
+class WordCompleter:
+    """Follow the typed-character stream and suggest completions.
+
+    feed() takes events as reported by InputSimulator key listeners. The
+    completer keeps the lexicon range of every prefix of the current
+    word, so each typed letter costs one narrowed binary search plus a
+    top-k selection, and a backspace just pops a range.
+    """
+
+    def __init__(self, lexicon, count=SUGGESTION_COUNT, min_prefix=COMPLETION_MIN_PREFIX):
+        self.lexicon = lexicon
+        self.count = count
+        self.min_prefix = min_prefix
+        self.word = ''
+        self.suggestions = []
+        self._ranges = [(0, len(lexicon))]
+
+    def feed(self, kind, value):
+        """Update the current word from a 'press' or 'text' event.
+
+        Returns True when the suggestions changed.
+        """
+        previous = self.suggestions
+        if kind == 'press':
+            self._feed_key(value)
+        elif kind == 'text':
+            for char in value:
+                self._feed_key(char)
+        else:
+            return False
+
+        self._update_suggestions()
+        return self.suggestions != previous
+
+    def _feed_key(self, key_char):
+        """Apply one key to the current word"""
+        if key_char == 'backspace':
+            if self.word:
+                self.word = self.word[:-1]
+                self._ranges.pop()
+        elif len(key_char) == 1 and (key_char.isalpha() or key_char == "'"):
+            char = key_char.lower()
+            lo, hi = self._ranges[-1]
+            self.word += char
+            self._ranges.append(self.lexicon.prefix_range(self.word, lo, hi))
+        elif key_char not in MODIFIER_KEYS:
+            # Anything else ends the word
+            self.reset()
+
+    def _update_suggestions(self):
+        """Recompute the suggestions for the current word"""
+        if len(self.word) < self.min_prefix:
+            self.suggestions = []
+            return
+
+        lo, hi = self._ranges[-1]
+        # Take one extra in case the word itself is among the best
+        words = self.lexicon.top_words(lo, hi, self.count + 1)
+        self.suggestions = [word for word in words if word != self.word][:self.count]
+
+    def get_remainder(self, suggestion):
+        """Get the text still to type to complete the current word to suggestion"""
+        if not suggestion.startswith(self.word):
+            return ''
+        return suggestion[len(self.word):]
+
+    def reset(self):
+        """Start a new word"""
+        self.word = ''
+        self.suggestions = []
+        self._ranges = self._ranges[:1]